@@ -1,10 +1,61 @@
-from astrbot.api.event import filter, AstrMessageEvent, MessageEventResult
+from astrbot.api.event import filter, AstrMessageEvent, MessageChain, MessageEventResult
 from astrbot.api.star import Context, Star, register
 from astrbot.api import logger, AstrBotConfig
 import httpx
 import asyncio
+import contextlib
+import heapq
+import itertools
 import json
-from datetime import datetime
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from operator import attrgetter, itemgetter
+from pathlib import Path
+
+from .mod_cache import SearchCache
+from .mod_cache_store import CacheStore
+from .mod_chunker import pack_chunks, parse_limits
+from .mod_flow import RETRY_STATUSES, CircuitBreaker, CircuitOpen, DeadlineExceeded, FairAdmission, Overloaded, SingleFlight, TokenBucket, backoff_delay, retry_after_seconds, time_left
+from .mod_index import ModIndex, mod_update_ts
+from .mod_metrics import Metrics, fmt_ms, fmt_rate, uptime_text
+from .mod_ngram import NgramIndex
+from .mod_normalize import QueryNormalizer, parse_aliases
+from .mod_popularity import HotQueries
+from .mod_replay import QueryRecorder
+from .mod_records import ModDetail, ModRecord, SearchResult, date_part, extract_detail, extract_mods, parse_response
+from .mod_strategy import StrategyStore, apply_strategy, contains_hits, probe
+from .mod_subscribe import PollScheduler, SubscriptionStore, Topic
+
+_STALE_NOTE = "▌注意: 3DM接口暂时不可用，以下为历史缓存结果，可能不是最新"
+# 多游戏搜索：一次最多并发查询的游戏数与可翻到的页数（第 N 页需要每个游戏的前 N 页）
+_MULTI_MAX_GAMES = 10
+_MULTI_MAX_PAGE = 10
+# 批量搜索单次最多的关键词数
+_BATCH_MAX_KEYWORDS = 5
+# 查询热度每隔这么久减半，热门查询反映近期流量
+_HOT_DECAY_SECONDS = 600
+# 启动预热时按持久化的命中次数初始化查询热度，上限避免历史累计次数长期压过近期流量
+_HOT_SEED_MAX = 4
+# 查询日志缓冲的写盘间隔
+_QUERY_LOG_FLUSH_SECONDS = 5
+# 搜索词末尾的页码标记只认“第2页”；末尾的纯数字与“P5”之类都属于关键词（如“巫师 3”“女神异闻录 P5”）
+_PAGE_MARKER = re.compile(r"第\s*(\d{1,3})\s*页\s*$")
+# 完整爬取时每页最多尝试的轮数（失败的页在每轮末尾统一重试）
+_CRAWL_PAGE_ROUNDS = 3
+
+
+def plugin_data_dir() -> Path:
+    """插件数据目录（data/plugin_data/astrbot_plugin_3dmapi），旧版 AstrBot 无 StarTools 时手动创建"""
+    try:
+        from astrbot.api.star import StarTools
+        return Path(StarTools.get_data_dir("astrbot_plugin_3dmapi"))
+    except Exception:
+        path = Path("data") / "plugin_data" / "astrbot_plugin_3dmapi"
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
 
 @register("astrbot_plugin_3dmapi", "--sora--", "3dmmod 搜索插件", "2.0","https://github.com/sora-yyds/astrbot_plugin_3dmapi")
 class ModSearchPlugin(Star):
@@ -13,6 +64,8 @@ class ModSearchPlugin(Star):
         self.config = config
         self.api_url = "https://mod.3dmgame.com/api/v3/mods"
         self.game_id = config.get("game_id", 261)
+        # “全部”范围包含的游戏：{游戏ID: 名称}
+        self.games = self._parse_games(config.get("game_ids", ""))
         self.appkey = config.get("appkey", "{APPKEY}")
         self.max_results = config.get("max_results", 10)
         self.sort_order = config.get("sort_order", "时间排序")
@@ -20,13 +73,219 @@ class ModSearchPlugin(Star):
         self.sort_by = "mods_createTime"
         self.sort_order_api = "desc"
         self.is_recommend = False
+        # 回退链执行方式：顺序回退 / 并发对冲
+        self.fallback_mode = config.get("fallback_mode", "顺序回退")
+        self.hedge_delay = max(0.0, float(config.get("hedge_delay", 0.3)))
+        # 回退策略学习：记住命中的参数组合，失效时后台有限并发重新探测
+        self.strategy_learning = bool(config.get("strategy_learning", True))
+        self.probe_concurrency = int(config.get("probe_concurrency", 4))
+        self.probe_cooldown = float(config.get("probe_cooldown", 3600))
+        self.data_dir = plugin_data_dir()
+        self.strategy = StrategyStore(self.data_dir / "strategy.json")
+        self._probe_task: asyncio.Task | None = None
+        self._last_probe = float("-inf")
+        # 本地索引：后台爬取 game_id 下的全部 mod 存入 SQLite，搜索优先查本地，在线接口作为兜底
+        self.local_index = bool(config.get("local_index", False))
+        self.index_page_size = int(config.get("index_page_size", 50))
+        self.index_concurrency = int(config.get("index_concurrency", 3))
+        self.index_refresh_hours = float(config.get("index_refresh_hours", 24))
+        self.index_sync_minutes = float(config.get("index_sync_minutes", 10))
+        self.index_sync_max_pages = int(config.get("index_sync_max_pages", 20))
+        self._index_lock = asyncio.Lock()
+        # 最近一次完整爬取的时间戳（0 表示未爬取，本地搜索不可用），避免每次搜索都查 SQLite；
+        # 上次完整爬取有页失败时，下个同步周期重新完整爬取
+        self._index_crawled_at = 0.0
+        self._index_incomplete = False
+        # 翻页会话：会话+发送者 -> (关键词, 当前页, 总页数, 游戏范围, 过期时间)
+        self.page_session_ttl = float(config.get("page_session_ttl", 600))
+        self.prefetch_next_page = bool(config.get("prefetch_next_page", True))
+        self._page_sessions: OrderedDict[str, tuple[str, int, int, tuple[int, ...] | None, float]] = OrderedDict()
+        # 长消息分段：单条消息字数上限，可按平台单独设置
+        self.message_max_chars = max(200, int(config.get("message_max_chars", 1500)))
+        self.platform_limits = parse_limits(config.get("platform_message_limits", ""))
+        self.index: ModIndex | None = None
+        # 内存 n-gram 倒排索引，负责本地搜索的相关度排序
+        self.index_download_boost = float(config.get("index_download_boost", 0.3))
+        self.ngram: NgramIndex | None = None
+        # 插件生命周期内复用的连接池客户端，在 initialize() 中创建、terminate() 中关闭
+        self.client: httpx.AsyncClient | None = None
+        # 自定义传输层（本地替身接口/基准测试注入），为 None 时使用默认连接池
+        self.transport: httpx.AsyncBaseTransport | None = None
+        # 搜索结果缓存（TTL + LRU），过期后在宽限期内先返回旧数据并后台刷新
+        self.cache = SearchCache(
+            ttl=float(config.get("cache_ttl", 300)),
+            stale_grace=float(config.get("cache_stale_grace", 600)),
+            max_entries=int(config.get("cache_max_entries", 512)),
+            max_bytes=int(float(config.get("cache_max_mb", 32)) * 1024 * 1024),
+        )
+        self._refreshing: set[tuple] = set()
+        # 搜索缓存持久化：SQLite（WAL）保存缓存结果，重载/重启后在后台按热度预热，同机多进程可共用
+        self.cache_persist = bool(config.get("cache_persist", True))
+        self.cache_warm_entries = int(config.get("cache_warm_entries", 256))
+        self.cache_flush_interval = max(5.0, float(config.get("cache_flush_interval", 60)))
+        self.cache_store: CacheStore | None = None
+        # 热门查询：count-min sketch + 前 k 堆统计查询热度，后台在缓存过期前按限速节奏主动刷新最热的查询
+        self.hot_refresh_top = int(config.get("hot_refresh_top", 20))
+        self.hot_refresh_lead = max(0.0, float(config.get("hot_refresh_lead", 30)))
+        self.hot = HotQueries(k=max(1, self.hot_refresh_top) * 2)
+        # mod 详情缓存：按 mod ID 保存，搜索结果与本地索引中的记录直接复用，过期后用 ETag / Last-Modified 条件请求刷新
+        self.detail_cache = SearchCache(
+            ttl=float(config.get("detail_cache_ttl", 1800)),
+            stale_grace=0,
+            max_entries=int(config.get("detail_cache_entries", 2048)),
+        )
+        # 查询规范化：NFKC、大小写、繁简、空白与别名折叠后的关键词用作缓存键、合并键与本地索引检索词
+        self.normalizer = QueryNormalizer(parse_aliases(config.get("query_aliases", "")), self.data_dir / "aliases.json")
+        # 相同查询的并发请求合并为一条上游请求链
+        self._flight = SingleFlight()
+        # 上游限速：所有对 3DM 接口的请求共用一个令牌桶，429/5xx 时按 Retry-After 或抖动退避重试
+        self.limiter = TokenBucket(
+            rate=float(config.get("rate_limit_per_sec", 5)),
+            burst=int(config.get("rate_limit_burst", 10)),
+        )
+        self.rate_limit_max_wait = float(config.get("rate_limit_max_wait", 3))
+        self.upstream_max_retries = int(config.get("upstream_max_retries", 2))
+        # 单条指令的总耗时预算（秒）：排队、回退链各次请求与重试只能使用剩余时间，到期后取消并返回已有的最好结果
+        self.search_deadline = max(0.0, float(config.get("search_deadline", 10)))
+        self.retry_max_delay = float(config.get("retry_max_delay", 8))
+        # 准入控制：限制同时访问上游的搜索数与排队数，按用户/群限制在途请求，饱和时快速失败
+        self.admission = FairAdmission(
+            max_active=int(config.get("max_concurrent_searches", 8)),
+            max_waiting=int(config.get("max_queued_searches", 16)),
+            per_user=int(config.get("per_user_searches", 2)),
+            per_group=int(config.get("per_group_searches", 4)),
+        )
+        # 熔断：上游连续失败时短路请求，期间用最近一次的缓存结果降级应答
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(config.get("breaker_failure_threshold", 5)),
+            window=float(config.get("breaker_window", 30)),
+            reset_timeout=float(config.get("breaker_reset_timeout", 30)),
+            half_open_max=int(config.get("breaker_half_open_max", 1)),
+            on_change=lambda old, new: logger.warning(f"上游熔断器状态变化: {old} -> {new}"),
+        )
+        self._bg_tasks: set[asyncio.Task] = set()
+        # 线程池中执行的阻塞调用（SQLite、写文件），terminate() 关闭数据库前等待全部结束
+        self._thread_jobs: set[asyncio.Future] = set()
+        # 关键词订阅：相同关键词+游戏的订阅合并为一个主题，每个周期只轮询一次，新结果推送给全部订阅会话
+        self.subscription_interval = float(config.get("subscription_interval", 30)) * 60
+        self.subscription_max_per_session = int(config.get("subscription_max_per_session", 10))
+        self.subscriptions = SubscriptionStore(self.data_dir / "subscriptions.json", normalize=self.normalizer)
+        self._poll_schedule = PollScheduler(
+            max(60.0, self.subscription_interval), float(config.get("subscription_jitter", 0.1))
+        )
+        self._subs_changed = asyncio.Event()
+        # 运行指标：/mod统计 查看，可定期导出为 Prometheus 文本格式文件
+        self.metrics = Metrics(prefix="mod3dm_")
+        self.metrics_file = str(config.get("metrics_file", "") or "").strip()
+        self.metrics_interval = max(5.0, float(config.get("metrics_interval", 60)))
+        # 查询日志：匿名化记录线上搜索（相对路径基于插件数据目录），供 mod_search_local_test.py --replay 离线回放
+        self.recorder: QueryRecorder | None = None
+        query_log_file = str(config.get("query_log_file", "") or "").strip()
+        if query_log_file:
+            path = Path(query_log_file)
+            self.recorder = QueryRecorder(path if path.is_absolute() else self.data_dir / path)
+        self._register_metrics()
 
     async def initialize(self):
         """可选择实现异步的插件初始化方法，当实例化该插件类之后会自动调用该方法。"""
+        self.client = self._build_http_client()
+        if self.local_index:
+            self.index = ModIndex(self.data_dir / "mod_index.db")
+            self.ngram = NgramIndex(download_boost=self.index_download_boost)
+            self._start_background(self._crawl_loop())
+        if self.metrics_file:
+            self._start_background(self._metrics_loop())
+        if self.recorder is not None:
+            self._start_background(self._query_log_loop())
+        if self.cache_persist and self.cache.enabled:
+            self._start_background(self._cache_persist_loop())
+        if self.hot_refresh_top > 0 and self.cache.enabled:
+            self._start_background(self._hot_refresh_loop())
+        if self.subscription_interval > 0:
+            for key in self.subscriptions.topics:
+                self._poll_schedule.add(key)
+            self._start_background(self._subscription_loop())
         logger.info("3dmmod搜索插件初始化完成")
         if self.appkey == "{APPKEY}":
             logger.warning("请在插件配置中设置正确的API密钥")
     
+    def _build_http_client(self) -> httpx.AsyncClient:
+        """按配置构建带连接池的 httpx 客户端"""
+        limits = httpx.Limits(
+            max_connections=int(self.config.get("http_max_connections", 20)),
+            max_keepalive_connections=int(self.config.get("http_max_keepalive", 10)),
+            keepalive_expiry=float(self.config.get("http_keepalive_expiry", 30.0)),
+        )
+        timeout = httpx.Timeout(
+            connect=float(self.config.get("http_connect_timeout", 5.0)),
+            read=float(self.config.get("http_read_timeout", 15.0)),
+            write=float(self.config.get("http_write_timeout", 5.0)),
+            pool=float(self.config.get("http_pool_timeout", 5.0)),
+        )
+        http2 = bool(self.config.get("http2", False))
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("未安装 h2 依赖，HTTP/2 已回退为 HTTP/1.1（可执行 pip install httpx[http2]）")
+                http2 = False
+        if self.transport is not None:
+            return httpx.AsyncClient(transport=self.transport, timeout=timeout)
+        return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2)
+
+    def _register_metrics(self):
+        m = self.metrics
+        m.describe("upstream_requests_total", "上游 HTTP 请求数，按回退阶段与状态码")
+        m.describe("upstream_request_seconds", "上游 HTTP 请求耗时")
+        m.describe("upstream_results_total", "最终采用的上游结果，按回退阶段与响应形态")
+        m.describe("cache_lookups_total", "搜索缓存查询，按 fresh/stale/miss")
+        m.describe("persisted_cache_loads_total", "内存未命中时从持久化缓存载入的条目数")
+        m.describe("hot_refreshes_total", "热门查询的主动刷新次数，按结果")
+        m.describe("queries_normalized_total", "经规范化改写的搜索关键词数")
+        m.describe("searches_total", "完成的搜索，按数据来源")
+        m.describe("search_seconds", "搜索取得结果的耗时，按数据来源")
+        m.describe("searches_rejected_total", "被拒绝的搜索，按原因")
+        m.describe("format_seconds", "格式化搜索结果的耗时")
+        m.describe("detail_lookups_total", "mod 详情查询，按 fresh/miss/not_modified")
+        m.describe("subscription_polls_total", "订阅主题轮询次数，按结果")
+        m.describe("subscription_notifications_total", "发出的订阅推送消息数")
+        m.gauge("inflight_upstream_searches", lambda: self._flight.in_flight)
+        m.gauge("admission_active", lambda: self.admission.active)
+        m.gauge("admission_waiting", lambda: self.admission.waiting)
+        m.gauge("background_tasks", lambda: len(self._bg_tasks))
+        m.gauge("cache_entries", lambda: len(self.cache))
+        m.gauge("detail_cache_entries", lambda: len(self.detail_cache))
+        m.gauge("subscription_topics", lambda: len(self.subscriptions.topics))
+        m.gauge("subscription_sessions", lambda: self.subscriptions.subscriber_count())
+        m.gauge("breaker_open", lambda: 0 if self.breaker.state == CircuitBreaker.CLOSED else 1)
+
+    async def _metrics_loop(self):
+        """定期把指标写入 Prometheus 文本格式文件（相对路径基于插件数据目录）"""
+        path = Path(self.metrics_file)
+        if not path.is_absolute():
+            path = self.data_dir / path
+        while True:
+            await asyncio.sleep(self.metrics_interval)
+            try:
+                await self._in_thread(self.metrics.write_prometheus, path)
+            except OSError as e:
+                logger.warning(f"写入指标文件失败: {e}")
+
+    async def _query_log_loop(self):
+        """定期把查询日志缓冲追加写入文件"""
+        while True:
+            await asyncio.sleep(_QUERY_LOG_FLUSH_SECONDS)
+            try:
+                await self._in_thread(self.recorder.write, self.recorder.take())
+            except OSError as e:
+                logger.warning(f"写入查询日志失败: {e}")
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # 兜底：initialize() 未被调用或客户端已被关闭时重新创建
+        if self.client is None or self.client.is_closed:
+            self.client = self._build_http_client()
+        return self.client
+
     @filter.command("mod搜索")
     async def mod_search(self, event: AstrMessageEvent, message: str = ""):
         """搜索3dmmod站上的mod内容"""
@@ -46,127 +305,228 @@ class ModSearchPlugin(Star):
         # 若框架已解析出第一个参数到 message，兜底采用它
         if not keyword and message:
             keyword = str(message).strip()
+        games, keyword = self._split_scope(keyword)
+        keyword, page = self._split_page(keyword)
         if not keyword:
-            yield event.plain_result("请提供搜索关键词！\n使用方法: /mod搜索 <关键词>")
+            yield event.plain_result("请提供搜索关键词！\n使用方法: /mod搜索 [@游戏ID,游戏ID|全部] <关键词> [第N页]")
+            return
+        async for result in self._run_search(event, keyword, page, games):
+            yield result
+
+    @filter.command("mod下一页")
+    async def mod_next_page(self, event: AstrMessageEvent, message: str = ""):
+        """查看上一次搜索结果的下一页"""
+        session = self._get_page_session(event)
+        if session is None:
+            yield event.plain_result("· 没有可翻页的搜索记录（或已过期），请先使用 /mod搜索 <关键词>")
+            return
+        keyword, page, pages, games = session
+        if page >= pages:
+            yield event.plain_result(f"· 关键词 '{keyword}' 的结果已经是最后一页了（共{pages}页）")
+            return
+        async for result in self._run_search(event, keyword, page + 1, games):
+            yield result
+
+    @filter.command("mod批量搜索")
+    async def mod_batch_search(self, event: AstrMessageEvent, message: str = ""):
+        """一次搜索多个关键词（以 | 分隔），合并去重后在一条回复中展示"""
+        raw = (getattr(event, "message_str", "") or "").strip()
+        text = ""
+        for prefix in ["/mod批量搜索", "mod批量搜索", "/mod 批量搜索"]:
+            if raw.startswith(prefix):
+                text = raw[len(prefix):].strip()
+                break
+        if not text and message:
+            text = str(message).strip()
+        keywords = [self._normalize(k) for k in text.replace("｜", "|").split("|") if k.strip()]
+        keywords = list(dict.fromkeys(keywords))
+        if not keywords:
+            yield event.plain_result("请提供搜索关键词！\n使用方法: /mod批量搜索 关键词1 | 关键词2 | 关键词3")
+            return
+        if len(keywords) > _BATCH_MAX_KEYWORDS:
+            yield event.plain_result(f"· 批量搜索一次最多 {_BATCH_MAX_KEYWORDS} 个关键词")
+            return
+        async for result in self._run_batch_search(event, keywords):
+            yield result
+
+    @filter.command("mod详情")
+    async def mod_detail(self, event: AstrMessageEvent, message: str = ""):
+        """查看单个mod的详情与全部资源版本"""
+        raw = (getattr(event, "message_str", "") or "").strip()
+        text = ""
+        for prefix in ["/mod详情", "mod详情", "/mod 详情"]:
+            if raw.startswith(prefix):
+                text = raw[len(prefix):].strip()
+                break
+        if not text and message:
+            text = str(message).strip()
+        # 也接受直接粘贴的链接 https://mod.3dmgame.com/mod/<ID>
+        mod_id = text.rstrip("/").rsplit("/", 1)[-1]
+        if not mod_id.isdigit():
+            yield event.plain_result("请提供mod ID！\n使用方法: /mod详情 <mod ID 或链接>")
             return
         if self.appkey == "{APPKEY}":
             yield event.plain_result("× 插件未配置API密钥，请联系管理员配置后使用")
             return
         try:
-            # V3 API参数适配
-            sort_by_mapping = {
-                "时间排序": "mods_createTime",
-                "下载量排序": "mods_download_cnt",
-                "综合排序": "id"  # 假设id为综合排序
-            }
-            sort_by = sort_by_mapping.get(self.sort_order, self.sort_by)
-            sort_order_api = "desc"
-            # 构建V3 API参数（注意将布尔转换为 0/1）
-            payload_base = {
-                "page": 1,
-                "gameId": self.game_id,
-                "isRecommend": 1 if bool(self.is_recommend) else 0,
-                "sortBy": sort_by,
-                "sortOrder": sort_order_api,
-                "pageSize": int(self.max_results),
-                # 关键词参数，search 为当前验证可用键；保留其它以兼容旧实现
-                "search": keyword,
-                "key": keyword,
-                "keyword": keyword,
-            }
-            
-            headers_auth = {
-                "Authorization": self.appkey,
-                "Content-Type": "application/json",
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-                "Accept": "application/json, text/plain, */*",
-                "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
-                "Cache-Control": "no-cache",
-                "Pragma": "no-cache"
-            }
-            headers_bearer = dict(headers_auth)
-            if not str(self.appkey).lower().startswith("bearer "):
-                headers_bearer["Authorization"] = f"Bearer {self.appkey}"
-            
-            logger.info(f"正在搜索关键词: {keyword}")
-            logger.debug(f"API URL: {self.api_url}")
-            logger.debug(f"请求参数: {payload_base}")
+            status, detail, source = await self._get_detail(event, mod_id)
+        except Overloaded as e:
+            self.metrics.inc("searches_rejected_total", reason="overloaded")
+            logger.warning(f"详情请求被拒绝（系统繁忙）: {e}")
+            yield event.plain_result(f"· {e}")
+            return
+        except Exception as e:
+            logger.error(f"获取mod详情时发生错误: 类型={type(e).__name__}, 消息={e}")
+            yield event.plain_result(f"{self._error_brief(e)}，请稍后重试")
+            return
+        if status == 404 or (status == 200 and detail is None):
+            yield event.plain_result(f"· 未找到ID为 {mod_id} 的mod")
+            return
+        if status != 200:
+            yield event.plain_result(self._status_message(status))
+            return
+        logger.debug(f"mod详情 {mod_id} 来源: {source}")
+        notes = (_STALE_NOTE,) if source == "degraded" else ()
+        for chunk in pack_chunks(self._render_detail(detail, notes), self._message_limit(event)):
+            yield event.plain_result(chunk)
 
-            async def do_request(params: dict, headers: dict):
-                async with httpx.AsyncClient(timeout=15.0) as client:
-                    resp = await client.get(self.api_url, headers=headers, params=params)
-                return resp
+    @filter.command("mod订阅")
+    async def mod_subscribe(self, event: AstrMessageEvent, message: str = ""):
+        """订阅关键词，有新增或更新的mod时推送到当前会话；不带参数时列出本会话的订阅"""
+        raw = (getattr(event, "message_str", "") or "").strip()
+        text = ""
+        for prefix in ["/mod订阅", "mod订阅", "/mod 订阅"]:
+            if raw.startswith(prefix):
+                text = raw[len(prefix):].strip()
+                break
+        if not text and message:
+            text = str(message).strip()
+        session = event.unified_msg_origin
+        if not text:
+            topics = self.subscriptions.of_session(session)
+            if not topics:
+                yield event.plain_result("· 当前会话没有订阅\n使用方法: /mod订阅 [@游戏ID,游戏ID|全部] <关键词>")
+                return
+            lines = [f"▌当前会话的订阅（共{len(topics)}个，每 {self.subscription_interval / 60:g} 分钟检查一次）:"]
+            lines += [f"• {t.keyword}（{self._game_label(t.game_id)}）" for t in topics]
+            yield event.plain_result("\n".join(lines))
+            return
+        if self.subscription_interval <= 0:
+            yield event.plain_result("× 管理员未开启关键词订阅")
+            return
+        if self.appkey == "{APPKEY}":
+            yield event.plain_result("× 插件未配置API密钥，请联系管理员配置后使用")
+            return
+        games, keyword = self._split_scope(text)
+        # 按用户的写法展示，主题按规范化后的关键词合并（与搜索缓存一致）
+        keyword = " ".join(keyword.split())
+        if not keyword:
+            yield event.plain_result("请提供订阅关键词！\n使用方法: /mod订阅 [@游戏ID,游戏ID|全部] <关键词>")
+            return
+        game_ids = [self._game(g) for g in (games or (None,))]
+        owned = len(self.subscriptions.of_session(session))
+        if owned + len(game_ids) > self.subscription_max_per_session:
+            yield event.plain_result(f"· 每个会话最多订阅 {self.subscription_max_per_session} 个关键词（当前 {owned} 个）")
+            return
+        added = []
+        for gid in game_ids:
+            topic, new = self.subscriptions.subscribe(session, keyword, gid)
+            if new:
+                added.append(topic)
+                self._poll_schedule.add(topic.key)
+        if not added:
+            yield event.plain_result(f"· 已经订阅过关键词 '{keyword}'")
+            return
+        await self._in_thread(self.subscriptions.save)
+        self._subs_changed.set()
+        label = "、".join(self._game_label(t.game_id) for t in added)
+        yield event.plain_result(
+            f"✓ 已订阅关键词 '{keyword}'（{label}），有新增或更新的mod时会推送到这里\n"
+            f"  每 {self.subscription_interval / 60:g} 分钟检查一次，退订请发送 /mod退订 {keyword}"
+        )
 
-            # 尝试 1：默认参数 + Authorization 头
-            response = await do_request(payload_base, headers_auth)
-            logger.debug(f"API响应状态码(尝试1): {response.status_code}")
-
-            def get_count(data_obj: dict) -> int:
-                # 形态A：{ data: [ ... ], total? }
-                if isinstance(data_obj.get("data"), list):
-                    return int(data_obj.get("total", len(data_obj.get("data", []))) or 0)
-                # 形态B：{ data: { data: [ ... ], total? } }
-                if isinstance(data_obj.get("data"), dict):
-                    d = data_obj.get("data", {})
-                    if isinstance(d.get("data"), list):
-                        return int(d.get("total", len(d.get("data", []))) or 0)
-                    # 形态C：旧版 { data: { mod: [ ... ], count? } }
-                    return int(d.get("count", len(d.get("mod", []))) or 0)
-                return 0
-
-            data = None
-            if response.status_code == 200:
-                data = response.json()
-                total_cnt = get_count(data)
-                if total_cnt == 0:
-                    # 尝试 2：去掉 gameId（全站搜索）
-                    payload_no_gid = dict(payload_base)
-                    payload_no_gid.pop("gameId", None)
-                    logger.debug("结果为空，尝试去掉 gameId 进行全站搜索")
-                    resp2 = await do_request(payload_no_gid, headers_auth)
-                    if resp2.status_code == 200:
-                        data2 = resp2.json()
-                        if get_count(data2) > 0:
-                            data = data2
-                        else:
-                            # 尝试 3：使用 Bearer 认证
-                            logger.debug("全站搜索仍为空，尝试 Bearer 认证方式")
-                            resp3 = await do_request(payload_base, headers_bearer)
-                            if resp3.status_code == 200:
-                                data3 = resp3.json()
-                                if get_count(data3) > 0:
-                                    data = data3
-                                else:
-                                    # 尝试 4：仅使用 keyword 参数
-                                    payload_kw_only = dict(payload_base)
-                                    payload_kw_only.pop("key", None)
-                                    logger.debug("Bearer 仍为空，尝试仅使用 keyword 参数")
-                                    resp4 = await do_request(payload_kw_only, headers_auth)
-                                    if resp4.status_code == 200:
-                                        data4 = resp4.json()
-                                        if get_count(data4) > 0:
-                                            data = data4
-                # 正常返回（不管是否经过回退），统一格式化
-                if data is not None:
-                    logger.debug(f"API响应数据(最终): {data}")
-                    async for result in self._format_search_results(event, data, keyword):
+    @filter.command("mod退订")
+    async def mod_unsubscribe(self, event: AstrMessageEvent, message: str = ""):
+        """取消当前会话对某个关键词的订阅"""
+        raw = (getattr(event, "message_str", "") or "").strip()
+        keyword = ""
+        for prefix in ["/mod退订", "mod退订", "/mod 退订"]:
+            if raw.startswith(prefix):
+                keyword = raw[len(prefix):].strip()
+                break
+        if not keyword and message:
+            keyword = str(message).strip()
+        if not keyword:
+            yield event.plain_result("请提供要退订的关键词！\n使用方法: /mod退订 <关键词>")
+            return
+        removed = self.subscriptions.unsubscribe(event.unified_msg_origin, keyword)
+        if not removed:
+            yield event.plain_result(f"· 当前会话没有订阅关键词 '{keyword}'")
+            return
+        for topic in removed:
+            if topic.key not in self.subscriptions.topics:
+                self._poll_schedule.discard(topic.key)
+        await self._in_thread(self.subscriptions.save)
+        yield event.plain_result(f"✓ 已退订关键词 '{keyword}'")
+
+    async def _run_search(self, event: AstrMessageEvent, keyword: str, page: int = 1, games: tuple[int, ...] | None = None):
+        """执行一次搜索并输出第 page 页结果；games 为多个游戏时并发查询后合并"""
+        if self.appkey == "{APPKEY}":
+            yield event.plain_result("× 插件未配置API密钥，请联系管理员配置后使用")
+            return
+        started = time.perf_counter()
+        deadline = self._deadline()
+        # 上游收到的也是规范化后的关键词：共用同一缓存键的各种写法必须发出同一个请求，否则缓存内容取决于
+        # 哪种写法先到（如繁体写法在以简体为主的 3DM 站点查不到，空结果会被其它写法复用）；
+        # 别名则本来就要替换成标准词再查询
+        keyword = self._normalize(keyword)
+        if self.recorder is not None:
+            self.recorder.record(keyword, games, page, self._user_key(event), self._group_key(event))
+        try:
+            sort_by = self._api_sort_by()
+            if games is not None and len(games) > 1:
+                async for result in self._run_multi_search(event, keyword, page, games, sort_by, started, deadline):
+                    yield result
+                return
+            game_id = games[0] if games else None
+            # 本地索引已就绪时优先查本地
+            if (self.index is not None and self._game(game_id) == int(self.game_id)
+                    and self._index_crawled_at > 0):
+                mods, total = await self._in_thread(self._search_local, keyword, sort_by, page)
+                if total:
+                    logger.debug(f"命中本地索引: {keyword} ({total})")
+                    self._observe_search("local", started)
+                    self._remember_page(event, keyword, page, total, games)
+                    async for result in self._format_search_results(event, SearchResult(mods, total), keyword, page):
                         yield result
                     return
-            elif response.status_code == 118:
-                logger.error("API返回状态码118，可能是连接被重置或请求被拒绝")
-                yield event.plain_result("× API连接异常，请稍后重试或联系管理员检查网络配置")
-            elif response.status_code == 401:
-                yield event.plain_result("× API密钥无效，请联系管理员检查配置")
-            elif response.status_code == 403:
-                yield event.plain_result("× API访问被拒绝，请检查权限")
-            else:
-                logger.error(f"API请求失败，状态码: {response.status_code}, 响应内容: {response.text}")
-                yield event.plain_result(f"× 搜索失败，API返回状态码: {response.status_code}")
-            # 如果走到这里，说明 200 但没有任何回退拿到结果
-            if data is None and response.status_code == 200:
-                async for result in self._format_search_results(event, {"data": [], "total": 0}, keyword):
-                    yield result
-                        
+            async with self._admit(event, keyword, sort_by, page, game_id, deadline):
+                status, data, source = await self._lookup(keyword, sort_by, page, game_id, deadline)
+            self._observe_search(source, started)
+            if status != 200:
+                yield event.plain_result(self._status_message(status))
+                return
+            degraded = source == "degraded"
+            pages = self._remember_page(event, keyword, page, data.total, games)
+            notes = (_STALE_NOTE,) if degraded else ()
+            async for result in self._format_search_results(event, data, keyword, page, notes=notes):
+                yield result
+            # 当前页发出后，后台预取下一页
+            if self.prefetch_next_page and not degraded and data.mods and page < pages:
+                self._schedule_prefetch(keyword, sort_by, page + 1, game_id)
+
+        except Overloaded as e:
+            self.metrics.inc("searches_rejected_total", reason="overloaded")
+            logger.warning(f"搜索请求被拒绝（系统繁忙）: {e}")
+            yield event.plain_result(f"· {e}")
+        except CircuitOpen as e:
+            self.metrics.inc("searches_rejected_total", reason="circuit_open")
+            logger.warning(f"搜索请求被熔断短路: {e}")
+            yield event.plain_result(f"× 3DM接口暂时不可用，约 {max(1, round(e.retry_in))} 秒后恢复尝试，请稍后再试")
+        except DeadlineExceeded:
+            self.metrics.inc("searches_rejected_total", reason="deadline")
+            logger.warning(f"搜索超过 {self.search_deadline:g} 秒仍无结果，已取消: {keyword}")
+            yield event.plain_result(f"× 3DM接口响应过慢，{self.search_deadline:g} 秒内未取得结果，请稍后重试")
         except httpx.TimeoutException:
             logger.error("API请求超时")
             yield event.plain_result("× 请求超时，请稍后重试或检查网络连接")
@@ -188,198 +548,1426 @@ class ModSearchPlugin(Star):
                 yield event.plain_result(f"× 发生未知错误({error_type})，请稍后重试或联系管理员")
             else:
                 yield event.plain_result(f"× 搜索过程中发生错误: {error_type} - {error_msg}")
-    
-    async def _format_search_results(self, event: AstrMessageEvent, data: dict, keyword: str):
-        """格式化搜索结果"""
+
+    def _admit(
+        self, event: AstrMessageEvent, keyword: str, sort_by: str, page: int, game_id: int | None, deadline: float | None = None
+    ):
+        """缓存未命中、需要访问上游时才占用准入名额，排队时间不超过截止时间"""
+        if self.cache.peek(self._cache_key(keyword, sort_by, page, game_id))[0] is not None:
+            return contextlib.nullcontext()
+        return self.admission.slot(self._user_key(event), self._group_key(event), time_left(deadline))
+
+    def _deadline(self) -> float | None:
+        """本条指令的截止时间（time.monotonic() 时刻），未设置总耗时预算时为 None"""
+        return time.monotonic() + self.search_deadline if self.search_deadline > 0 else None
+
+    async def _lookup(
+        self, keyword: str, sort_by: str, page: int, game_id: int | None = None, deadline: float | None = None
+    ) -> tuple[int, SearchResult | None, str]:
+        """按 缓存 -> 上游 -> 历史结果降级 的顺序取一页结果，返回 (状态码, 结果, 来源)；
+        截止时间前上游仍无结果时同样降级"""
+        key = self._cache_key(keyword, sort_by, page, game_id)
+        self.hot.record(key, (keyword, sort_by, page, game_id))
+        data, state = self.cache.get(key)
+        if state == "miss" and key not in self.cache and self.cache_store is not None:
+            data, state = await self._load_persisted(key)
+        self.metrics.inc("cache_lookups_total", result=state)
+        if state == "stale":
+            # 宽限期内先返回旧数据，后台刷新
+            logger.debug(f"缓存已过期但在宽限期内，后台刷新: {key}")
+            self._schedule_refresh(key, keyword, sort_by, page, game_id)
+        if data is not None:
+            logger.debug(f"命中搜索缓存({state}): {key}")
+            return 200, data, "cache"
         try:
-            # 兼容 V2/V3 的响应结构
-            mods = []
-            total_count = 0
-            if isinstance(data.get("data"), list):
-                # 形态A
-                mods = data.get("data", [])
-                total_count = int(data.get("total", len(mods)) or 0)
-            elif isinstance(data.get("data"), dict):
-                # 形态B 或 形态C
-                d = data.get("data", {})
-                if isinstance(d.get("data"), list):
-                    mods = d.get("data", [])
-                    total_count = int(d.get("total", len(mods)) or 0)
-                else:
-                    # 形态C（旧版）
-                    mods = d.get("mod", [])
-                    total_count = int(d.get("count", len(mods)) or 0)
+            status, data = await self._search_upstream(key, keyword, sort_by, page, game_id, deadline)
+        except (CircuitOpen, DeadlineExceeded, httpx.TransportError) as e:
+            # 上游不可用或超过截止时间：有历史结果时降级返回，否则按原错误处理
+            fallback = await self._last_known(key, keyword, sort_by, page, game_id)
+            if fallback is None:
+                raise
+            logger.warning(f"上游不可用（{type(e).__name__}），返回历史缓存结果: {key}")
+            return 200, fallback, "degraded"
+        if status != 200 and self._upstream_failed(status):
+            fallback = await self._last_known(key, keyword, sort_by, page, game_id)
+            if fallback is not None:
+                logger.warning(f"上游返回 {status}，返回历史缓存结果: {key}")
+                return 200, fallback, "degraded"
+        return status, data, "upstream"
+
+    async def _load_persisted(self, key: tuple) -> tuple[SearchResult | None, str]:
+        """内存缓存未命中时查持久化缓存（未预热的或其它进程写入的条目），载入后按内存缓存的规则判断新鲜度"""
+        try:
+            row = await self._in_thread(self.cache_store.get, key)
+        except sqlite3.Error as e:
+            logger.debug(f"读取持久化缓存失败: {e}")
+            return None, "miss"
+        if row is None:
+            return None, "miss"
+        data, remaining = row
+        self.cache.set(key, data, ttl=min(remaining, self.cache.ttl), dirty=False)
+        self.metrics.inc("persisted_cache_loads_total")
+        return self.cache.get(key)
+
+    async def _cache_persist_loop(self):
+        """打开持久化缓存并按热度预热内存缓存，之后定期刷写新写入或被命中的条目、每小时清理一次"""
+        try:
+            store = await self._in_thread(CacheStore, self.data_dir / "search_cache.db")
+            rows = await self._in_thread(store.hottest, self.cache_warm_entries, self.cache.stale_grace)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"打开持久化缓存失败，仅使用内存缓存: {e}")
+            return
+        self.cache_store = store
+        warmed = 0
+        for key, data, remaining, hits in rows:
+            # 预热期间已经有新结果写入的键保持不变
+            if key not in self.cache:
+                self.cache.set(key, data, ttl=min(remaining, self.cache.ttl), dirty=False)
+                warmed += 1
+            # 重启后主动刷新立即有候选；键为 (关键词, gameId, sortBy, pageSize, isRecommend, 页码)，
+            # 按当前配置重新生成的键不一致（如改过每页条数）的不加入
+            query = (key[0], key[2], key[5], key[1])
+            if hits > 0 and self._cache_key(*query) == key:
+                self.hot.record(key, query, min(hits, _HOT_SEED_MAX))
+        logger.info(f"已从持久化缓存预热 {warmed} 条搜索结果")
+        last_prune = float("-inf")
+        while True:
+            await asyncio.sleep(self.cache_flush_interval)
+            await self._flush_cache()
+            if time.monotonic() - last_prune >= 3600:
+                last_prune = time.monotonic()
+                try:
+                    removed = await self._in_thread(store.prune)
+                except sqlite3.Error as e:
+                    logger.warning(f"清理持久化缓存失败: {e}")
+                    continue
+                if removed:
+                    logger.debug(f"持久化缓存清理 {removed} 条")
+
+    async def _hot_refresh_loop(self):
+        """定期检查最热的查询，缓存将在下次检查前过期的，按限速节奏提前刷新"""
+        check = max(1.0, min(30.0, self.cache.ttl / 4))
+        last_decay = time.monotonic()
+        while True:
+            await asyncio.sleep(check)
+            if time.monotonic() - last_decay >= _HOT_DECAY_SECONDS:
+                self.hot.decay()
+                last_decay = time.monotonic()
+            lead = min(self.hot_refresh_lead, self.cache.ttl / 2) + check
+            for key, count, (keyword, sort_by, page, game_id) in self.hot.top(self.hot_refresh_top):
+                if count < 2:
+                    # 只出现过一次的查询不算热门，后面的更冷
+                    break
+                remaining = self.cache.remaining(key)
+                # 不在缓存中的（如上次查询失败）不主动刷新
+                if remaining is None or remaining > lead or key in self._flight:
+                    continue
+                if self.breaker.state != CircuitBreaker.CLOSED:
+                    break
+                # 等令牌桶有空余令牌再发起，不让主动刷新在限速队列里排到用户请求前面
+                wait = self.limiter.delay()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                try:
+                    await self._search_upstream(key, keyword, sort_by, page, game_id)
+                    self.metrics.inc("hot_refreshes_total", result="ok")
+                except (Overloaded, CircuitOpen, DeadlineExceeded, httpx.HTTPError) as e:
+                    self.metrics.inc("hot_refreshes_total", result="error")
+                    logger.debug(f"主动刷新热门查询失败: {key} ({type(e).__name__})")
+
+    async def _flush_cache(self):
+        """把自上次刷写以来新写入或被命中的缓存条目写入持久化缓存"""
+        if self.cache_store is None:
+            return
+        rows = self.cache.drain()
+        if not rows:
+            return
+        try:
+            await self._in_thread(self.cache_store.put_many, rows)
+        except sqlite3.Error as e:
+            logger.warning(f"刷写持久化缓存失败: {e}")
+
+    async def _run_multi_search(
+        self, event: AstrMessageEvent, keyword: str, page: int, games: tuple[int, ...], sort_by: str, started: float,
+        deadline: float | None = None,
+    ):
+        """多游戏并发搜索：各游戏取前 page 页，按排序键做 k 路堆合并，只展示全局第 page 页"""
+        if page > _MULTI_MAX_PAGE:
+            yield event.plain_result(f"· 多游戏搜索最多查看前 {_MULTI_MAX_PAGE} 页")
+            return
+        jobs = [(g, p) for g in games for p in range(1, page + 1)]
+        async with self.admission.slot(self._user_key(event), self._group_key(event), time_left(deadline)):
+            outcomes = await asyncio.gather(
+                *(self._lookup(keyword, sort_by, p, g, deadline) for g, p in jobs), return_exceptions=True
+            )
+        per_game: dict[int, list[ModRecord]] = {g: [] for g in games}
+        totals: dict[int, int] = {}
+        failed: dict[int, object] = {}
+        degraded = False
+        for (g, p), outcome in zip(jobs, outcomes):
+            if isinstance(outcome, asyncio.CancelledError):
+                raise outcome
+            if isinstance(outcome, BaseException):
+                logger.warning(f"游戏 {g} 第 {p} 页搜索失败: {type(outcome).__name__} - {outcome}")
+                failed.setdefault(g, outcome)
+                continue
+            status, data, source = outcome
+            if status != 200 or data.error:
+                failed.setdefault(g, status if status != 200 else data.error)
+                continue
+            degraded = degraded or source == "degraded"
+            per_game[g].extend(data.mods)
+            totals.setdefault(g, data.total)
+        ok_games = [g for g in games if g not in failed]
+        if not ok_games:
+            # 全部失败：按第一个游戏的错误回复
+            first = failed[games[0]]
+            if isinstance(first, BaseException):
+                raise first
+            yield event.plain_result(self._status_message(first) if isinstance(first, int) else f"× 搜索失败: {first}")
+            return
+        self._observe_search("degraded" if degraded else "multi", started)
+
+        # 各游戏的结果先按排序键排好，再 k 路合并；综合排序没有可比较的分值，按各游戏内名次交替
+        sort_key = self._local_sort_key()
+        streams = []
+        game_of: dict = {}
+        for g in ok_games:
+            mods = per_game[g]
+            for mod in mods:
+                game_of[id(mod)] = self._game_label(g)
+            if sort_key is not None:
+                streams.append(sorted(((sort_key(m), m) for m in mods), key=itemgetter(0), reverse=True))
             else:
-                # 旧接口错误码处理
-                code = data.get("code")
-                if code is not None and str(code) not in ("00", "0"):
-                    error_msg = data.get("message", "API返回错误")
-                    yield event.plain_result(f"× 搜索失败: {error_msg}")
-                    return
-            if not mods:
-                yield event.plain_result(f"· 未找到关键词 '{keyword}' 相关的mod内容")
-                return
-            # 可选：按更新时间进行本地排序（优先资源的最新时间，其次更新字段，最后创建时间）
-            def parse_time(s: str) -> float:
-                if not s:
-                    return 0.0
+                streams.append([(-rank, m) for rank, m in enumerate(mods)])
+        offset = (page - 1) * int(self.max_results)
+        merged = heapq.merge(*streams, key=itemgetter(0), reverse=True)
+        shown = [m for _, m in itertools.islice(merged, offset, offset + int(self.max_results))]
+
+        total = sum(totals.get(g, 0) for g in ok_games)
+        pages = self._remember_page(event, keyword, page, total, games)
+        notes = []
+        if failed:
+            notes.append("▌注意: 以下游戏查询失败，未包含在结果中: " + "、".join(self._game_label(g) for g in failed))
+        if degraded:
+            notes.append(_STALE_NOTE)
+        label = "、".join(self._game_label(g) for g in games)
+        async for result in self._format_search_results(
+            event, SearchResult(shown, total), keyword, page, notes=notes, game_of=game_of, scope=label, presorted=True
+        ):
+            yield result
+        if self.prefetch_next_page and not degraded and shown and page < min(pages, _MULTI_MAX_PAGE):
+            for g in ok_games:
+                self._schedule_prefetch(keyword, sort_by, page + 1, g)
+
+    async def _run_batch_search(self, event: AstrMessageEvent, keywords: list[str]):
+        """并发搜索多个关键词的第一页，跨关键词去重后合并为一条紧凑回复"""
+        if self.appkey == "{APPKEY}":
+            yield event.plain_result("× 插件未配置API密钥，请联系管理员配置后使用")
+            return
+        if self.recorder is not None:
+            for keyword in keywords:
+                self.recorder.record(keyword, None, 1, self._user_key(event), self._group_key(event))
+        deadline = self._deadline()
+        sort_by = self._api_sort_by()
+        local_ready = self.index is not None and self._index_crawled_at > 0
+
+        # 每个要访问上游的关键词各跑一条回退链，按其个数占用准入名额（用户/群仍按一条指令计）；全部命中缓存时不占。
+        # 名额最多 max_active 个，同时进行的查询数也不超过占到的名额
+        misses = sum(self.cache.peek(self._cache_key(k, sort_by))[0] is None for k in keywords)
+        lanes = asyncio.Semaphore(max(1, min(misses, self.admission.max_active)))
+
+        async def one(keyword: str) -> tuple[int, SearchResult | None, str]:
+            started = time.perf_counter()
+            if local_ready:
+                mods, total = await self._in_thread(self._search_local, keyword, sort_by)
+                if total:
+                    self._observe_search("local", started)
+                    return 200, SearchResult(mods, total), "local"
+            async with lanes:
+                status, data, source = await self._lookup(keyword, sort_by, 1, deadline=deadline)
+            self._observe_search(source, started)
+            return status, data, source
+
+        if not misses:
+            admit = contextlib.nullcontext()
+        else:
+            admit = self.admission.slot(
+                self._user_key(event), self._group_key(event), time_left(deadline), weight=misses
+            )
+        try:
+            async with admit:
+                outcomes = await asyncio.gather(*(one(k) for k in keywords), return_exceptions=True)
+        except Overloaded as e:
+            self.metrics.inc("searches_rejected_total", reason="overloaded")
+            logger.warning(f"批量搜索被拒绝（系统繁忙）: {e}")
+            yield event.plain_result(f"· {e}")
+            return
+
+        # 第一遍：按关键词顺序确定每个mod首次出现的位置，记录其余匹配的关键词
+        sort_key = self._local_sort_key()
+        sections = []
+        also: dict = {}
+        seen: set = set()
+        degraded = False
+        for keyword, outcome in zip(keywords, outcomes):
+            if isinstance(outcome, asyncio.CancelledError):
+                raise outcome
+            if isinstance(outcome, BaseException):
+                logger.warning(f"批量搜索关键词 '{keyword}' 失败: {type(outcome).__name__} - {outcome}")
+                sections.append((keyword, self._error_brief(outcome), []))
+                continue
+            status, data, source = outcome
+            if status != 200:
+                sections.append((keyword, self._status_message(status), []))
+                continue
+            if data.error:
+                sections.append((keyword, f"× 搜索失败: {data.error}", []))
+                continue
+            degraded = degraded or source == "degraded"
+            if sort_key is not None:
+                top = heapq.nlargest(int(self.max_results), data.mods, key=sort_key)
+            else:
+                top = data.mods[:self.max_results]
+            if not top:
+                sections.append((keyword, "未找到相关mod", []))
+                continue
+            fresh = []
+            for mod in top:
+                ident = mod.mod_id or id(mod)
+                if ident in seen:
+                    also.setdefault(ident, []).append(keyword)
+                    continue
+                seen.add(ident)
+                fresh.append(mod)
+            summary = f"找到 {data.total} 个" + ("" if fresh else "，结果均已在上方列出")
+            sections.append((keyword, summary, fresh))
+
+        # 第二遍：渲染；重复的mod只在首次出现处展示，并注明同时匹配的关键词
+        def parts():
+            yield (
+                "▌3DMGame Mod批量搜索结果\n"
+                f"▌关键词: {'、'.join(keywords)}（去重后共 {len(seen)} 个mod） - 按{self.sort_order}"
+                + (f"\n{_STALE_NOTE}" if degraded else "")
+            )
+            for keyword, summary, mods in sections:
+                yield f"\n▌{keyword}: {summary}"
+                for i, mod in enumerate(mods, 1):
+                    yield self._render_mod_brief(i, mod, also.get(mod.mod_id or id(mod)))
+            yield "\n▌查看单个关键词的完整信息请用 /mod搜索 <关键词>"
+
+        for chunk in pack_chunks(parts(), self._message_limit(event)):
+            yield event.plain_result(chunk)
+
+    @staticmethod
+    def _error_brief(error: BaseException) -> str:
+        """批量搜索中单个关键词失败时的简短说明"""
+        if isinstance(error, CircuitOpen):
+            return "× 3DM接口暂时不可用"
+        if isinstance(error, (httpx.TimeoutException, DeadlineExceeded)):
+            return "× 请求超时"
+        if isinstance(error, httpx.ConnectError):
+            return "× 网络连接失败"
+        return f"× 搜索出错({type(error).__name__})"
+
+    async def _get_detail(self, event: AstrMessageEvent, mod_id: str) -> tuple[int, ModDetail | None, str]:
+        """按 详情缓存 -> 本地索引 -> 上游（条件请求）-> 历史详情降级 的顺序取 mod 详情，返回 (状态码, 详情, 来源)"""
+        deadline = self._deadline()
+        detail, state = self.detail_cache.get(mod_id)
+        self.metrics.inc("detail_lookups_total", result=state)
+        if detail is not None:
+            return 200, detail, "cache"
+        previous = self.detail_cache.last_known(mod_id)
+        if previous is None and self.index is not None:
+            row = await self._in_thread(self.index.get, int(mod_id))
+            if row is not None:
+                detail = ModDetail.from_dict(row[0], row[1])
+                self.detail_cache.set(mod_id, detail)
+                return 200, detail, "local"
+        try:
+            async with self.admission.slot(self._user_key(event), self._group_key(event), time_left(deadline)):
+                status, detail = await self._flight.do(
+                    ("detail", mod_id), lambda: self._fetch_detail(mod_id, previous, deadline), time_left(deadline)
+                )
+        except asyncio.TimeoutError:
+            if previous is None:
+                raise DeadlineExceeded(f"获取mod详情超过 {self.search_deadline:g} 秒") from None
+            logger.warning(f"获取mod详情超过截止时间，返回历史详情: {mod_id}")
+            return 200, previous, "degraded"
+        except (CircuitOpen, DeadlineExceeded, httpx.TransportError) as e:
+            if previous is None:
+                raise
+            logger.warning(f"上游不可用（{type(e).__name__}），返回历史详情: {mod_id}")
+            return 200, previous, "degraded"
+        if status != 200 and previous is not None and self._upstream_failed(status):
+            logger.warning(f"上游返回 {status}，返回历史详情: {mod_id}")
+            return 200, previous, "degraded"
+        return status, detail, "upstream"
+
+    async def _fetch_detail(
+        self, mod_id: str, previous: ModDetail | None, deadline: float | None = None
+    ) -> tuple[int, ModDetail | None]:
+        """请求详情接口；已有带校验字段的旧详情时发条件请求，304 只续期不重新解析"""
+        headers = self._build_headers()
+        if previous is not None:
+            if previous.etag:
+                headers["If-None-Match"] = previous.etag
+            if previous.last_modified:
+                headers["If-Modified-Since"] = previous.last_modified
+        resp = await self._upstream_get(f"{self.api_url}/{mod_id}", {}, headers, stage="detail", deadline=deadline)
+        if resp.status_code == 304 and previous is not None:
+            self.metrics.inc("detail_lookups_total", result="not_modified")
+            self.detail_cache.set(mod_id, previous)
+            return 200, previous
+        if resp.status_code != 200:
+            logger.error(f"获取mod详情失败，状态码: {resp.status_code}")
+            return resp.status_code, None
+        raw = extract_detail(resp.json())
+        if raw is None:
+            return 404, None
+        detail = ModDetail.from_dict(
+            raw,
+            previous.game_id if previous is not None else None,
+            resp.headers.get("ETag", ""),
+            resp.headers.get("Last-Modified", ""),
+        )
+        self.detail_cache.set(mod_id, detail)
+        if self.index is not None and detail.game_id:
+            # 顺带更新本地索引中的记录与资源版本
+            await self._in_thread(self._store_mods, [raw], detail.game_id)
+        return 200, detail
+
+    def _seed_details(self, mods: list[ModRecord], game_id: int | None = None):
+        """把搜索结果中的记录放入详情缓存；已有带校验字段的条目时保留，留给条件请求刷新"""
+        gid = self._game(game_id) or None
+        for mod in mods:
+            if not mod.mod_id:
+                continue
+            key = str(mod.mod_id)
+            current = self.detail_cache.last_known(key)
+            if current is not None and current.validators:
+                continue
+            self.detail_cache.set(key, ModDetail(mod, current.description if current is not None else "", gid))
+
+    async def _subscription_loop(self):
+        """按调度表轮询到期的订阅主题；订阅变化时被唤醒，重新计算等待时间"""
+        while True:
+            self._subs_changed.clear()
+            due = self._poll_schedule.next_due()
+            timeout = None if due is None else max(0.0, due - time.monotonic())
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._subs_changed.wait(), timeout)
+            for key in self._poll_schedule.pop_due():
+                topic = self.subscriptions.topics.get(key)
+                if topic is None:
+                    self._poll_schedule.discard(key)
+                    continue
                 try:
-                    ss = str(s).strip()
-                    # ISO 8601：2025-09-12T05:55:54.736Z
-                    if "T" in ss:
-                        # 去掉尾部 Z
-                        if ss.endswith("Z"):
-                            ss = ss[:-1]
-                        # 带毫秒
-                        try:
-                            dt = datetime.fromisoformat(ss)
-                            return dt.timestamp()
-                        except Exception:
-                            pass
-                        # 兜底：仅取日期部分
-                        try:
-                            return datetime.strptime(ss.split("T", 1)[0], "%Y-%m-%d").timestamp()
-                        except Exception:
-                            return 0.0
-                    # 常见日期：YYYY-MM-DD 或 YYYY/MM/DD
-                    for fmt in ("%Y-%m-%d", "%Y/%m/%d"):
-                        try:
-                            return datetime.strptime(ss.split(" ", 1)[0], fmt).timestamp()
-                        except Exception:
-                            continue
-                except Exception:
-                    return 0.0
-                return 0.0
-
-            def latest_resource_time(mod: dict) -> str:
+                    await self._poll_topic(topic)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"订阅轮询出错: {topic.keyword} ({type(e).__name__}: {e})")
+
+    async def _poll_topic(self, topic: Topic):
+        """轮询一个主题：按更新时间倒序取第一页，与已见记录比较，新结果推送给全部订阅会话"""
+        sort_by = "mods_updateTime"
+        key = self._cache_key(topic.norm, sort_by, 1, topic.game_id)
+        data, state = self.cache.get(key)
+        if state != "fresh":
+            try:
+                status, data = await self._search_upstream(key, topic.norm, sort_by, 1, topic.game_id)
+            except (Overloaded, CircuitOpen, DeadlineExceeded, httpx.HTTPError) as e:
+                # 下个周期再试
+                logger.debug(f"订阅轮询失败: {topic.keyword} ({type(e).__name__})")
+                self.metrics.inc("subscription_polls_total", result="error")
+                return
+            if status != 200 or data.error:
+                self.metrics.inc("subscription_polls_total", result="error")
+                return
+        hits = topic.diff(data.mods, self.subscriptions.max_seen)
+        self.metrics.inc("subscription_polls_total", result="hit" if hits else "ok")
+        await self._in_thread(self.subscriptions.save)
+        if hits:
+            await self._notify_subscribers(topic, hits)
+
+    async def _notify_subscribers(self, topic: Topic, hits: list[ModRecord]):
+        scope = "" if topic.game_id == int(self.game_id) else f"（{self._game_label(topic.game_id)}）"
+
+        def parts():
+            yield f"▌订阅更新: {topic.keyword}{scope} - {len(hits)} 个新增或更新的mod"
+            for i, mod in enumerate(hits[:int(self.max_results)], 1):
+                yield self._render_mod_brief(i, mod)
+            yield f"▌退订请发送 /mod退订 {topic.keyword}"
+
+        for session in list(topic.sessions):
+            # 会话标识为 "平台:消息类型:会话ID"，按平台取单条消息上限
+            limit = self.platform_limits.get(session.split(":", 1)[0].lower(), self.message_max_chars)
+            try:
+                for chunk in pack_chunks(parts(), limit):
+                    await self.context.send_message(session, MessageChain().message(chunk))
+                    self.metrics.inc("subscription_notifications_total")
+            except Exception as e:
+                logger.warning(f"订阅推送失败: {session} ({type(e).__name__}: {e})")
+
+    def _game(self, game_id: int | None) -> int:
+        return int(self.game_id) if game_id is None else int(game_id)
+
+    def _game_label(self, game_id: int) -> str:
+        if int(game_id) == 0:
+            return "全站"
+        name = self.games.get(int(game_id))
+        return f"{name}({game_id})" if name else f"游戏{game_id}"
+
+    @staticmethod
+    def _parse_games(text: str) -> dict[int, str]:
+        """解析 “261=巫师3, 1234” 形式的游戏列表，返回 {游戏ID: 名称}"""
+        games: dict[int, str] = {}
+        for item in str(text or "").replace("，", ",").split(","):
+            gid, _, name = item.partition("=")
+            gid = gid.strip()
+            if gid.isdigit():
+                games[int(gid)] = name.strip()
+        return games
+
+    def _split_scope(self, text: str) -> tuple[tuple[int, ...] | None, str]:
+        """拆出开头的搜索范围：“@261,1234 武器包” 或 “全部 武器包”；没有范围时返回 None"""
+        parts = text.split(None, 1)
+        if not parts:
+            return None, text
+        token = parts[0].lstrip("@＠")
+        rest = parts[1].strip() if len(parts) == 2 else ""
+        if token == "全部":
+            # 全部 = 配置的游戏列表；未配置时为不带 gameId 的全站搜索
+            return (tuple(self.games) or (0,))[:_MULTI_MAX_GAMES], rest
+        if parts[0][0] in "@＠":
+            ids = [t.strip() for t in token.replace("，", ",").split(",")]
+            if ids and all(t.isdigit() for t in ids):
+                return tuple(dict.fromkeys(int(t) for t in ids))[:_MULTI_MAX_GAMES], rest
+        return None, text
+
+    def _observe_search(self, source: str, started: float):
+        self.metrics.inc("searches_total", source=source)
+        self.metrics.observe("search_seconds", time.perf_counter() - started, source=source)
+
+    @staticmethod
+    def _split_page(text: str) -> tuple[str, int]:
+        """拆出末尾的页码标记：“武器包 第2页” -> (“武器包”, 2)；没有页码标记时为第 1 页"""
+        m = _PAGE_MARKER.search(text)
+        if m is None:
+            return text, 1
+        page = int(m.group(1))
+        if page < 1:
+            return text, 1
+        return text[:m.start()].strip(), page
+
+    def _page_count(self, total: int) -> int:
+        size = max(1, int(self.max_results))
+        return max(1, (int(total) + size - 1) // size)
+
+    @staticmethod
+    def _user_key(event: AstrMessageEvent) -> str:
+        try:
+            return str(event.get_sender_id() or "")
+        except Exception:
+            return ""
+
+    @staticmethod
+    def _group_key(event: AstrMessageEvent) -> str:
+        try:
+            return str(event.get_group_id() or "")
+        except Exception:
+            return ""
+
+    @classmethod
+    def _session_key(cls, event: AstrMessageEvent) -> str:
+        # 按 会话(群/私聊) + 发送者 区分翻页记录
+        origin = getattr(event, "unified_msg_origin", "") or ""
+        return f"{origin}|{cls._user_key(event)}"
+
+    def _remember_page(
+        self, event: AstrMessageEvent, keyword: str, page: int, total: int, games: tuple[int, ...] | None = None
+    ) -> int:
+        """记录翻页会话，返回总页数"""
+        pages = self._page_count(total)
+        key = self._session_key(event)
+        self._page_sessions.pop(key, None)
+        self._page_sessions[key] = (keyword, page, pages, games, time.monotonic() + self.page_session_ttl)
+        while len(self._page_sessions) > 1024:
+            self._page_sessions.popitem(last=False)
+        return pages
+
+    def _get_page_session(self, event: AstrMessageEvent) -> tuple[str, int, int, tuple[int, ...] | None] | None:
+        key = self._session_key(event)
+        session = self._page_sessions.get(key)
+        if session is None:
+            return None
+        keyword, page, pages, games, expires = session
+        if time.monotonic() >= expires:
+            self._page_sessions.pop(key, None)
+            return None
+        return keyword, page, pages, games
+
+    def _schedule_prefetch(self, keyword: str, sort_by: str, page: int, game_id: int | None = None):
+        key = self._cache_key(keyword, sort_by, page, game_id)
+        if key in self._flight or self.cache.peek(key)[1] == "fresh":
+            return
+
+        async def prefetch():
+            try:
+                await self._search_upstream(key, keyword, sort_by, page, game_id)
+                logger.debug(f"已预取下一页: {key}")
+            except Exception as e:
+                logger.debug(f"预取下一页失败: {type(e).__name__} - {e}")
+
+        self._start_background(prefetch())
+
+    def _api_sort_by(self) -> str:
+        # V3 API参数适配
+        sort_by_mapping = {
+            "时间排序": "mods_createTime",
+            "下载量排序": "mods_download_cnt",
+            "综合排序": "id"  # 假设id为综合排序
+        }
+        return sort_by_mapping.get(self.sort_order, self.sort_by)
+
+    def _cache_key(self, keyword: str, sort_by: str, page: int = 1, game_id: int | None = None) -> tuple:
+        """规范化的缓存键：(关键词, gameId, sortBy, pageSize, isRecommend, 页码)"""
+        return (
+            self.normalizer(keyword),
+            self._game(game_id),
+            sort_by,
+            int(self.max_results),
+            1 if bool(self.is_recommend) else 0,
+            int(page),
+        )
+
+    def _normalize(self, keyword: str) -> str:
+        """规范化用户输入的关键词，并统计被改写的次数"""
+        normalized = self.normalizer(keyword)
+        if normalized != keyword.strip():
+            self.metrics.inc("queries_normalized_total")
+        return normalized
+
+    def _status_message(self, status: int) -> str:
+        if status == 118:
+            return "× API连接异常，请稍后重试或联系管理员检查网络配置"
+        if status == 401:
+            return "× API密钥无效，请联系管理员检查配置"
+        if status == 403:
+            return "× API访问被拒绝，请检查权限"
+        if status == 429:
+            return "× 请求过于频繁，已被API限流，请稍后再试"
+        return f"× 搜索失败，API返回状态码: {status}"
+
+    @staticmethod
+    def _upstream_failed(status: int) -> bool:
+        """计入熔断的失败状态：5xx 与连接被重置类的 118"""
+        return status >= 500 or status == 118
+
+    async def _last_known(
+        self, key: tuple, keyword: str, sort_by: str, page: int, game_id: int | None = None
+    ) -> SearchResult | None:
+        """上游不可用时的降级数据：最近一次的缓存结果，其次是本地索引（即使尚未爬取完成）"""
+        data = self.cache.last_known(key)
+        if data is not None and not data.error:
+            return data
+        if self.index is not None and self._game(game_id) == int(self.game_id):
+            mods, total = await self._in_thread(self._search_local, keyword, sort_by, page)
+            if mods:
+                return SearchResult(mods, total)
+        return None
+
+    def _schedule_refresh(self, key: tuple, keyword: str, sort_by: str, page: int = 1, game_id: int | None = None):
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        async def refresh():
+            try:
+                await self._search_upstream(key, keyword, sort_by, page, game_id)
+            except Exception as e:
+                logger.warning(f"后台刷新缓存失败: {type(e).__name__} - {e}")
+            finally:
+                self._refreshing.discard(key)
+
+        self._start_background(refresh())
+
+    async def _in_thread(self, fn, *args):
+        """在线程池中执行阻塞调用并登记；调用方被取消时线程里的调用照常跑完，由 terminate() 等待"""
+        job = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+        self._thread_jobs.add(job)
+        job.add_done_callback(self._thread_jobs.discard)
+        return await asyncio.shield(job)
+
+    def _start_background(self, coro) -> asyncio.Task:
+        """启动后台任务并登记，terminate() 时统一取消"""
+        task = asyncio.create_task(coro)
+        self._bg_tasks.add(task)
+        task.add_done_callback(self._bg_tasks.discard)
+        return task
+
+    def _search_local(self, keyword: str, sort_by: str, page: int = 1) -> tuple[list[ModRecord], int]:
+        """查询本地索引：优先用内存倒排索引排序，无法处理的查询（如单字）退回 SQLite"""
+        limit = int(self.max_results)
+        offset = (int(page) - 1) * limit
+        if self.ngram is not None and len(self.ngram):
+            sort = {"mods_download_cnt": "downloads", "mods_createTime": "time"}.get(sort_by, "relevance")
+            ranked = self.ngram.search(keyword, limit, sort=sort, offset=offset)
+            if ranked is not None:
+                ids, total = ranked
+                return [ModRecord.from_dict(m) for m in self.index.get_many(ids)], total
+        mods, total = self.index.search(keyword, self.game_id, limit, sort_by, offset=offset)
+        return [ModRecord.from_dict(m) for m in mods], total
+
+    def _store_mods(self, mods: list, game_id: int) -> int:
+        """写入 SQLite 并同步到内存倒排索引（在线程中调用）"""
+        stored = self.index.upsert(mods, game_id)
+        if self.ngram is not None and game_id == self.game_id:
+            rows = []
+            for mod in mods:
+                rec = ModRecord.from_dict(mod)
                 try:
-                    res = mod.get("mods_resource", [])
-                    if not res:
-                        return ""
-                    # 优先 latest_version
-                    latest = None
-                    for r in res:
-                        if r.get("mods_resource_latest_version"):
-                            latest = r
-                            break
-                    if not latest:
-                        # 按资源创建时间取最大
-                        latest = max(res, key=lambda x: parse_time(x.get("mods_resource_createTime", "")))
-                    return latest.get("mods_resource_createTime", "") or ""
-                except Exception:
-                    return ""
-
-            def pick_publish_time(mod: dict) -> str:
-                pt = mod.get("createTime", mod.get("mods_createTime", ""))
-                if pt:
-                    return pt
-                # 兜底用资源时间
-                return latest_resource_time(mod)
-
-            def pick_update_time(mod: dict) -> str:
-                ut = mod.get("updateTime", mod.get("mods_updateTime", ""))
-                if ut:
-                    return ut
-                # 若无显式更新时间，使用资源最新创建时间
-                res_t = latest_resource_time(mod)
-                if res_t:
-                    return res_t
-                # 最后回退到创建时间
-                return mod.get("createTime", mod.get("mods_createTime", ""))
-
-            # 如果用户选择“时间排序”，则按更新时间本地排序，保证最近更新靠前
-            if self.sort_order == "时间排序" and mods:
-                mods.sort(key=lambda m: parse_time(pick_update_time(m)), reverse=True)
-
-            # 构建结果消息
-            sort_desc = f" - 按{self.sort_order}"
-            result_lines = [
-                f"▌3DMGame Mod搜索结果",
-                f"▌关键词: {keyword}",
-                f"▌找到 {len(mods)} 个相关mod (总计{total_count}个){sort_desc}\n"
-            ]
-            
-            for i, mod in enumerate(mods[:self.max_results], 1):
-                title = mod.get("title", mod.get("mods_title", "未知标题"))
-                author = mod.get("author", mod.get("mods_author", mod.get("user_nickName", "未知作者")))
-                publish_time = pick_publish_time(mod)
-                update_time = pick_update_time(mod)
-                mod_id = mod.get("id", mod.get("mods_id", ""))
-                downloads = mod.get("downloadCnt", mod.get("mods_download_cnt", 0))
-                size = mod.get("size", mod.get("mods_resource_size", ""))
-                if not size:
-                    try:
-                        res = mod.get("mods_resource", [])
-                        if res and isinstance(res, list):
-                            size = res[0].get("mods_resource_size", "")
-                    except Exception:
-                        pass
-                if not size:
-                    size = "未知大小"
-                # 格式化发布时间
-                if publish_time:
-                    try:
-                        s = str(publish_time)
-                        formatted_pub = s.split("T", 1)[0] if "T" in s else s.split(" ", 1)[0]
-                    except Exception:
-                        formatted_pub = str(publish_time)
+                    rows.append((int(rec.mod_id), rec.title, rec.author, rec.downloads, rec.update_ts))
+                except (TypeError, ValueError):
+                    continue
+            self.ngram.add_many(rows)
+        return stored
+
+    async def _crawl_loop(self):
+        """加载内存倒排索引后，每 index_sync_minutes 增量同步一次，每 index_refresh_hours 完整爬取一次"""
+        rows = await self._in_thread(self.index.rows_for_ranking, self.game_id)
+        await self._in_thread(self.ngram.add_many, rows)
+        logger.debug(f"内存倒排索引已加载 {len(self.ngram)} 条")
+        self._index_crawled_at = await self._in_thread(self.index.crawled_at, self.game_id)
+        full_interval = max(1.0, self.index_refresh_hours * 3600)
+        sync_interval = max(60.0, self.index_sync_minutes * 60)
+        while True:
+            try:
+                if self._index_incomplete or self._index_crawled_at + full_interval <= time.time():
+                    await self._crawl_index(self.game_id)
                 else:
-                    formatted_pub = "未知时间"
-                # 格式化更新时间
-                if update_time:
-                    try:
-                        su = str(update_time)
-                        formatted_upd = su.split("T", 1)[0] if "T" in su else su.split(" ", 1)[0]
-                    except Exception:
-                        formatted_upd = str(update_time)
+                    await self._sync_index(self.game_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"本地索引同步失败: {type(e).__name__} - {e}")
+            await asyncio.sleep(sync_interval)
+
+    async def _fetch_page(self, game_id: int, page: int, sort_by: str = "mods_createTime") -> tuple[list, int]:
+        """拉取不带关键词的一页 mod 列表，返回 (mod 列表, 总数)"""
+        params = {
+            "page": page,
+            "gameId": game_id,
+            "sortBy": sort_by,
+            "sortOrder": "desc",
+            "pageSize": self.index_page_size,
+        }
+        # 后台爬取不设等待上限，按令牌桶节奏慢慢翻页
+        resp = await self._upstream_get(self.api_url, params, self._build_headers(), max_wait=None, stage="crawl")
+        resp.raise_for_status()
+        mods, total, _ = extract_mods(resp.json())
+        return mods, total
+
+    async def _sync_index(self, game_id: int) -> int:
+        """增量同步：按更新时间倒序翻页，遇到早于水位的记录即停止，只写入变化的 mod，返回写入条数"""
+        async with self._index_lock:
+            watermark = await self._in_thread(self.index.watermark, game_id)
+            if watermark <= 0:
+                return await self._crawl_index_locked(game_id)
+            stored = 0
+            page = 1
+            while page <= self.index_sync_max_pages:
+                mods, total = await self._fetch_page(game_id, page, sort_by="mods_updateTime")
+                # 与水位相同的记录也重新写入，避免漏掉同一秒内的更新
+                changed = [m for m in mods if mod_update_ts(m) >= watermark]
+                if changed:
+                    stored += await self._in_thread(self._store_mods, changed, game_id)
+                if len(changed) < len(mods) or not mods or page * self.index_page_size >= total:
+                    break
+                page += 1
+            logger.debug(f"本地索引增量同步: gameId={game_id}, 请求 {page} 页, 更新 {stored} 条")
+            return stored
+
+    async def _crawl_index(self, game_id: int) -> int:
+        async with self._index_lock:
+            return await self._crawl_index_locked(game_id)
+
+    async def _crawl_index_locked(self, game_id: int) -> int:
+        """以有限并发分页爬取 game_id 下的全部 mod 并写入本地索引，返回写入条数。
+
+        失败的页在每轮末尾统一重试；重试后仍有页失败时照样记录爬取时间，已写入的部分可用于本地搜索，
+        下个同步周期再重新完整爬取
+        """
+        started = time.monotonic()
+        mods, total = await self._fetch_page(game_id, 1)
+        stored = await self._in_thread(self._store_mods, mods, game_id)
+        pages = (total + self.index_page_size - 1) // self.index_page_size
+        sem = asyncio.Semaphore(max(1, self.index_concurrency))
+
+        async def crawl_page(page: int) -> int:
+            async with sem:
+                page_mods, _ = await self._fetch_page(game_id, page)
+            return await self._in_thread(self._store_mods, page_mods, game_id)
+
+        pending = list(range(2, pages + 1))
+        pause = 0.0
+        for round_no in range(_CRAWL_PAGE_ROUNDS):
+            if not pending:
+                break
+            if pause > 0:
+                # 熔断中时等到恢复尝试的时刻，否则指数抖动退避后再重试失败的页
+                await asyncio.sleep(pause)
+                pause = 0.0
+            failed = []
+            outcomes = await asyncio.gather(*(crawl_page(p) for p in pending), return_exceptions=True)
+            for page, outcome in zip(pending, outcomes):
+                if isinstance(outcome, Exception):
+                    logger.debug(f"爬取第 {page} 页失败: {type(outcome).__name__} - {outcome}")
+                    failed.append(page)
+                    if isinstance(outcome, CircuitOpen):
+                        pause = max(pause, outcome.retry_in)
                 else:
-                    formatted_upd = formatted_pub
-                # 构建下载链接
-                download_link = f"https://mod.3dmgame.com/mod/{mod_id}" if mod_id else "链接不可用"
-                result_lines.append(
-                    f"• {i}. {title}\n"
-                    f"  作者: {author}\n"
-                    f"  发布: {formatted_pub}\n"
-                    f"  更新: {formatted_upd}\n"
-                    f"  下载: {downloads}\n"
-                    f"  大小: {size}\n"
-                    f"  链接: {download_link}\n"
+                    stored += outcome
+            pending = failed
+            pause = max(pause, backoff_delay(round_no, base=1.0))
+        self._index_incomplete = bool(pending)
+        self._index_crawled_at = await self._in_thread(self.index.mark_crawled, game_id)
+        if pending:
+            logger.warning(
+                f"本地索引爬取部分完成: gameId={game_id}, 共 {stored} 条, {len(pending)} 页多次失败，下个同步周期重新爬取"
+            )
+        else:
+            logger.info(f"本地索引爬取完成: gameId={game_id}, 共 {stored} 条, 耗时 {time.monotonic() - started:.1f}s")
+        return stored
+
+    async def _search_upstream(
+        self, key: tuple, keyword: str, sort_by: str, page: int = 1, game_id: int | None = None,
+        deadline: float | None = None,
+    ) -> tuple[int, SearchResult | None]:
+        """合并相同键的并发请求：首个调用方执行上游请求并写入缓存，其余调用方等待同一结果。
+
+        回退链使用首个调用方的截止时间；每个调用方最多等到自己的截止时间，全部离开后上游请求随之取消。
+        """
+        async def work():
+            status, data, truncated = await self._fetch_search(keyword, sort_by, page, game_id, deadline)
+            if status == 200 and not truncated:
+                self.cache.set(key, data)
+                self._seed_details(data.mods, game_id)
+            elif truncated:
+                # 回退链被截止时间打断，空结果只是部分答案：返回给本次调用方，但不缓存、不写盘
+                logger.debug(f"回退链因截止时间未走完，不缓存结果: {key}")
+            return status, data
+
+        if key in self._flight:
+            logger.debug(f"合并进行中的相同查询: {key}")
+        try:
+            return await self._flight.do(key, work, time_left(deadline))
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"搜索超过 {self.search_deadline:g} 秒") from None
+
+    async def _upstream_get(
+        self, url: str, params: dict, headers: dict, max_wait: float | None = -1.0, stage: str = "default",
+        deadline: float | None = None,
+    ) -> httpx.Response:
+        """所有上游请求的统一出口：先取令牌，429/5xx 时按 Retry-After 或指数抖动退避重试。
+
+        max_wait 为取令牌的最长等待秒数（默认取配置，None 表示不限），超过时抛出 Overloaded；
+        stage 为回退阶段，作为指标标签；deadline 为截止时间（time.monotonic() 时刻），
+        取令牌、请求本身与重试等待都只能使用剩余时间，用完时取消请求并抛出 DeadlineExceeded。
+        """
+        if max_wait is not None and max_wait < 0:
+            max_wait = self.rate_limit_max_wait
+        attempt = 0
+        while True:
+            left = time_left(deadline)
+            if left is not None and (left <= 0 or self.limiter.delay() >= left):
+                raise DeadlineExceeded(f"截止时间前无法发出 {stage} 请求")
+            trial = self.breaker.allow()
+            try:
+                await self.limiter.acquire(max_wait)
+                started = time.perf_counter()
+                request = self._get_client().get(url, headers=headers, params=params)
+                left = time_left(deadline)
+                resp = await (request if left is None else asyncio.wait_for(request, max(0.0, left)))
+            except httpx.TransportError as e:
+                self.breaker.record(False, trial)
+                self.metrics.inc("upstream_requests_total", stage=stage, status=type(e).__name__)
+                raise
+            except asyncio.TimeoutError:
+                # 截止时间到，请求被取消、连接释放；调用方设定的时限不代表上游状态
+                self.breaker.release(trial)
+                self.metrics.inc("upstream_requests_total", stage=stage, status="deadline")
+                raise DeadlineExceeded(f"{stage} 请求超过截止时间") from None
+            except asyncio.CancelledError:
+                # 被取消不代表上游状态
+                self.breaker.release(trial)
+                self.metrics.inc("upstream_requests_total", stage=stage, status="cancelled")
+                raise
+            except BaseException:
+                # 被限速拒绝等，不代表上游状态
+                self.breaker.release(trial)
+                raise
+            self.metrics.observe("upstream_request_seconds", time.perf_counter() - started, stage=stage)
+            self.metrics.inc("upstream_requests_total", stage=stage, status=resp.status_code)
+            self.breaker.record(not self._upstream_failed(resp.status_code), trial)
+            if resp.status_code not in RETRY_STATUSES:
+                return resp
+            retry_after = retry_after_seconds(resp.headers)
+            if retry_after is not None:
+                # 服务端要求暂停时，所有请求一起等待
+                self.limiter.pause(retry_after)
+                delay = retry_after + backoff_delay(0)
+            else:
+                delay = backoff_delay(attempt)
+            left = time_left(deadline)
+            if attempt >= self.upstream_max_retries or delay > self.retry_max_delay or (left is not None and delay >= left):
+                logger.warning(f"上游返回 {resp.status_code}，放弃重试（已重试 {attempt} 次）")
+                return resp
+            attempt += 1
+            logger.debug(f"上游返回 {resp.status_code}，{delay:.2f}s 后第 {attempt} 次重试")
+            await asyncio.sleep(delay)
+
+    def _build_headers(self, bearer: bool = False) -> dict:
+        headers = {
+            "Authorization": self.appkey,
+            "Content-Type": "application/json",
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+            "Accept": "application/json, text/plain, */*",
+            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+            "Cache-Control": "no-cache",
+            "Pragma": "no-cache"
+        }
+        if bearer and not str(self.appkey).lower().startswith("bearer "):
+            headers["Authorization"] = f"Bearer {self.appkey}"
+        return headers
+
+    async def _fetch_search(
+        self, keyword: str, sort_by: str, page: int = 1, game_id: int | None = None, deadline: float | None = None
+    ) -> tuple[int, SearchResult | None, bool]:
+        """执行一次上游搜索（含回退链），返回 (首个请求的状态码, 解析后的响应, 回退链是否被截止时间打断)；
+        回退链的每次请求只能使用截止时间前的剩余时间，后台探测不受其限制"""
+        sort_order_api = "desc"
+        # 构建V3 API参数（注意将布尔转换为 0/1）
+        payload_base = {
+            "page": int(page),
+            "gameId": self._game(game_id),
+            "isRecommend": 1 if bool(self.is_recommend) else 0,
+            "sortBy": sort_by,
+            "sortOrder": sort_order_api,
+            "pageSize": int(self.max_results),
+            # 关键词参数，search 为当前验证可用键；保留其它以兼容旧实现
+            "search": keyword,
+            "key": keyword,
+            "keyword": keyword,
+        }
+        if not payload_base["gameId"]:
+            # 0 表示全站搜索
+            payload_base.pop("gameId")
+
+        headers_auth = self._build_headers()
+        headers_bearer = self._build_headers(bearer=True)
+
+        logger.info(f"正在搜索关键词: {keyword}")
+        logger.debug(f"API URL: {self.api_url}")
+        logger.debug(f"请求参数: {payload_base}")
+
+        async def do_request(url: str, params: dict, headers: dict, stage: str = "probe"):
+            # 后台探测等令牌桶有空余令牌再发起，不挤占用户请求的限速额度
+            wait = self.limiter.delay()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            return await self._upstream_get(url, params, headers, stage=stage)
+
+        async def attempt(url: str, params: dict, headers: dict, stage: str):
+            return await self._upstream_get(url, params, headers, stage=stage, deadline=deadline)
+
+        # 回退链（按优先级）：默认参数 -> 去掉 gameId（全站搜索）-> Bearer 认证 -> 仅 keyword 参数
+        payload_no_gid = dict(payload_base)
+        payload_no_gid.pop("gameId", None)
+        payload_kw_only = apply_strategy(payload_base, keyword, True, "keyword")
+        attempts = [
+            ("default", self.api_url, payload_base, headers_auth),
+            ("no_gameid", self.api_url, payload_no_gid, headers_auth),
+            ("bearer", self.api_url, payload_base, headers_bearer),
+            ("keyword_only", self.api_url, payload_kw_only, headers_auth),
+        ]
+        headers_by_mode = {"Authorization": headers_auth, "Bearer": headers_bearer}
+        # 回退链各阶段对应的策略，命中时记住；去掉 gameId 会扩大搜索范围，不作为策略学习
+        stage_strategies = {
+            "default": {"url": self.api_url, "header": "Authorization", "include_gid": True, "kv_key": None},
+            "bearer": {"url": self.api_url, "header": "Bearer", "include_gid": True, "kv_key": None},
+            "keyword_only": {"url": self.api_url, "header": "Authorization", "include_gid": True, "kv_key": "keyword"},
+        }
+
+        # 已学习的策略优先单独尝试一次，命中则无需走回退链；与首个请求相同时直接走回退链。
+        # gameId 始终沿用调用方的搜索范围，不受策略中 include_gid 影响
+        learned = self.strategy.get() if self.strategy_learning else None
+        if learned and all(learned[k] == stage_strategies["default"][k] for k in ("url", "header", "kv_key")):
+            logger.debug("已学习策略与默认请求相同，直接走回退链")
+        elif learned:
+            payload_learned = apply_strategy(payload_base, keyword, True, learned["kv_key"])
+            resp = await attempt(learned["url"], payload_learned, headers_by_mode[learned["header"]], "learned")
+            logger.debug(f"API响应状态码(已学习策略): {resp.status_code}")
+            if resp.status_code == 200:
+                data = parse_response(resp.json())
+                if data.total > 0 and contains_hits(data, keyword):
+                    self.metrics.inc("upstream_results_total", stage="learned", shape=data.shape or "none")
+                    self._learn_strategy(learned)
+                    logger.debug(f"API响应数据(最终): {data}")
+                    return 200, data, False
+            logger.debug("已学习策略未命中，走常规回退链")
+
+        if self.fallback_mode == "并发对冲":
+            status, data, stage, truncated = await self._run_hedged(attempts, attempt)
+        else:
+            status, data, stage, truncated = await self._run_sequential(attempts, attempt)
+        if status == 200:
+            logger.debug(f"API响应数据(最终): {data}")
+            self.metrics.inc("upstream_results_total", stage=stage, shape=data.shape or "none")
+            if self.strategy_learning:
+                hit = contains_hits(data, keyword)
+                if hit and stage in stage_strategies:
+                    # 记住命中的阶段（已学习策略未命中时即替换为新策略），下次优先使用
+                    self._learn_strategy(stage_strategies[stage])
+                elif not hit and not truncated:
+                    # 已学习策略与回退链都未命中时策略已过时：先作废，再在后台以有限并发重新探测
+                    if learned:
+                        self._forget_strategy(learned)
+                    self._schedule_probe(keyword, payload_base, headers_by_mode, do_request)
+        return status, data, truncated
+
+    def _learn_strategy(self, meta: dict):
+        """在内存中记录命中的策略；策略改变时立即在后台写盘，仅累加命中次数时等卸载时再写"""
+        if self.strategy.record(meta):
+            logger.info(f"已学习新的回退策略: {meta}")
+            self._start_background(self._flush_strategy())
+
+    def _forget_strategy(self, meta: dict):
+        """作废未再命中的策略，在后台写盘（删除策略文件），下次搜索直接走回退链"""
+        logger.info(f"已学习的回退策略不再命中，已作废: {meta}")
+        self.strategy.invalidate()
+        self._start_background(self._flush_strategy())
+
+    async def _flush_strategy(self):
+        try:
+            await self._in_thread(self.strategy.flush)
+        except OSError as e:
+            logger.warning(f"保存回退策略失败: {e}")
+
+    def _schedule_probe(self, keyword: str, payload_base: dict, headers_by_mode: dict, do_request):
+        """后台探测全部参数组合并记录命中策略，两次探测之间至少间隔 probe_cooldown 秒"""
+        now = time.monotonic()
+        if self._probe_task is not None and not self._probe_task.done():
+            return
+        if now - self._last_probe < self.probe_cooldown:
+            return
+        self._last_probe = now
+
+        async def run_probe():
+            try:
+                # 只探测带调用方 gameId 的组合，策略不改变搜索范围
+                data = await probe(do_request, payload_base, headers_by_mode, keyword,
+                                   concurrency=self.probe_concurrency, log=logger.debug, scopes=(True,))
+                meta = data.get("_meta") or {}
+                if meta and "note" not in meta:
+                    self._learn_strategy(meta)
+            except Exception as e:
+                logger.warning(f"回退策略探测失败: {type(e).__name__} - {e}")
+
+        self._probe_task = self._start_background(run_probe())
+
+    def _check_primary(self, response: httpx.Response) -> tuple[int, SearchResult | None]:
+        """检查首个请求的响应，非 200 时记录日志并返回 (状态码, None)"""
+        logger.debug(f"API响应状态码(尝试1): {response.status_code}")
+        if response.status_code != 200:
+            if response.status_code == 118:
+                logger.error("API返回状态码118，可能是连接被重置或请求被拒绝")
+            elif response.status_code not in (401, 403):
+                logger.error(f"API请求失败，状态码: {response.status_code}, 响应内容: {response.text}")
+            return response.status_code, None
+        return 200, parse_response(response.json())
+
+    async def _run_sequential(self, attempts: list, do_request) -> tuple[int, SearchResult | None, str, bool]:
+        """依次执行回退链，任一尝试拿到结果即停止；回退请求非 200 或超过截止时间时终止回退，返回首个请求的结果。
+        最后一项表示回退链是否被截止时间打断（此时的空结果不是最终答案）"""
+        stage, url, params, headers = attempts[0]
+        status, data = self._check_primary(await do_request(url, params, headers, stage))
+        if status != 200 or data.total > 0:
+            return status, data, stage, False
+        for stage_fb, url, params, headers in attempts[1:]:
+            logger.debug(f"结果为空，尝试回退: {stage_fb}")
+            try:
+                resp = await do_request(url, params, headers, stage_fb)
+            except DeadlineExceeded:
+                logger.debug(f"回退到 {stage_fb} 时超过截止时间，返回首个请求的结果")
+                return 200, data, stage, True
+            if resp.status_code != 200:
+                break
+            data_fb = parse_response(resp.json())
+            if data_fb.total > 0:
+                return 200, data_fb, stage_fb, False
+        return 200, data, stage, False
+
+    async def _run_hedged(self, attempts: list, do_request) -> tuple[int, SearchResult | None, str, bool]:
+        """对冲执行回退链：先发首个请求，hedge_delay 秒后仍无结果则并发发出全部回退请求，
+        按优先级取第一个非空结果并取消其余请求；最后一项表示是否有回退请求因截止时间未完成"""
+        stage, url, params, headers = attempts[0]
+        primary = asyncio.ensure_future(do_request(url, params, headers, stage))
+        tasks = [primary]
+        try:
+            if self.hedge_delay > 0:
+                await asyncio.wait({primary}, timeout=self.hedge_delay)
+            if primary.done():
+                status, data = self._check_primary(primary.result())
+                if status != 200 or data.total > 0:
+                    return status, data, stage, False
+            for stage_fb, url, params, headers in attempts[1:]:
+                tasks.append(asyncio.ensure_future(do_request(url, params, headers, stage_fb)))
+            logger.debug(f"并发发出 {len(attempts) - 1} 个回退请求")
+            status, data = self._check_primary(await primary)
+            if status != 200 or data.total > 0:
+                return status, data, stage, False
+            truncated = False
+            for (stage_fb, _, _, _), task in zip(attempts[1:], tasks[1:]):
+                try:
+                    resp = await task
+                except DeadlineExceeded as e:
+                    logger.debug(f"回退请求超过截止时间({stage_fb}): {e}")
+                    truncated = True
+                    continue
+                except (httpx.HTTPError, Overloaded, CircuitOpen) as e:
+                    logger.debug(f"回退请求失败({stage_fb}): {type(e).__name__} - {e}")
+                    continue
+                if resp.status_code != 200:
+                    continue
+                data_fb = parse_response(resp.json())
+                if data_fb.total > 0:
+                    logger.debug(f"回退命中: {stage_fb}")
+                    return 200, data_fb, stage_fb, False
+            return 200, data, stage, truncated
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    # 取走已结束任务的异常，避免 "exception was never retrieved" 警告
+                    task.exception()
+    
+    @staticmethod
+    def _render_mod(i: int, mod: ModRecord, game: str | None = None) -> str:
+        title = mod.title or "未知标题"
+        author = mod.author or "未知作者"
+        mod_id = mod.mod_id
+        size = mod.size or "未知大小"
+        formatted_pub = date_part(mod.publish_time) or "未知时间"
+        formatted_upd = date_part(mod.update_time) or formatted_pub
+        # 构建下载链接
+        download_link = f"https://mod.3dmgame.com/mod/{mod_id}" if mod_id else "链接不可用"
+        return (
+            f"• {i}. {title}\n"
+            + (f"  游戏: {game}\n" if game else "")
+            + f"  作者: {author}\n"
+            f"  发布: {formatted_pub}\n"
+            f"  更新: {formatted_upd}\n"
+            f"  下载: {mod.downloads}\n"
+            f"  大小: {size}\n"
+            f"  链接: {download_link}\n"
+        )
+
+    @staticmethod
+    def _render_mod_brief(i: int, mod: ModRecord, also: list[str] | None = None) -> str:
+        """批量搜索用的紧凑条目：一行标题与要点，一行链接"""
+        title = mod.title or "未知标题"
+        updated = date_part(mod.update_time) or date_part(mod.publish_time) or "未知时间"
+        link = f"https://mod.3dmgame.com/mod/{mod.mod_id}" if mod.mod_id else "链接不可用"
+        line = f"• {i}. {title}（{mod.author or '未知作者'}，{updated}，下载 {mod.downloads}）\n  {link}"
+        if also:
+            line += f"\n  同时匹配: {'、'.join(also)}"
+        return line
+
+    def _render_detail(self, detail: ModDetail, notes=()):
+        """逐段产出详情：基本信息、全部资源版本、简介"""
+        mod = detail.record
+        link = f"https://mod.3dmgame.com/mod/{mod.mod_id}"
+        formatted_pub = date_part(mod.publish_time) or "未知时间"
+        yield (
+            f"▌{mod.title or '未知标题'}\n"
+            + "".join(note + "\n" for note in notes)
+            + f"  ID: {mod.mod_id}\n"
+            + (f"  游戏: {self._game_label(detail.game_id)}\n" if detail.game_id else "")
+            + f"  作者: {mod.author or '未知作者'}\n"
+            f"  发布: {formatted_pub}\n"
+            f"  更新: {date_part(mod.update_time) or formatted_pub}\n"
+            f"  下载: {mod.downloads}\n"
+            f"  链接: {link}"
+        )
+        if mod.resources:
+            yield f"▌资源版本（共{len(mod.resources)}个）:"
+            for res in mod.resources:
+                yield (
+                    f"• {res.name or res.resource_id or '未命名'}{' [最新]' if res.latest else ''}"
+                    f"  {res.size or '未知大小'}  {date_part(res.create_time) or '未知时间'}"
                 )
-            
-            # 添加技术支持信息
-            result_lines.append("▌本插件由--sora--提供技术支持")
-            
-            # 发送结果，如果内容过长则分段发送
-            result_text = "\n".join(result_lines)
-            
-            # 检查消息长度，如果太长则分段发送
-            if len(result_text) > 1500:  # 假设消息长度限制
-                # 分段发送
-                header = "\n".join(result_lines[:3])
-                yield event.plain_result(header)
-                
-                current_text = ""
-                for line in result_lines[3:-3]:  # 排除最后的技术支持信息，单独发送
-                    if len(current_text + line) > 1200:
-                        if current_text:
-                            yield event.plain_result(current_text.strip())
-                        current_text = line + "\n"
-                    else:
-                        current_text += line + "\n"
-                
-                if current_text.strip():
-                    yield event.plain_result(current_text.strip())
-                
-                # 发送技术支持信息
-                support_info = "\n".join(result_lines[-3:])
-                yield event.plain_result(support_info)
+        if detail.description:
+            desc = detail.description
+            yield "▌简介: " + (desc if len(desc) <= 300 else desc[:300] + "…")
+        yield "▌本插件由--sora--提供技术支持"
+
+    def _message_limit(self, event: AstrMessageEvent) -> int:
+        """当前平台单条消息的字数上限：按平台名查 platform_message_limits，否则用 message_max_chars"""
+        name = ""
+        try:
+            name = event.get_platform_name() or ""
+        except Exception:
+            # 旧版事件没有 get_platform_name，从会话标识 "平台:消息类型:会话ID" 中取
+            name = (getattr(event, "unified_msg_origin", "") or "").split(":", 1)[0]
+        return self.platform_limits.get(str(name).lower(), self.message_max_chars)
+
+    def _local_sort_key(self):
+        """本地排序键：时间排序按更新时间、下载量排序按下载量，综合排序保持接口/相关度顺序"""
+        if self.sort_order == "时间排序":
+            return attrgetter("update_ts")
+        if self.sort_order == "下载量排序":
+            return attrgetter("downloads")
+        return None
+
+    async def _format_search_results(
+        self,
+        event: AstrMessageEvent,
+        data: SearchResult,
+        keyword: str,
+        page: int = 1,
+        notes=(),
+        game_of: dict | None = None,
+        scope: str = "",
+        presorted: bool = False,
+    ):
+        """格式化搜索结果；game_of 为 {id(mod): 游戏标签}，多游戏搜索时在每条结果上标注游戏"""
+        try:
+            if data.error:
+                # 旧接口错误码处理
+                yield event.plain_result(f"× 搜索失败: {data.error}")
+                return
+            mods = data.mods
+            total_count = data.total
+            if not mods:
+                if total_count > 0 and page > 1:
+                    pages = self._page_count(total_count)
+                    yield event.plain_result(f"· 关键词 '{keyword}' 只有 {pages} 页结果（共{total_count}个），请指定 1-{pages} 之间的页码")
+                else:
+                    yield event.plain_result(f"· 未找到关键词 '{keyword}' 相关的mod内容")
+                return
+
+            # 时间/下载量排序用解析时预先算好的数值键，只取展示所需的前 max_results 条
+            # （更新时间已按 更新字段 > 资源最新时间 > 创建时间 确定；不原地排序，避免改动缓存中的结果）
+            sort_key = None if presorted else self._local_sort_key()
+            if sort_key is not None:
+                shown = heapq.nlargest(int(self.max_results), mods, key=sort_key)
             else:
-                yield event.plain_result(result_text)
-            
+                shown = mods[:self.max_results]
+
+            # 构建结果消息：表头、逐条渲染的条目与页脚依次装入不超过平台上限的消息
+            sort_desc = f" - 按{self.sort_order}"
+            pages = self._page_count(total_count)
+            page_desc = f" - 第{page}/{pages}页" if pages > 1 else ""
+            header = (
+                f"▌3DMGame Mod搜索结果\n"
+                f"▌关键词: {keyword}\n"
+                + (f"▌游戏: {scope}\n" if scope else "")
+                + f"▌找到 {len(mods)} 个相关mod (总计{total_count}个){sort_desc}{page_desc}\n"
+            )
+            for note in notes:
+                header += note + "\n"
+
+            def parts():
+                yield header
+                for i, mod in enumerate(shown, 1):
+                    yield self._render_mod(i, mod, game_of.get(id(mod)) if game_of else None)
+                if page < pages:
+                    yield "▌发送 /mod下一页 查看下一页"
+                # 添加技术支持信息
+                yield "▌本插件由--sora--提供技术支持"
+
+            # 每装满一条消息立即发送，后面的条目在发送后才继续渲染；只统计渲染耗时
+            render_time = 0.0
+            t = time.perf_counter()
+            for chunk in pack_chunks(parts(), self._message_limit(event)):
+                render_time += time.perf_counter() - t
+                yield event.plain_result(chunk)
+                t = time.perf_counter()
+            self.metrics.observe("format_seconds", render_time + time.perf_counter() - t)
+
         except Exception as e:
             logger.error(f"格式化搜索结果时发生错误: {str(e)}")
             yield event.plain_result(f"× 处理搜索结果时发生错误: {str(e)}")
 
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("mod同步")
+    async def mod_sync(self, event: AstrMessageEvent, message: str = ""):
+        """立即同步本地索引（管理员），附带“全量”参数时完整重新爬取"""
+        if self.index is None:
+            yield event.plain_result("× 未启用本地索引，请先在插件配置中开启 local_index")
+            return
+        if self._index_lock.locked():
+            yield event.plain_result("· 本地索引正在同步中，请稍后再试")
+            return
+        full = "全量" in (getattr(event, "message_str", "") or "")
+        started = time.monotonic()
+        try:
+            if full:
+                stored = await self._crawl_index(self.game_id)
+            else:
+                stored = await self._sync_index(self.game_id)
+        except CircuitOpen as e:
+            logger.warning(f"手动同步本地索引被熔断短路: {e}")
+            yield event.plain_result(f"× 3DM接口暂时不可用，约 {max(1, round(e.retry_in))} 秒后恢复尝试，请稍后再试")
+            return
+        except (Overloaded, DeadlineExceeded, httpx.HTTPError) as e:
+            logger.error(f"手动同步本地索引失败: {type(e).__name__} - {e}")
+            yield event.plain_result(f"× 同步失败: {type(e).__name__}")
+            return
+        mode = "全量爬取" if full else "增量同步"
+        count = await self._in_thread(self.index.count, self.game_id)
+        yield event.plain_result(
+            f"✓ {mode}完成：写入 {stored} 条，本地共 {count} 条，耗时 {time.monotonic() - started:.1f}s"
+        )
+
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("mod别名")
+    async def mod_alias(self, event: AstrMessageEvent, message: str = ""):
+        """管理搜索别名（管理员）：别名在规范化时替换为标准词，二者共用缓存与上游请求"""
+        raw = (getattr(event, "message_str", "") or "").strip()
+        text = ""
+        for prefix in ["/mod别名", "mod别名", "/mod 别名"]:
+            if raw.startswith(prefix):
+                text = raw[len(prefix):].strip()
+                break
+        if not text and message:
+            text = str(message).strip()
+        usage = "使用方法: /mod别名 <别名>=<标准词> 添加，/mod别名 删除 <别名> 删除，不带参数查看全部"
+        n = self.normalizer
+        if not text:
+            if not n.aliases:
+                yield event.plain_result(f"· 还没有配置别名\n{usage}")
+                return
+            lines = [f"▌搜索别名（共{len(n.aliases)}条，“配置”项请在插件配置中修改）:"]
+            lines += [
+                f"• {alias} → {target}" + ("" if alias in n.custom else "（配置）")
+                for alias, target in sorted(n.aliases.items())
+            ]
+            yield event.plain_result("\n".join(lines))
+            return
+        if text.startswith("删除"):
+            alias = text[len("删除"):].strip()
+            if not n.remove_alias(alias):
+                yield event.plain_result(f"· 没有可删除的别名 '{alias}'（配置中的别名请在插件配置中修改）")
+                return
+            await self._in_thread(n.save)
+            await self._rekey_subscriptions()
+            yield event.plain_result(f"✓ 已删除别名 '{alias}'")
+            return
+        alias, sep, target = text.removeprefix("添加").replace("＝", "=").partition("=")
+        if not sep:
+            yield event.plain_result(usage)
+            return
+        try:
+            alias, target = n.add_alias(alias, target)
+        except ValueError as e:
+            yield event.plain_result(f"× {e}")
+            return
+        await self._in_thread(n.save)
+        await self._rekey_subscriptions()
+        yield event.plain_result(f"✓ 已添加别名：搜索 '{alias}' 时按 '{target}' 查询")
+
+    async def _rekey_subscriptions(self):
+        """别名变化后按新规则重新合并订阅主题，并同步轮询计划"""
+        before = set(self.subscriptions.topics)
+        if not self.subscriptions.rekey():
+            return
+        after = set(self.subscriptions.topics)
+        for key in before - after:
+            self._poll_schedule.discard(key)
+        for key in after - before:
+            self._poll_schedule.add(key)
+        try:
+            await self._in_thread(self.subscriptions.save)
+        except OSError as e:
+            logger.warning(f"保存订阅失败: {e}")
+
+    @filter.permission_type(filter.PermissionType.ADMIN)
+    @filter.command("mod统计")
+    async def mod_stats(self, event: AstrMessageEvent):
+        """查看插件运行统计（管理员）"""
+        m = self.metrics
+        searches = m.counter_by("searches_total", "source")
+        total = sum(searches.values())
+        rejected = m.counter("searches_rejected_total")
+        lookups = m.counter_by("cache_lookups_total", "result")
+        looked = sum(lookups.values())
+        lines = [
+            f"▌3DMGame Mod插件统计（运行 {uptime_text(m.started)}）",
+            f"· 搜索: 共 {total:.0f} 次（本地索引 {searches.get('local', 0):.0f} / 缓存 {searches.get('cache', 0):.0f}"
+            f" / 上游 {searches.get('upstream', 0):.0f} / 降级 {searches.get('degraded', 0):.0f}），拒绝 {rejected:.0f} 次",
+        ]
+        for source in ("local", "cache", "upstream", "degraded"):
+            hist = m.histogram("search_seconds", source=source)
+            if hist.count:
+                lines.append(f"  {source}: p50 {fmt_ms(hist.quantile(0.5))} / p95 {fmt_ms(hist.quantile(0.95))}")
+        lines.append(
+            f"· 缓存: 命中率 {fmt_rate(lookups.get('fresh', 0) + lookups.get('stale', 0), looked)}"
+            f"（fresh {lookups.get('fresh', 0):.0f} / stale {lookups.get('stale', 0):.0f} / miss {lookups.get('miss', 0):.0f}），"
+            f"条目 {len(self.cache)}"
+            + (f"，从持久化缓存载入 {m.counter('persisted_cache_loads_total'):.0f} 条" if self.cache_store is not None else "")
+        )
+        normalized = m.counter("queries_normalized_total")
+        if normalized or self.normalizer.aliases:
+            lines.append(f"· 规范化: 改写关键词 {normalized:.0f} 次，别名 {len(self.normalizer.aliases)} 条")
+        hot = self.hot.top(5)
+        if hot:
+            lines.append(
+                "· 热门查询: " + "、".join(f"{key[0]}×{count}" for key, count, _ in hot)
+                + f"，主动刷新 {m.counter('hot_refreshes_total'):.0f} 次"
+            )
+        details = m.counter_by("detail_lookups_total", "result")
+        if details:
+            lines.append(
+                f"· 详情: 缓存命中 {details.get('fresh', 0):.0f} / 未命中 {details.get('miss', 0):.0f}"
+                f" / 304续期 {details.get('not_modified', 0):.0f}，条目 {len(self.detail_cache)}"
+            )
+        if self.subscriptions.topics:
+            polls = m.counter_by("subscription_polls_total", "result")
+            lines.append(
+                f"· 订阅: {len(self.subscriptions.topics)} 个主题 / {self.subscriptions.subscriber_count()} 个订阅，"
+                f"轮询 {sum(polls.values()):.0f} 次（失败 {polls.get('error', 0):.0f}），"
+                f"推送 {m.counter('subscription_notifications_total'):.0f} 条"
+            )
+        stages = m.counter_by("upstream_requests_total", "stage")
+        if stages:
+            lines.append("· 上游请求（按回退阶段）:")
+            for stage, count in sorted(stages.items(), key=lambda kv: -kv[1]):
+                statuses = m.counter_by("upstream_requests_total", "status", stage=stage)
+                status_desc = " ".join(f"{k}×{v:.0f}" for k, v in sorted(statuses.items()))
+                hist = m.histogram("upstream_request_seconds", stage=stage)
+                latency = f"，p50 {fmt_ms(hist.quantile(0.5))} / p95 {fmt_ms(hist.quantile(0.95))}" if hist.count else ""
+                lines.append(f"  {stage}: {count:.0f} 次（{status_desc}）{latency}")
+        results = m.counter_by("upstream_results_total", "stage")
+        if results:
+            lines.append("· 采用的结果（按回退阶段 / 形态）:")
+            for stage, count in sorted(results.items(), key=lambda kv: -kv[1]):
+                shapes = m.counter_by("upstream_results_total", "shape", stage=stage)
+                lines.append(f"  {stage}: {count:.0f} 次（" + " ".join(f"{k}×{v:.0f}" for k, v in sorted(shapes.items())) + "）")
+        fmt = m.histogram("format_seconds")
+        if fmt.count:
+            lines.append(f"· 格式化: {fmt.count} 次，p50 {fmt_ms(fmt.quantile(0.5))} / p95 {fmt_ms(fmt.quantile(0.95))}")
+        gauges = m.gauges()
+        lines.append(
+            f"· 在途: 合并中的上游查询 {gauges.get('inflight_upstream_searches', 0):.0f}，"
+            f"准入 {gauges.get('admission_active', 0):.0f} 执行 / {gauges.get('admission_waiting', 0):.0f} 排队，"
+            f"后台任务 {gauges.get('background_tasks', 0):.0f}，熔断器 {self.breaker.state}"
+        )
+        yield event.plain_result("\n".join(lines))
+
     @filter.command("mod帮助")
     async def mod_help(self, event: AstrMessageEvent):
         """显示mod搜索插件的帮助信息"""
@@ -387,8 +1975,18 @@ class ModSearchPlugin(Star):
 ▌3DMGame Mod搜索插件帮助
 
 · 可用指令:
-  /mod搜索 <关键词> - 搜索3dmgame站上的mod内容
+  /mod搜索 <关键词> [第N页] - 搜索3dmgame站上的mod内容
+  /mod搜索 @游戏ID,游戏ID <关键词> - 同时搜索多个游戏
+  /mod搜索 全部 <关键词> - 搜索配置的全部游戏
+  /mod批量搜索 关键词1 | 关键词2 - 一次搜索多个关键词并合并去重
+  /mod下一页 - 查看上一次搜索的下一页
+  /mod详情 <mod ID> - 查看mod详情与全部资源版本
+  /mod订阅 <关键词> - 有新mod时推送到当前会话（不带参数查看订阅）
+  /mod退订 <关键词> - 取消订阅
   /mod帮助 - 显示此帮助信息
+  /mod同步 [全量] - 立即同步本地索引（管理员）
+  /mod统计 - 查看插件运行统计（管理员）
+  /mod别名 <别名>=<标准词> - 添加搜索别名（管理员）
 
 · 使用示例:
   /mod搜索 武器包
@@ -413,4 +2011,35 @@ class ModSearchPlugin(Star):
 
     async def terminate(self):
         """可选择实现异步的插件销毁方法，当插件被卸载/停用时会调用。"""
+        tasks = list(self._bg_tasks)
+        for task in tasks:
+            task.cancel()
+        self._flight.cancel_all()
+        # 等后台任务真正退出、线程里的数据库写入跑完，再做最后一次写盘并关闭数据库
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._thread_jobs:
+            await asyncio.gather(*self._thread_jobs, return_exceptions=True)
+        try:
+            self.subscriptions.save()
+        except OSError as e:
+            logger.warning(f"保存订阅失败: {e}")
+        if self.recorder is not None:
+            try:
+                self.recorder.write(self.recorder.take())
+            except OSError as e:
+                logger.warning(f"写入查询日志失败: {e}")
+        if self.cache_store is not None:
+            await self._flush_cache()
+            self.cache_store.close()
+            self.cache_store = None
+        try:
+            self.strategy.flush()
+        except OSError as e:
+            logger.warning(f"保存回退策略失败: {e}")
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
         logger.info("3dmmod搜索插件已卸载")
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+端到端基准测试：启动本地替身接口（mod_fake_server.py），以可配置的并发驱动 ModSearchPlugin 的 /mod搜索，
+统计吞吐、延迟分位数（p50/p95/p99）、上游请求数与缓存命中情况。全程离线，可在 CI 中运行。
+
+- 插件的 HTTP 客户端通过 plugin.transport 注入一个改写目标地址的传输层，所有上游请求（含回退链与探测）
+  都发往替身接口，连接池行为与线上一致；--transport inproc 时改用进程内传输层，不经过套接字
+- 未安装 AstrBot 时自动注入最小化的 astrbot.api 替身模块，仅用于加载插件
+- 数据目录使用临时目录，不会影响真实插件数据
+
+用法示例：
+  python mod_bench.py --requests 500 --concurrency 32 --latency 30 --jitter 20
+  python mod_bench.py --scenario fallback --fallback-mode 并发对冲 --json
+  python mod_bench.py --config '{"cache_ttl": 0}' --keywords 武器包 工具箱 地图
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import random
+import sys
+import tempfile
+import time
+import types
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+PLUGIN_DIR = Path(__file__).resolve().parent
+PLUGIN_PACKAGE = "astrbot_plugin_3dmapi"
+
+if str(PLUGIN_DIR) not in sys.path:
+    sys.path.insert(0, str(PLUGIN_DIR))
+
+from mod_fake_server import FakeModServer  # noqa: E402
+from mod_normalize import _T2S_PAIRS  # noqa: E402
+from mod_transport import RedirectTransport  # noqa: E402
+
+# 普通搜索词（按齐普夫分布抽取，热门词重复出现以体现缓存效果）
+DEFAULT_KEYWORDS = [
+    "武器包", "工具箱", "整合包", "地图", "车辆", "皮肤", "高清材质", "汉化补丁", "存档", "修改器",
+    "人物美化", "天气", "音效", "界面", "光影", "建筑", "动物", "服装", "weapon", "texture", "reshade",
+]
+# fallback 场景额外混入的关键词：触发各回退阶段与错误处理
+FALLBACK_KEYWORDS = [
+    "nogid:武器包", "bearer:工具箱", "kwonly:地图", "empty", "err401", "err403", "err118", "err429",
+]
+
+
+def install_astrbot_stub() -> bool:
+    """AstrBot 不可用时注入最小化的 astrbot.api 模块，返回是否注入了替身。"""
+    try:
+        importlib.import_module("astrbot.api")
+        return False
+    except ImportError:
+        pass
+
+    class _Filter:
+        class PermissionType:
+            ADMIN = "admin"
+            MEMBER = "member"
+
+        def command(self, *args, **kwargs):
+            return lambda fn: fn
+
+        def permission_type(self, *args, **kwargs):
+            return lambda fn: fn
+
+    class MessageEventResult(str):
+        pass
+
+    class MessageChain:
+        def __init__(self):
+            self.chain: List[Any] = []
+
+        def message(self, text: str) -> "MessageChain":
+            self.chain.append(text)
+            return self
+
+    class AstrMessageEvent:
+        pass
+
+    class Context:
+        async def send_message(self, session: str, chain: Any) -> bool:
+            return True
+
+    class Star:
+        def __init__(self, context: Any):
+            self.context = context
+
+    def register(*args, **kwargs):
+        return lambda cls: cls
+
+    class StarTools:
+        data_root = Path(tempfile.gettempdir())
+
+        @classmethod
+        def get_data_dir(cls, name: Optional[str] = None) -> Path:
+            path = cls.data_root / (name or PLUGIN_PACKAGE)
+            path.mkdir(parents=True, exist_ok=True)
+            return path
+
+    astrbot = types.ModuleType("astrbot")
+    api = types.ModuleType("astrbot.api")
+    event = types.ModuleType("astrbot.api.event")
+    star = types.ModuleType("astrbot.api.star")
+    api.logger = logging.getLogger("astrbot")
+    api.AstrBotConfig = dict
+    event.filter = _Filter()
+    event.AstrMessageEvent = AstrMessageEvent
+    event.MessageEventResult = MessageEventResult
+    event.MessageChain = MessageChain
+    star.Context = Context
+    star.Star = Star
+    star.register = register
+    star.StarTools = StarTools
+    astrbot.api = api
+    api.event = event
+    api.star = star
+    sys.modules.update({"astrbot": astrbot, "astrbot.api": api, "astrbot.api.event": event, "astrbot.api.star": star})
+    return True
+
+
+def load_plugin_class():
+    """以包的形式加载插件（main.py 使用相对导入）。"""
+    if PLUGIN_PACKAGE not in sys.modules:
+        package = types.ModuleType(PLUGIN_PACKAGE)
+        package.__path__ = [str(PLUGIN_DIR)]
+        sys.modules[PLUGIN_PACKAGE] = package
+    return importlib.import_module(f"{PLUGIN_PACKAGE}.main").ModSearchPlugin
+
+
+class BenchEvent:
+    """/mod搜索 用到的 AstrMessageEvent 接口的最小实现。"""
+
+    def __init__(self, message: str, sender: str = "bench", group: str = ""):
+        self.message_str = message
+        self._sender = sender
+        self._group = group
+        self.unified_msg_origin = f"bench:{'GroupMessage' if group else 'FriendMessage'}:{group or sender}"
+
+    def plain_result(self, text: str) -> str:
+        return text
+
+    def get_sender_id(self) -> str:
+        return self._sender
+
+    def get_group_id(self) -> str:
+        return self._group
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+def zipf_keywords(keywords: List[str], n: int, s: float, rng: random.Random) -> List[str]:
+    weights = [1.0 / (i + 1) ** s for i in range(len(keywords))]
+    return rng.choices(keywords, weights=weights, k=n)
+
+
+_S2T = str.maketrans({p[1]: p[0] for p in reversed(_T2S_PAIRS.split())})
+
+
+def spell_variant(keyword: str, rng: random.Random) -> str:
+    """同一关键词的另一种写法：全角、大写或繁体，用于衡量查询规范化对命中率的影响"""
+    kind = rng.randrange(3)
+    if kind == 0:
+        return "".join(chr(ord(c) + 0xFEE0) if "!" <= c <= "~" else c for c in keyword)
+    if kind == 1:
+        return keyword.upper()
+    return keyword.translate(_S2T)
+
+
+def classify(replies: List[str]) -> str:
+    if not replies:
+        return "no_reply"
+    first = replies[0]
+    if first.startswith("▌"):
+        return "results"
+    if first.startswith("· 未找到"):
+        return "empty"
+    if first.startswith("·"):
+        return "rejected"
+    return "error"
+
+
+async def run_bench(args: argparse.Namespace) -> Dict[str, Any]:
+    stubbed = install_astrbot_stub()
+    plugin_cls = load_plugin_class()
+    from mod_strategy import StrategyStore
+    from mod_subscribe import SubscriptionStore
+
+    keywords = args.keywords or list(DEFAULT_KEYWORDS)
+    if args.scenario == "fallback":
+        keywords = keywords + FALLBACK_KEYWORDS
+    rng = random.Random(args.seed)
+    queries = zipf_keywords(keywords, args.requests, args.zipf, rng)
+    queries = [spell_variant(q, rng) if rng.random() < args.variants else q for q in queries]
+
+    server = FakeModServer(
+        mods_per_game=args.mods,
+        latency=args.latency / 1000.0,
+        jitter=args.jitter / 1000.0,
+        shape=args.shape,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    await server.start()
+    tmp = tempfile.TemporaryDirectory(prefix="mod_bench_")
+    config: Dict[str, Any] = {
+        "appkey": "bench",
+        "fallback_mode": args.fallback_mode,
+        "max_concurrent_searches": args.concurrency,
+        "max_queued_searches": args.concurrency * 4,
+        # 默认关闭上游限速，测量插件自身的开销；需要时用 --rate-limit 指定
+        "rate_limit_per_sec": args.rate_limit,
+        "subscription_interval": 0,
+    }
+    config.update(json.loads(args.config) if args.config else {})
+    plugin = plugin_cls(sys.modules["astrbot.api.star"].Context(), config)
+    plugin.data_dir = Path(tmp.name)
+    plugin.strategy = StrategyStore(plugin.data_dir / "strategy.json")
+    plugin.subscriptions = SubscriptionStore(plugin.data_dir / "subscriptions.json", normalize=plugin.normalizer)
+    limits = httpx.Limits(
+        max_connections=int(config.get("http_max_connections", 20)),
+        max_keepalive_connections=int(config.get("http_max_keepalive", 10)),
+    )
+    if args.transport == "inproc":
+        plugin.transport = server.transport()
+    else:
+        plugin.transport = RedirectTransport(server.base_url, httpx.AsyncHTTPTransport(limits=limits))
+    await plugin.initialize()
+
+    latencies: List[float] = []
+    outcomes: Counter = Counter()
+    failures: List[str] = []
+    queue: asyncio.Queue = asyncio.Queue()
+    for i, kw in enumerate(queries):
+        queue.put_nowait((i, kw))
+
+    async def worker(n: int):
+        # 每个并发单元模拟一个用户，分布在若干个群中
+        sender = f"user{n}"
+        group = f"group{n % max(1, args.groups)}" if args.groups else ""
+        while True:
+            try:
+                _, kw = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            event = BenchEvent(f"/mod搜索 {kw}", sender, group)
+            started = time.perf_counter()
+            try:
+                replies = [str(r) async for r in plugin.mod_search(event)]
+            except Exception as e:
+                failures.append(f"{kw}: {type(e).__name__} - {e}")
+                outcomes["exception"] += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            outcomes[classify(replies)] += 1
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker(n) for n in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        # 等后台刷新/预取/探测结束，计入上游请求数
+        await asyncio.sleep(0.05)
+        cache_lookups = plugin.metrics.counter_by("cache_lookups_total", "result")
+        stages = plugin.metrics.counter_by("upstream_requests_total", "stage")
+    finally:
+        await plugin.terminate()
+        await server.close()
+        tmp.cleanup()
+
+    latencies.sort()
+    done = len(latencies)
+    looked = sum(cache_lookups.values())
+    return {
+        "astrbot_stub": stubbed,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(done / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99": round(percentile(latencies, 0.99) * 1000, 2),
+            "max": round((latencies[-1] if latencies else 0.0) * 1000, 2),
+        },
+        "outcomes": dict(outcomes),
+        "upstream_requests": server.requests,
+        "upstream_per_query": round(server.requests / max(1, args.requests), 3),
+        "upstream_by_status": {str(k): v for k, v in sorted(server.by_status.items())},
+        "upstream_by_stage": dict(stages),
+        "cache_hit_rate": round((cache_lookups.get("fresh", 0) + cache_lookups.get("stale", 0)) / looked, 3) if looked else 0.0,
+        "failures": failures[:10],
+    }
+
+
+def print_report(r: Dict[str, Any]) -> None:
+    lat = r["latency_ms"]
+    print(f"请求数: {r['requests']}  并发: {r['concurrency']}  耗时: {r['elapsed_s']}s  吞吐: {r['throughput_rps']} 次/秒")
+    print(f"延迟: p50 {lat['p50']}ms  p95 {lat['p95']}ms  p99 {lat['p99']}ms  max {lat['max']}ms")
+    print("结果: " + "  ".join(f"{k}={v}" for k, v in sorted(r["outcomes"].items())))
+    print(f"上游请求: {r['upstream_requests']}（每次查询 {r['upstream_per_query']}）  状态码: {r['upstream_by_status']}")
+    print(f"按回退阶段: {r['upstream_by_stage']}")
+    print(f"缓存命中率: {r['cache_hit_rate'] * 100:.1f}%")
+    if r["astrbot_stub"]:
+        print("（未安装 AstrBot，已使用内置替身模块加载插件）")
+    for f in r["failures"]:
+        print(f"× {f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="3DM mod 搜索插件端到端基准测试（离线）")
+    parser.add_argument("--requests", type=int, default=300, help="搜索次数")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发数（每个并发单元模拟一个用户）")
+    parser.add_argument("--groups", type=int, default=0, help="用户分布的群数，0 表示全部为私聊")
+    parser.add_argument("--keywords", nargs="*", help="搜索词列表，默认使用内置词表")
+    parser.add_argument("--variants", type=float, default=0.0,
+                        help="改写为全角/大写/繁体等变体写法的搜索比例（0~1）")
+    parser.add_argument("--zipf", type=float, default=1.1, help="搜索词齐普夫分布参数，越大热门词越集中")
+    parser.add_argument("--scenario", choices=["normal", "fallback"], default="normal",
+                        help="fallback 额外混入触发回退链与错误码的关键词")
+    parser.add_argument("--fallback-mode", choices=["顺序回退", "并发对冲"], default="顺序回退")
+    parser.add_argument("--transport", choices=["tcp", "inproc"], default="tcp",
+                        help="tcp 经本地端口访问替身接口；inproc 为进程内传输层（可把 118 作为状态码交给插件）")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="插件上游限速（次/秒），0 表示不限速")
+    parser.add_argument("--config", default="", help="覆盖插件配置的 JSON，如 '{\"cache_ttl\": 0}'")
+    parser.add_argument("--mods", type=int, default=500, help="替身接口每个游戏生成的 mod 数")
+    parser.add_argument("--latency", type=float, default=20.0, help="替身接口基础延迟（毫秒）")
+    parser.add_argument("--jitter", type=float, default=10.0, help="替身接口随机附加延迟上限（毫秒）")
+    parser.add_argument("--shape", choices=["A", "B", "C", "mixed"], default="mixed", help="替身接口响应形态")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="替身接口随机返回 503 的比例")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出插件日志")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.ERROR)
+    result = asyncio.run(run_bench(args))
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print_report(result)
+    # 插件抛出未处理异常时以非零状态退出，便于 CI 判断
+    sys.exit(1 if result["outcomes"].get("exception") else 0)
+
+
+if __name__ == "__main__":
+    main()
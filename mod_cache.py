@@ -0,0 +1,133 @@
+"""
+搜索结果缓存：进程内 TTL + LRU，按条目数与估算内存占用双重限制。
+
+过期后的 stale_grace 秒内条目仍可返回（状态为 "stale"），由调用方决定是否后台刷新。
+超过宽限期的条目不再由 get() 返回，但在被 LRU 淘汰前保留，上游不可用时可通过 last_known() 降级取用。
+每个条目记录自上次 drain() 以来的命中次数与是否被写入，供持久化层增量刷写。
+"""
+from __future__ import annotations
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional, Tuple
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "size", "hits", "dirty")
+
+    def __init__(self, value: Any, expires_at: float, size: int, dirty: bool = True):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+        self.hits = 0
+        self.dirty = dirty
+
+
+def estimate_size(value: Any) -> int:
+    """粗略估算对象占用：优先使用对象自身的 approx_size()，否则按 JSON 序列化长度计。"""
+    if hasattr(value, "approx_size"):
+        return int(value.approx_size())
+    try:
+        return len(json.dumps(value, ensure_ascii=False, separators=(",", ":")))
+    except (TypeError, ValueError):
+        return len(repr(value))
+
+
+class SearchCache:
+    def __init__(
+        self,
+        ttl: float = 300.0,
+        stale_grace: float = 600.0,
+        max_entries: int = 512,
+        max_bytes: int = 32 * 1024 * 1024,
+    ):
+        self.ttl = max(0.0, float(ttl))
+        self.stale_grace = max(0.0, float(stale_grace))
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        self._data: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._bytes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable) -> Tuple[Optional[Any], str]:
+        """返回 (值, 状态)，状态为 "fresh" / "stale" / "miss"；命中时计入命中次数并移到 LRU 末尾。"""
+        value, state = self.peek(key)
+        if state != "miss":
+            self._data.move_to_end(key)
+            self._data[key].hits += 1
+        return value, state
+
+    def peek(self, key: Hashable) -> Tuple[Optional[Any], str]:
+        """与 get() 相同，但不计命中次数、不影响 LRU 顺序，用于只判断是否已缓存的场合。"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None, "miss"
+        now = time.monotonic()
+        if now < entry.expires_at:
+            return entry.value, "fresh"
+        if now < entry.expires_at + self.stale_grace:
+            return entry.value, "stale"
+        return None, "miss"
+
+    def last_known(self, key: Hashable) -> Optional[Any]:
+        """不论是否过期，返回该键最后一次缓存的值。"""
+        entry = self._data.get(key)
+        return None if entry is None else entry.value
+
+    def remaining(self, key: Hashable) -> Optional[float]:
+        """距离过期的秒数（已过期为负数），不存在时返回 None；不影响 LRU 顺序。"""
+        entry = self._data.get(key)
+        return None if entry is None else entry.expires_at - time.monotonic()
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, dirty: bool = True) -> None:
+        """写入条目；ttl 可为负数（已过期的条目，如从持久化层载入的旧结果），dirty=False 表示无需再刷写。"""
+        if not self.enabled:
+            return
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            # 单条超过总上限，不缓存
+            return
+        if key in self._data:
+            self._remove(key)
+        expires_at = time.monotonic() + (self.ttl if ttl is None else float(ttl))
+        self._data[key] = _Entry(value, expires_at, size, dirty)
+        self._bytes += size
+        self._evict()
+
+    def drain(self) -> List[Tuple[Hashable, Any, float, int, bool]]:
+        """取出自上次调用以来被写入或命中过的条目：(键, 值, 剩余有效秒数, 命中次数, 是否被写入)，并清零计数。"""
+        now = time.monotonic()
+        out = []
+        for key, entry in self._data.items():
+            if entry.dirty or entry.hits:
+                out.append((key, entry.value, entry.expires_at - now, entry.hits, entry.dirty))
+                entry.hits = 0
+                entry.dirty = False
+        return out
+
+    def pop(self, key: Hashable) -> None:
+        if key in self._data:
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._bytes = 0
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._data.pop(key)
+        self._bytes -= entry.size
+
+    def _evict(self) -> None:
+        # 按最近最少使用顺序淘汰，直到满足条目数与内存上限
+        while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+            key = next(iter(self._data))
+            self._remove(key)
@@ -0,0 +1,130 @@
+"""
+搜索缓存的持久化层：SQLite（WAL 模式）保存规范化的搜索结果与过期时间，插件重载或重启后按热度预热内存缓存。
+
+- 过期时间以墙钟时间（time.time()）保存，跨重启仍然有效
+- 同一台机器上的多个进程可共用一个库：WAL 下读写互不阻塞，写冲突由 busy_timeout 等待；
+  同一个键以过期时间更晚（即更新）的结果为准，命中次数累加
+- SQLite 调用都是同步的，插件侧通过 asyncio.to_thread 调用，连接由锁串行化
+"""
+from __future__ import annotations
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Hashable, Iterable, List, Optional, Tuple
+
+try:
+    from .mod_records import SearchResult
+except ImportError:  # 作为独立脚本的同级模块导入
+    from mod_records import SearchResult
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_search_cache_hits ON search_cache(hits);
+"""
+
+_UPSERT = (
+    "INSERT INTO search_cache(key, value, expires_at, hits) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT(key) DO UPDATE SET "
+    "value = CASE WHEN excluded.expires_at >= search_cache.expires_at THEN excluded.value ELSE search_cache.value END, "
+    "expires_at = MAX(search_cache.expires_at, excluded.expires_at), "
+    "hits = search_cache.hits + excluded.hits"
+)
+
+
+def encode_key(key: Hashable) -> str:
+    return json.dumps(list(key), ensure_ascii=False, separators=(",", ":"))
+
+
+def decode_key(text: str) -> tuple:
+    return tuple(json.loads(text))
+
+
+class CacheStore:
+    def __init__(self, path: os.PathLike | str, keep_expired: float = 86400.0, max_rows: int = 5000):
+        self.path = str(path)
+        # 过期超过 keep_expired 秒的结果在 prune() 时删除；之前仍可作为上游不可用时的降级结果
+        self.keep_expired = max(0.0, float(keep_expired))
+        self.max_rows = max(1, int(max_rows))
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def get(self, key: Hashable) -> Optional[Tuple[SearchResult, float]]:
+        """返回 (结果, 剩余有效秒数)，剩余秒数可能为负（已过期）；不存在或无法解码时返回 None。"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM search_cache WHERE key = ?", (encode_key(key),)
+            ).fetchone()
+        if row is None:
+            return None
+        try:
+            return SearchResult.from_dict(json.loads(row[0])), row[1] - time.time()
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def hottest(self, limit: int, grace: float = 0.0) -> List[Tuple[tuple, SearchResult, float, int]]:
+        """按累计命中次数取最热的 limit 条仍在有效期或宽限期内的结果：(键, 结果, 剩余有效秒数, 命中次数)。"""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value, expires_at, hits FROM search_cache WHERE expires_at > ? ORDER BY hits DESC LIMIT ?",
+                (now - max(0.0, grace), int(limit)),
+            ).fetchall()
+        out = []
+        for key, value, expires_at, hits in rows:
+            try:
+                out.append((decode_key(key), SearchResult.from_dict(json.loads(value)), expires_at - now, int(hits)))
+            except (ValueError, KeyError, TypeError):
+                continue
+        return out
+
+    def put_many(self, rows: Iterable[Tuple[Hashable, Any, float, int, bool]]) -> int:
+        """写入 SearchCache.drain() 取出的条目：被写入的条目整体 upsert，只有命中的条目只累加命中次数。"""
+        now = time.time()
+        upserts = []
+        touches = []
+        for key, value, remaining, hits, written in rows:
+            if written and isinstance(value, SearchResult):
+                value_json = json.dumps(value.to_dict(), ensure_ascii=False, separators=(",", ":"))
+                upserts.append((encode_key(key), value_json, now + remaining, int(hits)))
+            elif hits:
+                touches.append((int(hits), encode_key(key)))
+        if not upserts and not touches:
+            return 0
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(_UPSERT, upserts)
+                self._conn.executemany("UPDATE search_cache SET hits = hits + ? WHERE key = ?", touches)
+        return len(upserts) + len(touches)
+
+    def prune(self) -> int:
+        """删除过期过久的结果，并在超过 max_rows 时删除命中最少的条目，返回删除条数。"""
+        with self._lock:
+            with self._conn:
+                removed = self._conn.execute(
+                    "DELETE FROM search_cache WHERE expires_at < ?", (time.time() - self.keep_expired,)
+                ).rowcount
+                removed += self._conn.execute(
+                    "DELETE FROM search_cache WHERE key IN ("
+                    "SELECT key FROM search_cache ORDER BY hits DESC, expires_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_rows,),
+                ).rowcount
+        return removed
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
@@ -0,0 +1,53 @@
+"""
+长消息分段：把按需渲染的若干段文本单次遍历地装入不超过平台字数上限的消息，每装满一条就立即产出。
+"""
+from __future__ import annotations
+from typing import Dict, Iterable, Iterator, List
+
+
+def pack_chunks(parts: Iterable[str], limit: int, sep: str = "\n") -> Iterator[str]:
+    """按顺序把 parts 拼成不超过 limit 字符的消息（段间以 sep 连接）。
+
+    每段只拼接一次，整体为线性时间；单段超过 limit 时按 limit 硬切。
+    parts 可以是生成器，前面的消息产出时后面的段落尚未渲染。产出的消息去掉首尾空行。
+    """
+    limit = max(1, int(limit))
+    buf: List[str] = []
+    size = 0
+    for part in parts:
+        if not part:
+            continue
+        extra = len(part) + (len(sep) if buf else 0)
+        if buf and size + extra > limit:
+            yield sep.join(buf).strip("\n")
+            buf, size = [], 0
+            extra = len(part)
+        if extra > limit:
+            # 单段超长：切成若干条，最后一截留在缓冲区与后续段落合并
+            while len(part) > limit:
+                yield part[:limit]
+                part = part[limit:]
+            extra = len(part)
+        buf.append(part)
+        size += extra
+    if buf:
+        text = sep.join(buf).strip("\n")
+        if text:
+            yield text
+
+
+def parse_limits(text: str) -> Dict[str, int]:
+    """解析 "aiocqhttp=1500, telegram=4000" 形式的平台字数上限配置，忽略无法解析的项。"""
+    limits: Dict[str, int] = {}
+    for item in (text or "").replace("，", ",").split(","):
+        name, _, value = item.partition("=")
+        if not value:
+            name, _, value = item.partition(":")
+        name = name.strip().lower()
+        try:
+            n = int(value.strip())
+        except ValueError:
+            continue
+        if name and n > 0:
+            limits[name] = n
+    return limits
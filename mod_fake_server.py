@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地 3DM /api/v3/mods 替身接口：HTTP 服务只依赖标准库（asyncio），用于离线调试与基准测试（见 mod_bench.py）。
+也可通过 transport() 得到进程内的 httpx 传输层，不经过套接字。
+
+- 按固定随机种子生成每个游戏的 mod 列表，支持关键词过滤、gameId、sortBy/sortOrder、page/pageSize
+- 响应形态可固定为 A / B / C，或 mixed（按关键词轮换）
+  A: { data: [ ... ], total }   B: { data: { data: [ ... ], total } }   C: { code: "00", data: { mod: [ ... ], count } }
+- 可配置延迟（基础值 + 随机抖动）与随机 5xx 错误率
+- 特殊关键词用于触发插件的各条错误处理与回退路径：
+    err401 / err403 / err118 / err429 / err503   直接返回对应状态码（429 带 Retry-After）；
+                                                 118 属于 HTTP 1xx，经 TCP 时以“发出 118 后断开连接”模拟，
+                                                 只有进程内传输层能把 118 作为最终状态码交给插件
+    empty                                        始终返回空结果
+    nogid:<词>                                   带 gameId 时为空，去掉 gameId 后返回 <词> 的结果（回退 no_gameid）
+    bearer:<词>                                  非 Bearer 认证时为空（回退 bearer）
+    kwonly:<词>                                  带 key 参数时为空（回退 keyword_only）
+- 详情接口 /api/v3/mods/<ID> 带 ETag / Last-Modified，If-None-Match 或 If-Modified-Since 匹配时返回 304
+
+用法：
+  python mod_fake_server.py --port 8765 --latency 50 --jitter 20 --shape mixed
+  curl "http://127.0.0.1:8765/api/v3/mods?gameId=261&search=武器包&pageSize=5"
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+API_PATHS = ("/api/v3/mods", "/api/v3/mods/search")
+
+# 与插件探测的关键词参数键保持一致
+KEYWORD_KEYS = ("search", "key", "keyword", "keywords", "wd", "q", "searchKey", "searchWord", "title", "modsTitle")
+
+ERROR_KEYWORDS = {"err401": 401, "err403": 403, "err118": 118, "err429": 429, "err503": 503}
+
+_WORDS = [
+    "武器包", "工具箱", "整合包", "地图", "车辆", "皮肤", "高清材质", "汉化补丁", "存档", "修改器",
+    "人物美化", "天气", "音效", "界面", "光影", "建筑", "动物", "服装", "weapon", "texture", "ui", "reshade",
+]
+_SUFFIXES = ["", " 重制版", " 增强版", " 合集", " 修复", " 扩展", " 精简版", " 兼容补丁"]
+
+_REASONS = {
+    200: "OK", 304: "Not Modified", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found", 118: "Connection Reset",
+    429: "Too Many Requests", 500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+def generate_mods(game_id: int, count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """按种子生成确定的 mod 列表（v3 字段名）。"""
+    rng = random.Random(f"{seed}:{game_id}")
+    base = datetime(2023, 1, 1)
+    mods = []
+    for i in range(count):
+        mod_id = game_id * 100000 + i + 1
+        words = rng.sample(_WORDS, 2)
+        created = base + timedelta(minutes=rng.randrange(0, 900 * 24 * 60))
+        updated = created + timedelta(minutes=rng.randrange(0, 90 * 24 * 60))
+        resources = []
+        for r in range(rng.randint(1, 3)):
+            resources.append({
+                "mods_resource_id": f"{mod_id}-{r}",
+                "mods_resource_name": f"v1.{r}",
+                "mods_resource_size": f"{rng.randint(1, 900)}MB",
+                "mods_resource_createTime": (created + timedelta(days=r * 7)).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                "mods_resource_latest_version": r == 0,
+            })
+        mods.append({
+            "id": mod_id,
+            "mods_title": f"{words[0]}{words[1]}{rng.choice(_SUFFIXES)} #{i + 1}",
+            "mods_author": f"作者{rng.randint(1, 200)}",
+            "mods_createTime": created.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "mods_updateTime": updated.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "mods_download_cnt": int(rng.paretovariate(1.2) * 50),
+            "mods_resource": resources,
+            "mods_desc": f"<p>{words[0]}与{words[1]}的示例 mod，编号 {i + 1}。</p>",
+            "_game_id": game_id,
+        })
+    return mods
+
+
+def _to_shape_b(mod: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": mod["id"],
+        "title": mod["mods_title"],
+        "author": mod["mods_author"],
+        "createTime": mod["mods_createTime"],
+        "updateTime": mod["mods_updateTime"],
+        "downloadCnt": mod["mods_download_cnt"],
+        "mods_resource": mod["mods_resource"],
+    }
+
+
+def _to_shape_c(mod: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "mods_id": mod["id"],
+        "mods_title": mod["mods_title"],
+        "user_nickName": mod["mods_author"],
+        "mods_createTime": mod["mods_createTime"].replace("T", " ")[:19],
+        "mods_download_cnt": mod["mods_download_cnt"],
+        "mods_resource": mod["mods_resource"],
+    }
+
+
+_SORT_FIELDS = {
+    "mods_createTime": "mods_createTime",
+    "mods_updateTime": "mods_updateTime",
+    "mods_download_cnt": "mods_download_cnt",
+    "id": "id",
+}
+
+
+class FakeModServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        games: Sequence[int] = (261,),
+        mods_per_game: int = 500,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        shape: str = "mixed",
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.host = host
+        self.port = port
+        self.latency = max(0.0, float(latency))
+        self.jitter = max(0.0, float(jitter))
+        self.shape = shape
+        self.error_rate = max(0.0, float(error_rate))
+        self._rng = random.Random(seed)
+        self._mods: Dict[int, List[Dict[str, Any]]] = {
+            int(g): generate_mods(int(g), mods_per_game, seed) for g in games
+        }
+        self._by_id: Dict[int, Dict[str, Any]] = {m["id"]: m for mods in self._mods.values() for m in mods}
+        self.requests = 0
+        self.by_status: Counter = Counter()
+        self.by_keyword: Counter = Counter()
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def api_url(self) -> str:
+        return self.base_url + API_PATHS[0]
+
+    async def start(self) -> "FakeModServer":
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "FakeModServer":
+        return await self.start()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    def reset_stats(self) -> None:
+        self.requests = 0
+        self.by_status.clear()
+        self.by_keyword.clear()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, target, _ = line.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    break
+                headers: Dict[str, str] = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = h.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", "0") or 0)
+                if length:
+                    await reader.readexactly(length)
+                url = urlsplit(target)
+                params = dict(parse_qsl(url.query, keep_blank_values=True))
+                delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+                if delay:
+                    await asyncio.sleep(delay)
+                status, extra, body = self._record(self.respond(method, url.path, params, headers))
+                if status < 200:
+                    # 1xx 不能作为最终响应，发出后直接断开，客户端表现为连接被重置
+                    writer.write(f"HTTP/1.1 {status} {_REASONS.get(status, 'Unknown')}\r\n\r\n".encode("latin-1"))
+                    await writer.drain()
+                    break
+                payload = b"" if body is None else json.dumps(body, ensure_ascii=False).encode("utf-8")
+                keep_alive = headers.get("connection", "").lower() != "close"
+                head = [
+                    f"HTTP/1.1 {status} {_REASONS.get(status, 'Unknown')}",
+                    "Content-Type: application/json; charset=utf-8",
+                    f"Content-Length: {len(payload)}",
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}",
+                ] + [f"{k}: {v}" for k, v in extra.items()]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _record(self, result: Tuple[int, Dict[str, str], Any]) -> Tuple[int, Dict[str, str], Any]:
+        self.requests += 1
+        self.by_status[result[0]] += 1
+        return result
+
+    def transport(self):
+        """进程内的 httpx 传输层：同样的数据、延迟与错误注入，但不经过网络。"""
+        import httpx
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            if delay:
+                await asyncio.sleep(delay)
+            headers = {k.lower(): v for k, v in request.headers.items()}
+            status, extra, body = self._record(
+                self.respond(request.method, request.url.path, dict(request.url.params), headers)
+            )
+            if body is None:
+                return httpx.Response(status, headers=extra)
+            return httpx.Response(status, headers=extra, json=body)
+
+        return httpx.MockTransport(handler)
+
+    def respond(
+        self, method: str, path: str, params: Dict[str, str], headers: Dict[str, str]
+    ) -> Tuple[int, Dict[str, str], Any]:
+        """根据请求计算 (状态码, 额外响应头, 响应体)；响应体为 None 表示无内容。"""
+        head, _, tail = path.rstrip("/").rpartition("/")
+        if method == "GET" and head == API_PATHS[0] and tail.isdigit():
+            return self._detail(int(tail), headers)
+        if method != "GET" or path.rstrip("/") not in API_PATHS:
+            return 404, {}, {"code": "404", "message": "not found"}
+        keyword = next((params[k] for k in KEYWORD_KEYS if params.get(k)), "")
+        self.by_keyword[keyword] += 1
+        if keyword in ERROR_KEYWORDS:
+            status = ERROR_KEYWORDS[keyword]
+            return status, ({"Retry-After": "1"} if status == 429 else {}), {"code": str(status), "message": "error"}
+        if self.error_rate and self._rng.random() < self.error_rate:
+            return 503, {}, {"code": "503", "message": "service unavailable"}
+
+        scenario, _, term = keyword.partition(":")
+        if not term:
+            scenario, term = "", keyword
+        empty = (
+            keyword == "empty"
+            or (scenario == "nogid" and "gameId" in params)
+            or (scenario == "bearer" and not headers.get("authorization", "").lower().startswith("bearer "))
+            or (scenario == "kwonly" and "key" in params)
+        )
+
+        page = max(1, int(params.get("page", 1) or 1))
+        page_size = max(1, min(100, int(params.get("pageSize", 10) or 10)))
+        if empty:
+            matched: List[Dict[str, Any]] = []
+        else:
+            if "gameId" in params:
+                pool = self._mods.get(int(params["gameId"] or 0), [])
+            else:
+                pool = [m for mods in self._mods.values() for m in mods]
+            if term:
+                t = term.lower()
+                matched = [m for m in pool if t in m["mods_title"].lower() or t in m["mods_author"].lower()]
+            else:
+                matched = list(pool)
+            field = _SORT_FIELDS.get(params.get("sortBy", ""), "id")
+            matched.sort(key=lambda m: m[field], reverse=params.get("sortOrder", "desc") != "asc")
+        chunk = matched[(page - 1) * page_size: page * page_size]
+        return 200, {}, self._shape(keyword, chunk, len(matched))
+
+    def _detail(self, mod_id: int, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], Any]:
+        mod = self._by_id.get(mod_id)
+        if mod is None:
+            return 404, {}, {"code": "404", "message": "mod not found"}
+        body = {k: v for k, v in mod.items() if not k.startswith("_")}
+        body["mods_game_id"] = mod["_game_id"]
+        etag = '"' + hashlib.sha1(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest()[:16] + '"'
+        updated = datetime.strptime(mod["mods_updateTime"][:19], "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc)
+        validators = {"ETag": etag, "Last-Modified": format_datetime(updated, usegmt=True)}
+        if headers.get("if-none-match") == etag or (
+            "if-none-match" not in headers and headers.get("if-modified-since") == validators["Last-Modified"]
+        ):
+            return 304, validators, None
+        return 200, validators, {"code": "00", "data": body}
+
+    def _shape(self, keyword: str, chunk: List[Dict[str, Any]], total: int) -> Dict[str, Any]:
+        shape = self.shape
+        if shape == "mixed":
+            shape = "ABC"[sum(map(ord, keyword)) % 3]
+        clean = [{k: v for k, v in m.items() if not k.startswith("_")} for m in chunk]
+        if shape == "B":
+            return {"data": {"data": [_to_shape_b(m) for m in clean], "total": total}}
+        if shape == "C":
+            return {"code": "00", "data": {"mod": [_to_shape_c(m) for m in clean], "count": total}}
+        return {"data": clean, "total": total}
+
+
+async def serve(args: argparse.Namespace) -> None:
+    server = FakeModServer(
+        host=args.host,
+        port=args.port,
+        games=args.games,
+        mods_per_game=args.mods,
+        latency=args.latency / 1000.0,
+        jitter=args.jitter / 1000.0,
+        shape=args.shape,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    await server.start()
+    print(f"替身接口已启动: {server.api_url}（Ctrl+C 退出）")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 3DM /api/v3/mods 替身接口")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--games", type=int, nargs="+", default=[261], help="生成数据的游戏ID")
+    parser.add_argument("--mods", type=int, default=500, help="每个游戏生成的 mod 数")
+    parser.add_argument("--latency", type=float, default=0.0, help="基础延迟（毫秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="随机附加延迟上限（毫秒）")
+    parser.add_argument("--shape", choices=["A", "B", "C", "mixed"], default="mixed", help="响应形态")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="随机返回 503 的比例（0~1）")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
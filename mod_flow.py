@@ -0,0 +1,343 @@
+"""
+上游请求的并发控制原语：请求合并、令牌桶限速、带公平性的准入控制、退避、熔断与截止时间。
+"""
+from __future__ import annotations
+import asyncio
+import random
+import time
+from collections import Counter, OrderedDict, deque
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Mapping, Optional
+
+
+class SingleFlight:
+    """相同键的并发调用只执行一次，其余调用方等待同一结果。
+
+    实际工作在独立任务中运行，单个调用方被取消或等待超时不会影响其他等待者；
+    最后一个等待者离开时工作随之取消，不再占用连接。
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Counter = Counter()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """等待 key 对应的结果，最多 timeout 秒（None 表示不限），超时抛出 asyncio.TimeoutError。"""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _t, k=key: self._calls.pop(k, None))
+        self._waiters[task] += 1
+        try:
+            if timeout is None:
+                return await asyncio.shield(task)
+            return await asyncio.wait_for(asyncio.shield(task), max(0.0, timeout))
+        finally:
+            self._waiters[task] -= 1
+            if self._waiters[task] <= 0:
+                del self._waiters[task]
+                if not task.done():
+                    task.cancel()
+
+    def cancel_all(self) -> None:
+        for task in list(self._calls.values()):
+            task.cancel()
+        self._calls.clear()
+
+
+class Overloaded(Exception):
+    """系统饱和时快速失败，message 可直接展示给用户。"""
+
+
+class DeadlineExceeded(Exception):
+    """单条指令的总耗时预算已用完。"""
+
+
+def time_left(deadline: Optional[float]) -> Optional[float]:
+    """距截止时间（time.monotonic() 时刻）的剩余秒数，deadline 为 None 时返回 None。"""
+    return None if deadline is None else deadline - time.monotonic()
+
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+def retry_after_seconds(headers: Mapping[str, str]) -> Optional[float]:
+    """解析 Retry-After 头（秒数或 HTTP 日期），无法解析返回 None。"""
+    value = (headers.get("Retry-After") or "").strip()
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 8.0) -> float:
+    """指数退避 + 全抖动：在 [0, min(cap, base * 2^attempt)] 内随机取值。"""
+    return random.uniform(0.0, min(cap, base * (2 ** attempt)))
+
+
+class TokenBucket:
+    """令牌桶限速：rate 为每秒补充的令牌数，burst 为桶容量。
+
+    令牌不足时先预留（令牌数可为负）再等待，保证并发调用方按到达顺序依次放行；
+    收到 Retry-After 时通过 pause() 让所有调用方一起暂停。
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self) -> float:
+        """当前再取一个令牌需要等待的秒数。"""
+        if not self.enabled:
+            return 0.0
+        now = time.monotonic()
+        self._refill(now)
+        deficit = (1.0 - self._tokens) / self.rate if self._tokens < 1.0 else 0.0
+        return max(deficit, self._paused_until - now)
+
+    async def acquire(self, max_wait: Optional[float] = None) -> None:
+        """取一个令牌；需要等待超过 max_wait 秒时抛出 Overloaded 而不排队。"""
+        if not self.enabled:
+            return
+        wait = self.delay()
+        if max_wait is not None and wait > max_wait:
+            raise Overloaded(f"上游接口限速中，请约 {wait:.0f} 秒后再试")
+        self._tokens -= 1.0
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + max(0.0, float(seconds)))
+
+
+class FairAdmission:
+    """插件级准入控制：最多 max_active 个请求同时访问上游，最多 max_waiting 个排队。
+
+    每个用户/群同时在途（执行中 + 排队中）的请求数有上限；空出的名额按用户轮转分配，
+    单个用户的连续请求不会挤占其他用户。超出任一上限立即抛出 Overloaded。
+    """
+
+    def __init__(self, max_active: int = 8, max_waiting: int = 16, per_user: int = 2, per_group: int = 4):
+        self.max_active = max(1, int(max_active))
+        self.max_waiting = max(0, int(max_waiting))
+        self.per_user = max(1, int(per_user))
+        self.per_group = max(1, int(per_group))
+        self._active = 0
+        self._waiting = 0
+        self._queues: "OrderedDict[Hashable, Deque[list]]" = OrderedDict()
+        self._users: Counter = Counter()
+        self._groups: Counter = Counter()
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    @asynccontextmanager
+    async def slot(self, user: Hashable, group: Hashable = None, timeout: Optional[float] = None, weight: int = 1):
+        """占用名额；需要排队时最多等待 timeout 秒（None 表示不限），超时抛出 Overloaded。
+
+        weight 为本次请求同时发起的上游请求数（如批量搜索的关键词数，最多 max_active），按此占用全局名额，
+        凑齐后才放行；用户/群的在途计数仍按 1 次计。
+        """
+        weight = min(max(1, int(weight)), self.max_active)
+        if self._users[user] >= self.per_user:
+            raise Overloaded("你的搜索请求过于频繁，请等待上一条结果返回后再试")
+        if group and self._groups[group] >= self.per_group:
+            raise Overloaded("本群同时进行的搜索过多，请稍后再试")
+        must_wait = self._active + weight > self.max_active or self._waiting > 0
+        if must_wait and self._waiting >= self.max_waiting:
+            raise Overloaded("当前搜索请求过多，请稍后再试")
+        self._users[user] += 1
+        if group:
+            self._groups[group] += 1
+        try:
+            if must_wait:
+                await self._wait_turn(user, weight, timeout)
+            else:
+                self._active += weight
+            try:
+                yield
+            finally:
+                self._release(weight)
+        finally:
+            self._users[user] -= 1
+            if self._users[user] <= 0:
+                del self._users[user]
+            if group:
+                self._groups[group] -= 1
+                if self._groups[group] <= 0:
+                    del self._groups[group]
+
+    async def _wait_turn(self, user: Hashable, weight: int = 1, timeout: Optional[float] = None) -> None:
+        fut = asyncio.get_running_loop().create_future()
+        # 没有人排队时先拿走空闲的名额，其余的由 _release() 逐个移交；entry 为 [future, 还差的名额数]
+        grabbed = 0 if self._waiting else max(0, min(weight, self.max_active - self._active))
+        self._active += grabbed
+        entry = [fut, weight - grabbed]
+        self._queues.setdefault(user, deque()).append(entry)
+        self._waiting += 1
+        try:
+            if timeout is None:
+                await fut
+            else:
+                await asyncio.wait({fut}, timeout=max(0.0, timeout))
+                if not fut.done():
+                    fut.cancel()
+                    raise Overloaded("当前搜索请求过多，请稍后再试")
+        except (asyncio.CancelledError, Overloaded):
+            if fut.done() and not fut.cancelled():
+                # 名额已经移交给本调用方，取消时归还
+                self._release(weight)
+            else:
+                queue = self._queues.get(user)
+                if queue is not None and entry in queue:
+                    queue.remove(entry)
+                    self._waiting -= 1
+                    if not queue:
+                        del self._queues[user]
+                # 归还已经凑到的部分名额
+                self._release(weight - entry[1])
+            raise
+
+    def _release(self, units: int = 1) -> None:
+        # 名额逐个移交给轮转到的下一位用户，凑齐其所需的名额才放行、再轮转；没有人排队时归还
+        for _ in range(units):
+            self._hand_over()
+
+    def _hand_over(self) -> None:
+        while self._queues:
+            user, queue = next(iter(self._queues.items()))
+            entry = queue[0]
+            fut = entry[0]
+            if not fut.done():
+                entry[1] -= 1
+                if entry[1] > 0:
+                    return
+            queue.popleft()
+            self._waiting -= 1
+            if queue:
+                self._queues.move_to_end(user)
+            else:
+                del self._queues[user]
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self._active -= 1
+
+
+class CircuitOpen(Exception):
+    """熔断器打开期间短路的调用。"""
+
+    def __init__(self, retry_in: float):
+        super().__init__(f"上游接口熔断中，约 {retry_in:.0f} 秒后重试")
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """熔断器：window 秒内失败 failure_threshold 次后打开，打开期间直接短路；
+    reset_timeout 秒后进入半开状态，放行最多 half_open_max 个试探请求，成功则关闭，失败则重新打开。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        window: float = 30.0,
+        reset_timeout: float = 30.0,
+        half_open_max: int = 1,
+        on_change: Optional[Callable[[str, str], None]] = None,
+    ):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.window = max(0.0, float(window))
+        self.reset_timeout = max(0.0, float(reset_timeout))
+        self.half_open_max = max(1, int(half_open_max))
+        self.on_change = on_change
+        self._state = self.CLOSED
+        self._failures: Deque[float] = deque()
+        self._opened_at = 0.0
+        self._trials = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._set_state(self.HALF_OPEN)
+            self._trials = 0
+        return self._state
+
+    def _set_state(self, state: str) -> None:
+        old, self._state = self._state, state
+        if old != state and self.on_change is not None:
+            self.on_change(old, state)
+
+    def allow(self) -> bool:
+        """放行则返回本次调用是否为半开试探；应短路时抛出 CircuitOpen。"""
+        state = self.state
+        if state == self.CLOSED:
+            return False
+        if state == self.HALF_OPEN and self._trials < self.half_open_max:
+            self._trials += 1
+            return True
+        retry_in = max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+        raise CircuitOpen(retry_in)
+
+    def record(self, ok: bool, trial: bool = False) -> None:
+        if trial:
+            self._trials = max(0, self._trials - 1)
+        if ok:
+            if self._state != self.CLOSED:
+                self._failures.clear()
+                self._set_state(self.CLOSED)
+            return
+        now = time.monotonic()
+        if self._state == self.HALF_OPEN:
+            self._open(now)
+            return
+        self._failures.append(now)
+        while self._failures and now - self._failures[0] > self.window:
+            self._failures.popleft()
+        if self._state == self.CLOSED and len(self._failures) >= self.failure_threshold:
+            self._open(now)
+
+    def release(self, trial: bool) -> None:
+        """调用被取消、没有结果时归还试探名额。"""
+        if trial:
+            self._trials = max(0, self._trials - 1)
+
+    def _open(self, now: float) -> None:
+        self._opened_at = now
+        self._failures.clear()
+        self._set_state(self.OPEN)
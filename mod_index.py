@@ -0,0 +1,250 @@
+"""
+本地 mod 索引：把爬取到的 mod 记录存入 SQLite，并用 FTS5（trigram 分词）支持中文子串检索。
+
+SQLite 调用都是同步的，插件侧通过 asyncio.to_thread 调用，连接由锁串行化。
+不支持 FTS5/trigram 的 SQLite 会退化为 LIKE 查询。
+"""
+from __future__ import annotations
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from .mod_records import ModRecord
+except ImportError:  # 作为独立脚本的同级模块导入
+    from mod_records import ModRecord
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mods (
+    id INTEGER PRIMARY KEY,
+    game_id INTEGER,
+    title TEXT NOT NULL DEFAULT '',
+    author TEXT NOT NULL DEFAULT '',
+    create_time TEXT NOT NULL DEFAULT '',
+    update_time TEXT NOT NULL DEFAULT '',
+    downloads INTEGER NOT NULL DEFAULT 0,
+    raw TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_mods_game ON mods(game_id);
+CREATE TABLE IF NOT EXISTS resources (
+    mod_id INTEGER NOT NULL,
+    idx INTEGER NOT NULL,
+    resource_id TEXT NOT NULL DEFAULT '',
+    name TEXT NOT NULL DEFAULT '',
+    size TEXT NOT NULL DEFAULT '',
+    create_time TEXT NOT NULL DEFAULT '',
+    latest INTEGER NOT NULL DEFAULT 0,
+    raw TEXT NOT NULL,
+    PRIMARY KEY (mod_id, idx)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS mods_fts USING fts5(
+    title, author, content='mods', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS mods_ai AFTER INSERT ON mods BEGIN
+    INSERT INTO mods_fts(rowid, title, author) VALUES (new.id, new.title, new.author);
+END;
+CREATE TRIGGER IF NOT EXISTS mods_ad AFTER DELETE ON mods BEGIN
+    INSERT INTO mods_fts(mods_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+END;
+CREATE TRIGGER IF NOT EXISTS mods_au AFTER UPDATE ON mods BEGIN
+    INSERT INTO mods_fts(mods_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+    INSERT INTO mods_fts(rowid, title, author) VALUES (new.id, new.title, new.author);
+END;
+"""
+
+# trigram 分词要求检索词至少 3 个字符，更短的词改用 LIKE
+_TRIGRAM_MIN = 3
+
+_ORDER_BY = {
+    "mods_createTime": "m.create_time DESC",
+    "mods_updateTime": "m.update_time DESC",
+    "mods_download_cnt": "m.downloads DESC",
+}
+
+
+def mod_update_ts(mod: Dict[str, Any]) -> float:
+    """mod 的更新时间戳：更新时间 > 最新资源时间 > 创建时间。"""
+    return ModRecord.from_dict(mod).update_ts
+
+
+class ModIndex:
+    def __init__(self, path: os.PathLike | str):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {r[1] for r in self._conn.execute("PRAGMA table_info(mods)")}
+        if "update_ts" not in columns:
+            # 旧库迁移：增量同步按更新时间戳比较水位
+            self._conn.execute("ALTER TABLE mods ADD COLUMN update_ts REAL NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_mods_game_update ON mods(game_id, update_ts)")
+        try:
+            self._conn.executescript(_FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite 未编译 FTS5 或版本过旧（trigram 需要 3.34+）
+            self.fts = False
+        self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def upsert(self, mods: List[Dict[str, Any]], game_id: Optional[int]) -> int:
+        """写入或更新 mod 记录，返回写入条数。"""
+        rows = []
+        resources = []
+        for mod in mods:
+            rec = ModRecord.from_dict(mod)
+            try:
+                mod_id = int(rec.mod_id)
+            except (TypeError, ValueError):
+                continue
+            raw = json.dumps(mod, ensure_ascii=False, separators=(",", ":"))
+            rows.append((
+                mod_id, game_id, rec.title, rec.author, rec.publish_time, rec.update_time,
+                rec.downloads, rec.update_ts, raw,
+            ))
+            raw_res = [r for r in (mod.get("mods_resource") or []) if isinstance(r, dict)]
+            for idx, (r, res) in enumerate(zip(raw_res, rec.resources)):
+                resources.append((
+                    mod_id, idx, res.resource_id, res.name, res.size, res.create_time, 1 if res.latest else 0,
+                    json.dumps(r, ensure_ascii=False, separators=(",", ":")),
+                ))
+        if not rows:
+            return 0
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO mods(id, game_id, title, author, create_time, update_time, downloads, update_ts, raw) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET game_id=excluded.game_id, title=excluded.title, "
+                "author=excluded.author, create_time=excluded.create_time, update_time=excluded.update_time, "
+                "downloads=excluded.downloads, update_ts=excluded.update_ts, raw=excluded.raw",
+                rows,
+            )
+            # 资源版本列表整体替换
+            self._conn.executemany("DELETE FROM resources WHERE mod_id = ?", [(r[0],) for r in rows])
+            self._conn.executemany(
+                "INSERT INTO resources(mod_id, idx, resource_id, name, size, create_time, latest, raw) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                resources,
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def watermark(self, game_id: int) -> float:
+        """已入库记录的最大更新时间戳，作为增量同步的水位。"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(update_ts) FROM mods WHERE game_id = ?", (int(game_id),)
+            ).fetchone()
+        return float(row[0] or 0)
+
+    def search(
+        self,
+        keyword: str,
+        game_id: Optional[int] = None,
+        limit: int = 10,
+        sort_by: str = "",
+        offset: int = 0,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """按标题/作者检索，返回 (原始 mod 记录列表, 命中总数)。多个词之间为 AND。"""
+        terms = [t for t in keyword.split() if t]
+        if not terms:
+            return [], 0
+        where: List[str] = []
+        args: List[Any] = []
+        fts_terms = [t for t in terms if self.fts and len(t) >= _TRIGRAM_MIN]
+        for t in terms:
+            if t in fts_terms:
+                continue
+            like = "%" + t.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            where.append("(m.title LIKE ? ESCAPE '\\' OR m.author LIKE ? ESCAPE '\\')")
+            args.extend([like, like])
+        if game_id is not None:
+            where.append("m.game_id = ?")
+            args.append(int(game_id))
+        order = _ORDER_BY.get(sort_by, "m.downloads DESC")
+        if fts_terms:
+            match = " AND ".join('"' + t.replace('"', '""') + '"' for t in fts_terms)
+            base = "FROM mods_fts JOIN mods m ON m.id = mods_fts.rowid WHERE mods_fts MATCH ?"
+            args.insert(0, match)
+            if sort_by not in _ORDER_BY:
+                order = "bm25(mods_fts)"
+        else:
+            base = "FROM mods m WHERE 1=1"
+        if where:
+            base += " AND " + " AND ".join(where)
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) {base}", args).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT m.raw {base} ORDER BY {order} LIMIT ? OFFSET ?", args + [int(limit), int(offset)]
+            ).fetchall()
+        return [json.loads(r[0]) for r in rows], int(total)
+
+    def get_many(self, ids: List[int]) -> List[Dict[str, Any]]:
+        """按给定顺序取回原始 mod 记录，不存在的 id 会被跳过。"""
+        if not ids:
+            return []
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, raw FROM mods WHERE id IN ({placeholders})", [int(i) for i in ids]
+            ).fetchall()
+        by_id = {r[0]: json.loads(r[1]) for r in rows}
+        return [by_id[int(i)] for i in ids if int(i) in by_id]
+
+    def get(self, mod_id: int) -> Optional[Tuple[Dict[str, Any], Optional[int]]]:
+        """取回单条原始 mod 记录及其游戏 ID，不存在时返回 None。"""
+        with self._lock:
+            row = self._conn.execute("SELECT raw, game_id FROM mods WHERE id = ?", (int(mod_id),)).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def rows_for_ranking(self, game_id: Optional[int] = None) -> List[Tuple[int, str, str, int, float]]:
+        """导出 (id, 标题, 作者, 下载量, 更新时间戳) 供内存倒排索引加载。"""
+        sql = "SELECT id, title, author, downloads, update_ts FROM mods"
+        with self._lock:
+            if game_id is None:
+                return self._conn.execute(sql).fetchall()
+            return self._conn.execute(sql + " WHERE game_id = ?", (int(game_id),)).fetchall()
+
+    def count(self, game_id: Optional[int] = None) -> int:
+        with self._lock:
+            if game_id is None:
+                return self._conn.execute("SELECT COUNT(*) FROM mods").fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM mods WHERE game_id = ?", (int(game_id),)).fetchone()[0]
+
+    def get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO meta(key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+                (key, value),
+            )
+            self._conn.commit()
+
+    def crawled_at(self, game_id: int) -> float:
+        """该游戏最近一次完整爬取的时间戳，未爬取过返回 0。"""
+        return float(self.get_meta(f"crawled_at:{int(game_id)}", "0") or 0)
+
+    def mark_crawled(self, game_id: int) -> float:
+        """记录一次完整爬取，返回记录的时间戳。"""
+        ts = time.time()
+        self.set_meta(f"crawled_at:{int(game_id)}", str(ts))
+        return ts
@@ -0,0 +1,197 @@
+"""
+进程内指标：计数器、延迟直方图与采样型仪表，供 /mod统计 展示，也可导出为 Prometheus 文本格式。
+
+指标名与标签遵循 Prometheus 约定，标签以排序后的 (键, 值) 元组存放；所有操作都在事件循环线程内进行，不加锁。
+"""
+from __future__ import annotations
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# 延迟直方图的桶上界（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "total")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def merge(self, other: "Histogram") -> None:
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.total += other.total
+
+    def quantile(self, q: float) -> float:
+        """按桶线性插值估算分位数；落在最后一个桶之外时返回最大桶上界。"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if i >= len(self.buckets):
+                    return self.buckets[-1]
+                upper = self.buckets[i]
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+            if i < len(self.buckets):
+                lower = self.buckets[i]
+        return self.buckets[-1]
+
+
+class Metrics:
+    def __init__(self, prefix: str = ""):
+        self.prefix = prefix
+        self.started = time.time()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        self._help: Dict[str, str] = {}
+
+    def describe(self, name: str, text: str) -> None:
+        self._help[name] = text
+
+    def inc(self, name: str, value: float = 1, **labels: object) -> None:
+        series = self._counters.setdefault(name, {})
+        key = _labels(labels)
+        series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: object) -> None:
+        series = self._histograms.setdefault(name, {})
+        key = _labels(labels)
+        hist = series.get(key)
+        if hist is None:
+            hist = series[key] = Histogram()
+        hist.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels: object) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def gauge(self, name: str, fn: Callable[[], float]) -> None:
+        """注册采样型仪表，读取时调用 fn 取当前值。"""
+        self._gauges[name] = fn
+
+    def counter(self, name: str, **match: object) -> float:
+        """对标签匹配 match 的所有序列求和。"""
+        want = set(_labels(match))
+        return sum(v for k, v in self._counters.get(name, {}).items() if want <= set(k))
+
+    def counter_by(self, name: str, label: str, **match: object) -> Dict[str, float]:
+        """按某个标签分组求和。"""
+        want = set(_labels(match))
+        out: Dict[str, float] = {}
+        for k, v in self._counters.get(name, {}).items():
+            if want <= set(k):
+                group = dict(k).get(label, "")
+                out[group] = out.get(group, 0) + v
+        return out
+
+    def histogram(self, name: str, **match: object) -> Histogram:
+        """合并标签匹配 match 的所有直方图。"""
+        want = set(_labels(match))
+        merged = Histogram()
+        for k, h in self._histograms.get(name, {}).items():
+            if want <= set(k):
+                merged.merge(h)
+        return merged
+
+    def gauges(self) -> Dict[str, float]:
+        out = {}
+        for name, fn in self._gauges.items():
+            try:
+                out[name] = float(fn())
+            except Exception:
+                continue
+        return out
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+
+        def head(name: str, kind: str) -> str:
+            full = self.prefix + name
+            if name in self._help:
+                lines.append(f"# HELP {full} {self._help[name]}")
+            lines.append(f"# TYPE {full} {kind}")
+            return full
+
+        for name, series in sorted(self._counters.items()):
+            full = head(name, "counter")
+            for labels, value in sorted(series.items()):
+                lines.append(f"{full}{_fmt_labels(labels)} {value:g}")
+        for name, series in sorted(self._histograms.items()):
+            full = head(name, "histogram")
+            for labels, hist in sorted(series.items()):
+                cumulative = 0
+                for upper, n in zip(hist.buckets, hist.counts):
+                    cumulative += n
+                    lines.append(f"{full}_bucket{_fmt_labels(labels, (('le', f'{upper:g}'),))} {cumulative}")
+                lines.append(f"{full}_bucket{_fmt_labels(labels, (('le', '+Inf'),))} {hist.count}")
+                lines.append(f"{full}_sum{_fmt_labels(labels)} {hist.total:.6f}")
+                lines.append(f"{full}_count{_fmt_labels(labels)} {hist.count}")
+        for name, value in sorted(self.gauges().items()):
+            full = head(name, "gauge")
+            lines.append(f"{full} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: os.PathLike | str) -> None:
+        """原子写入文本格式文件，供 node_exporter 的 textfile collector 读取。"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp, path)
+
+
+def fmt_ms(seconds: float) -> str:
+    return f"{seconds * 1000:.0f}ms" if seconds < 10 else f"{seconds:.1f}s"
+
+
+def fmt_rate(part: float, whole: float) -> str:
+    return f"{part / whole * 100:.1f}%" if whole else "-"
+
+
+def uptime_text(started: float, now: Optional[float] = None) -> str:
+    seconds = max(0.0, (now or time.time()) - started)
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} 分钟"
+    if seconds < 86400:
+        return f"{seconds / 3600:.1f} 小时"
+    return f"{seconds / 86400:.1f} 天"
@@ -0,0 +1,215 @@
+"""
+进程内 n-gram 倒排索引：标题/作者中的中日文字符按二元、三元组切分，英文与数字按整词切分，
+用 BM25 打分并叠加下载量加权，通过堆取 top-k，不做全量排序。
+
+倒排表按词项存放 (文档槽位, 加权词频) 两个紧凑数组，槽位递增有序；更新同一 mod 时旧槽位记为删除，
+删除过多时自动压缩。所有读写由锁串行化，可在 asyncio.to_thread 中调用。
+"""
+from __future__ import annotations
+import heapq
+import math
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from .mod_normalize import fold
+except ImportError:  # 作为独立脚本的同级模块导入
+    from mod_normalize import fold
+
+_RUN = re.compile(r"[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff]+|[a-z0-9]+")
+_CJK_START = "\u3040"
+
+
+def tokenize(text: str) -> List[str]:
+    """中日文连续字符切成二元+三元组（单字则保留单字），其余按整词；切分前与查询做相同的折叠（全角、大小写、繁简）。"""
+    tokens: List[str] = []
+    for m in _RUN.finditer(fold(text)):
+        run = m.group()
+        if run[0] < _CJK_START:
+            tokens.append(run)
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            tokens.extend(run[i:i + 3] for i in range(len(run) - 2))
+    return tokens
+
+
+class _Posting:
+    __slots__ = ("docs", "tfs")
+
+    def __init__(self):
+        self.docs = array("I")
+        self.tfs = array("H")
+
+
+class NgramIndex:
+    def __init__(
+        self,
+        k1: float = 1.2,
+        b: float = 0.75,
+        title_weight: int = 2,
+        download_boost: float = 0.3,
+        min_match: float = 0.6,
+    ):
+        self.k1 = k1
+        self.b = b
+        self.title_weight = max(1, int(title_weight))
+        self.download_boost = max(0.0, float(download_boost))
+        self.min_match = min(1.0, max(0.0, float(min_match)))
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self) -> None:
+        self._postings: Dict[str, _Posting] = {}
+        self._ids = array("q")
+        self._lengths = array("f")
+        self._downloads = array("q")
+        self._times = array("d")
+        self._slot_of: Dict[int, int] = {}
+        self._deleted: set = set()
+        self._total_len = 0.0
+        self._max_downloads = 0
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    def add(self, mod_id: int, title: str, author: str = "", downloads: int = 0, sort_time: float = 0.0) -> None:
+        """加入或更新一条记录。sort_time 为更新时间戳。"""
+        with self._lock:
+            self._add(int(mod_id), title, author, int(downloads or 0), float(sort_time or 0))
+            self._maybe_compact()
+
+    def add_many(self, rows) -> None:
+        """批量加入 (mod_id, 标题, 作者, 下载量, 更新时间戳) 记录。"""
+        with self._lock:
+            for mod_id, title, author, downloads, sort_time in rows:
+                self._add(int(mod_id), title, author, int(downloads or 0), float(sort_time or 0))
+            self._maybe_compact()
+
+    def _maybe_compact(self) -> None:
+        # 已删除的槽位仍留在倒排表里、会抬高文档频率，超过四分之一时压缩（压缩代价按更新次数摊销）
+        if len(self._deleted) > 64 and len(self._deleted) * 4 > len(self._ids):
+            self._compact()
+
+    def remove(self, mod_id: int) -> None:
+        with self._lock:
+            self._remove(int(mod_id))
+            self._maybe_compact()
+
+    def _remove(self, mod_id: int) -> None:
+        slot = self._slot_of.pop(mod_id, None)
+        if slot is not None:
+            self._deleted.add(slot)
+            self._total_len -= self._lengths[slot]
+
+    def _add(self, mod_id: int, title: str, author: str, downloads: int, sort_time: float) -> None:
+        self._remove(mod_id)
+        tf: Counter = Counter()
+        for t in tokenize(title):
+            tf[t] += self.title_weight
+        for t in tokenize(author):
+            tf[t] += 1
+        slot = len(self._ids)
+        self._ids.append(mod_id)
+        length = float(sum(tf.values()))
+        self._lengths.append(length)
+        self._downloads.append(downloads)
+        self._times.append(sort_time)
+        self._slot_of[mod_id] = slot
+        self._total_len += length
+        if downloads > self._max_downloads:
+            self._max_downloads = downloads
+        for term, n in tf.items():
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = self._postings[term] = _Posting()
+            posting.docs.append(slot)
+            posting.tfs.append(min(n, 65535))
+
+    def _compact(self) -> None:
+        """丢弃已删除槽位，重新编号。"""
+        live = sorted(self._slot_of.values())
+        remap = {old: new for new, old in enumerate(live)}
+        ids, lengths, downloads, times = array("q"), array("f"), array("q"), array("d")
+        for old in live:
+            ids.append(self._ids[old])
+            lengths.append(self._lengths[old])
+            downloads.append(self._downloads[old])
+            times.append(self._times[old])
+        postings: Dict[str, _Posting] = {}
+        for term, posting in self._postings.items():
+            fresh = _Posting()
+            for slot, n in zip(posting.docs, posting.tfs):
+                new = remap.get(slot)
+                if new is not None:
+                    fresh.docs.append(new)
+                    fresh.tfs.append(n)
+            if fresh.docs:
+                postings[term] = fresh
+        self._postings = postings
+        self._ids, self._lengths, self._downloads, self._times = ids, lengths, downloads, times
+        self._slot_of = {mod_id: i for i, mod_id in enumerate(ids)}
+        self._deleted = set()
+
+    def search(self, query: str, k: int = 10, sort: str = "relevance", offset: int = 0) -> Optional[Tuple[List[int], int]]:
+        """返回 (跳过前 offset 条后的 top-k mod id 列表, 命中总数)。
+
+        sort 为 "relevance"（BM25×下载量加权）/ "downloads" / "time"。
+        查询无法切分出可用词项（如单个汉字）时返回 None，由调用方改用其它检索方式。
+        """
+        terms = set(tokenize(query))
+        if not terms or all(len(t) == 1 and t >= _CJK_START for t in terms):
+            return None
+        with self._lock:
+            n_docs = len(self._slot_of)
+            if n_docs == 0:
+                return [], 0
+            avg_len = self._total_len / n_docs or 1.0
+            scores: Dict[int, float] = {}
+            matched: Counter = Counter()
+            k1, b = self.k1, self.b
+            lengths, deleted = self._lengths, self._deleted
+            postings = [self._postings[t] for t in terms if t in self._postings]
+            # 先处理稀有词项；常见词项的倒排表远大于候选集时，只对候选做二分查找
+            postings.sort(key=lambda p: len(p.docs))
+            for posting in postings:
+                docs, tfs = posting.docs, posting.tfs
+                df = len(docs)
+                # 倒排表含未压缩的已删除槽位，文档频率不超过现存文档数，保证 idf 为正
+                live_df = min(df, n_docs)
+                idf = math.log(1.0 + (n_docs - live_df + 0.5) / (live_df + 0.5))
+                if scores and len(scores) * 16 < df:
+                    pairs = []
+                    for slot in list(scores):
+                        i = bisect_left(docs, slot)
+                        if i < df and docs[i] == slot:
+                            pairs.append((slot, tfs[i]))
+                else:
+                    pairs = zip(docs, tfs)
+                for slot, tf in pairs:
+                    if slot in deleted:
+                        continue
+                    norm = k1 * (1.0 - b + b * lengths[slot] / avg_len)
+                    scores[slot] = scores.get(slot, 0.0) + idf * tf * (k1 + 1.0) / (tf + norm)
+                    matched[slot] += 1
+            need = max(1, math.ceil(self.min_match * len(terms)))
+            hits = [slot for slot, m in matched.items() if m >= need]
+            if sort == "downloads":
+                key = self._downloads.__getitem__
+            elif sort == "time":
+                key = self._times.__getitem__
+            else:
+                boost, max_dl = self.download_boost, self._max_downloads
+                log_max = math.log1p(max_dl) if max_dl > 0 else 1.0
+                downloads = self._downloads
+
+                def key(slot: int) -> float:
+                    return scores[slot] * (1.0 + boost * math.log1p(downloads[slot]) / log_max)
+
+            top = heapq.nlargest(int(offset) + int(k), hits, key=key)[int(offset):]
+            return [self._ids[slot] for slot in top], len(hits)
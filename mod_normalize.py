@@ -0,0 +1,144 @@
+"""
+查询规范化：各搜索路径先规范化关键词，再用作缓存键、合并相同查询的键与本地索引的检索词，
+写法不同而含义相同的查询（全角/半角、大小写、繁简、多余空白、别名）共用同一份缓存和同一条上游请求。
+
+步骤依次为 NFKC 兼容折叠（全角字母数字与标点转半角）、casefold、繁体转简体（内置常用字对照表）、
+合并空白，最后套用别名表（整句匹配优先，其次逐词替换）。fold() 只做前四步，本地倒排索引用它处理标题。
+"""
+from __future__ import annotations
+import json
+import os
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# 常用繁体字 -> 简体字，每项两个字符；只收一对一的字，一简对多繁中有歧义的（如“乾”“著”）不转换
+_T2S_PAIRS = (
+    "萬万 與与 專专 業业 東东 絲丝 兩两 嚴严 個个 豐丰 臨临 為为 麗丽 舉举 麼么 義义 樂乐 習习 鄉乡 "
+    "書书 買买 亂乱 爭争 於于 雲云 亞亚 產产 親亲 億亿 僅仅 從从 倉仓 儀仪 們们 價价 眾众 優优 會会 "
+    "傘伞 偉伟 傳传 傷伤 倫伦 體体 餘余 俠侠 偵侦 側侧 債债 傾倾 償偿 儲储 兒儿 黨党 蘭兰 關关 興兴 "
+    "養养 獸兽 內内 冊册 寫写 軍军 農农 衝冲 決决 況况 凍冻 淨净 涼凉 減减 幾几 鳳凤 凱凯 擊击 劃划 "
+    "劉刘 則则 剛刚 創创 刪删 別别 劑剂 劍剑 劇剧 勸劝 辦办 務务 動动 勵励 勁劲 勞劳 勢势 勻匀 匯汇 "
+    "彙汇 區区 醫医 華华 協协 單单 賣卖 衛卫 廠厂 廳厅 曆历 歷历 厲厉 壓压 廁厕 廚厨 縣县 參参 雙双 "
+    "發发 髮发 變变 疊叠 葉叶 號号 嘆叹 嚇吓 嗎吗 聽听 啟启 吳吴 員员 響响 啞哑 嘩哗 團团 園园 圍围 "
+    "圖图 國国 圓圆 聖圣 場场 壞坏 塊块 堅坚 壇坛 墜坠 壘垒 執执 報报 塵尘 牆墙 壯壮 聲声 殼壳 處处 "
+    "備备 夠够 頭头 夾夹 奪夺 奮奋 獎奖 妝妆 婦妇 媽妈 孫孙 學学 寶宝 實实 寵宠 審审 宮宫 寬宽 賓宾 "
+    "對对 尋寻 導导 將将 爾尔 嘗尝 層层 屬属 歲岁 島岛 嶺岭 峽峡 幣币 帥帅 師师 帳帐 帶带 幫帮 幹干 "
+    "廣广 莊庄 慶庆 應应 廟庙 開开 異异 棄弃 張张 彈弹 強强 歸归 當当 錄录 徹彻 徑径 後后 徵征 憶忆 "
+    "憂忧 懷怀 態态 總总 戀恋 惡恶 惱恼 悶闷 愛爱 懶懒 戰战 戲戏 戶户 撲扑 擴扩 掃扫 揚扬 擾扰 撫抚 "
+    "搶抢 護护 擔担 擬拟 擁拥 擇择 掛挂 擋挡 揮挥 損损 撿捡 換换 據据 擺摆 攜携 攝摄 擠挤 撐撑 數数 "
+    "斂敛 斷断 無无 舊旧 時时 曠旷 暫暂 曬晒 術术 機机 殺杀 雜杂 權权 條条 來来 楊杨 極极 構构 樹树 "
+    "標标 樣样 橋桥 檢检 槍枪 櫃柜 檔档 歡欢 歐欧 殘残 氣气 漢汉 湯汤 溝沟 沒没 滄沧 澤泽 潔洁 灑洒 "
+    "淺浅 濟济 濃浓 滅灭 燈灯 靈灵 災灾 點点 煉炼 爐炉 熱热 營营 燒烧 爺爷 牽牵 犧牺 狀状 獨独 獵猎 "
+    "貓猫 獄狱 現现 瑣琐 環环 電电 畫画 暢畅 療疗 癡痴 盜盗 盤盘 監监 盡尽 睜睁 礦矿 碼码 磚砖 確确 "
+    "礙碍 禮礼 禍祸 離离 種种 積积 稱称 穩稳 窮穷 竊窃 競竞 筆笔 築筑 簡简 籃篮 類类 紅红 約约 級级 "
+    "紀纪 純纯 紙纸 納纳 線线 組组 細细 終终 經经 結结 給给 絕绝 統统 繼继 續续 維维 綠绿 網网 緊紧 "
+    "練练 編编 緣缘 縮缩 織织 繪绘 罰罚 聞闻 聯联 聰聪 職职 腦脑 膚肤 臉脸 艦舰 藝艺 節节 範范 藥药 "
+    "蘇苏 蟲虫 蝦虾 補补 裝装 裡里 裏里 製制 複复 復复 見见 規规 視视 覺觉 覽览 觀观 計计 訊讯 討讨 "
+    "訓训 記记 設设 許许 論论 訪访 證证 評评 詞词 試试 話话 誠诚 語语 說说 請请 讀读 課课 誰谁 調调 "
+    "談谈 謝谢 識识 譯译 議议 讓让 誤误 認认 豬猪 貝贝 負负 貢贡 財财 責责 貨货 販贩 貪贪 貫贯 購购 "
+    "貿贸 費费 資资 賽赛 贊赞 贏赢 貴贵 賊贼 趕赶 趙赵 躍跃 車车 軌轨 軟软 載载 輕轻 輪轮 輸输 轉转 "
+    "輛辆 軸轴 辭辞 邊边 遊游 運运 過过 達达 遠远 遲迟 選选 還还 適适 遺遗 進进 連连 這这 郵邮 鄰邻 "
+    "醜丑 釋释 針针 釣钓 鈴铃 銀银 銅铜 鋼钢 錢钱 錯错 鍵键 鏡镜 鐘钟 鍾钟 鐵铁 鎮镇 鎖锁 鑰钥 錘锤 "
+    "鎧铠 鋒锋 銳锐 鏽锈 鑽钻 鑄铸 鍛锻 鍋锅 鏈链 長长 門门 閃闪 閉闭 問问 間间 閱阅 隊队 陽阳 陰阴 "
+    "陣阵 階阶 際际 陸陆 險险 隨随 隱隐 難难 雞鸡 雖虽 霧雾 靜静 韓韩 頁页 頂顶 項项 順顺 須须 預预 "
+    "領领 頻频 題题 額额 顏颜 願愿 顯显 風风 飛飞 飯饭 飲饮 館馆 飾饰 飪饪 馬马 駕驾 駛驶 驗验 騎骑 "
+    "驚惊 驅驱 鬥斗 鬧闹 魚鱼 鮮鲜 鳥鸟 鴨鸭 麥麦 麵面 黃黄 齊齐 齒齿 龍龙 龜龟 質质 貼贴 紋纹 褲裤 "
+    "襪袜 殭僵 屍尸 庫库 穫获 獲获 採采 誌志 臺台 隻只 週周 鬆松 髒脏 臟脏 勝胜 敗败 緩缓 藍蓝 絡络 "
+    "測测 夢梦 寧宁 懼惧 砲炮 壺壶 籠笼 繩绳 綁绑 攤摊 彥彦 傢家 準准 擲掷 鏢镖 釘钉 鋸锯 鉛铅 錫锡 "
+    "鋁铝 鋅锌 鎳镍 鈍钝 錐锥 鍊炼")
+_T2S = str.maketrans({p[0]: p[1] for p in _T2S_PAIRS.split()})
+
+
+def fold(text: str) -> str:
+    """NFKC 折叠 + casefold + 繁转简 + 合并空白，不含别名。"""
+    text = unicodedata.normalize("NFKC", str(text or "")).casefold().translate(_T2S)
+    return " ".join(text.split())
+
+
+def parse_aliases(text: str) -> Dict[str, str]:
+    """解析配置中的别名表：'别名=标准词,别名=标准词'，也接受中文逗号与换行分隔。"""
+    aliases: Dict[str, str] = {}
+    for item in str(text or "").replace("，", ",").replace("\n", ",").split(","):
+        alias, sep, target = item.partition("=")
+        if sep and alias.strip() and target.strip():
+            aliases[alias.strip()] = target.strip()
+    return aliases
+
+
+class QueryNormalizer:
+    """关键词规范化器：配置中的别名 + 管理员维护的别名（持久化到 path），后者覆盖前者。
+
+    规范化结果按 LRU 缓存，别名变化时整体失效。
+    """
+
+    def __init__(self, aliases: Optional[Dict[str, str]] = None, path: os.PathLike | str | None = None, cache_size: int = 4096):
+        self.path = Path(path) if path is not None else None
+        self.configured = {fold(k): fold(v) for k, v in (aliases or {}).items()}
+        self.custom: Dict[str, str] = {}
+        self.cache_size = max(0, int(cache_size))
+        self._load()
+        self._rebuild()
+
+    def __call__(self, text: str) -> str:
+        return self._normalize(str(text or ""))
+
+    def _load(self) -> None:
+        if self.path is None:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                obj = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(obj, dict):
+            self.custom = {fold(k): fold(v) for k, v in obj.items() if isinstance(v, str)}
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.custom, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
+    def add_alias(self, alias: str, target: str) -> Tuple[str, str]:
+        """添加或覆盖一条别名，返回折叠后的 (别名, 标准词)；两者相同或为空时抛出 ValueError。"""
+        alias, target = fold(alias), fold(target)
+        if not alias or not target or alias == target:
+            raise ValueError("别名与标准词不能为空或相同")
+        self.custom[alias] = target
+        self._rebuild()
+        return alias, target
+
+    def remove_alias(self, alias: str) -> bool:
+        """删除管理员添加的别名；配置中的别名只能在配置里修改。"""
+        removed = self.custom.pop(fold(alias), None) is not None
+        if removed:
+            self._rebuild()
+        return removed
+
+    def _rebuild(self) -> None:
+        merged = {k: v for k, v in {**self.configured, **self.custom}.items() if k and v and k != v}
+        # 展开链式别名 a -> b -> c，遇到环时停在环上，保证同一查询总是得到同一结果
+        self.aliases: Dict[str, str] = {}
+        for alias, target in merged.items():
+            seen = {alias}
+            while target in merged and target not in seen:
+                seen.add(target)
+                target = merged[target]
+            if target != alias:
+                self.aliases[alias] = target
+        self._normalize = lru_cache(maxsize=self.cache_size)(self._apply) if self.cache_size else self._apply
+
+    def _apply(self, text: str) -> str:
+        query = fold(text)
+        if not self.aliases:
+            return query
+        if query in self.aliases:
+            return self.aliases[query]
+        if " " in query:
+            query = " ".join(self.aliases.get(t, t) for t in query.split(" "))
+        return self.aliases.get(query, query)
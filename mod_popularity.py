@@ -0,0 +1,99 @@
+"""
+查询热度统计：count-min sketch 估算每个查询的出现次数，配合最小堆维护前 k 个热门查询。
+
+内存占用固定（width × depth 个计数器 + k 个候选），与不同查询的数量无关；
+decay() 把所有计数减半，使热度反映近期流量。所有操作都在事件循环线程内进行，不加锁。
+"""
+from __future__ import annotations
+import heapq
+from typing import Any, Dict, Hashable, List, Tuple
+
+
+class CountMinSketch:
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = max(16, int(width))
+        self.depth = max(1, int(depth))
+        self._rows = [[0] * self.width for _ in range(self.depth)]
+
+    def _cells(self, key: Hashable) -> List[int]:
+        return [hash((i, key)) % self.width for i in range(self.depth)]
+
+    def add(self, key: Hashable, count: int = 1) -> int:
+        """累加并返回新的估计值（只会高估，不会低估）。"""
+        est = None
+        for row, cell in zip(self._rows, self._cells(key)):
+            row[cell] += count
+            est = row[cell] if est is None else min(est, row[cell])
+        return est or 0
+
+    def estimate(self, key: Hashable) -> int:
+        return min(row[cell] for row, cell in zip(self._rows, self._cells(key)))
+
+    def decay(self) -> None:
+        for row in self._rows:
+            for i, v in enumerate(row):
+                if v:
+                    row[i] = v >> 1
+
+
+class HotQueries:
+    """前 k 个热门查询：键 -> (估计次数, 附带数据)，附带数据用于重放该查询。
+
+    堆中的旧条目在计数变化后不删除，出堆时与当前计数比对后跳过。
+    """
+
+    def __init__(self, k: int = 20, width: int = 2048, depth: int = 4):
+        self.k = max(1, int(k))
+        self.sketch = CountMinSketch(width, depth)
+        self._top: Dict[Hashable, Tuple[int, Any]] = {}
+        self._heap: List[Tuple[int, int, Hashable]] = []
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self._top)
+
+    def record(self, key: Hashable, payload: Any = None, count: int = 1) -> int:
+        est = self.sketch.add(key, count)
+        if key in self._top:
+            self._top[key] = (est, payload if payload is not None else self._top[key][1])
+            self._push(est, key)
+        elif len(self._top) < self.k:
+            self._top[key] = (est, payload)
+            self._push(est, key)
+        else:
+            floor, victim = self._min()
+            if est > floor:
+                del self._top[victim]
+                self._top[key] = (est, payload)
+                self._push(est, key)
+        return est
+
+    def top(self, n: int | None = None) -> List[Tuple[Hashable, int, Any]]:
+        """按估计次数从高到低返回 (键, 次数, 附带数据)。"""
+        items = sorted(self._top.items(), key=lambda kv: kv[1][0], reverse=True)
+        return [(k, c, p) for k, (c, p) in items[:n]]
+
+    def decay(self) -> None:
+        self.sketch.decay()
+        self._top = {k: (c >> 1, p) for k, (c, p) in self._top.items()}
+        self._rebuild()
+
+    def _push(self, count: int, key: Hashable) -> None:
+        self._seq += 1
+        heapq.heappush(self._heap, (count, self._seq, key))
+        if len(self._heap) > 8 * self.k + 64:
+            # 旧条目过多时按当前计数重建
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        self._heap = [(c, self._seq + i, k) for i, (k, (c, _)) in enumerate(self._top.items(), 1)]
+        self._seq += len(self._heap)
+        heapq.heapify(self._heap)
+
+    def _min(self) -> Tuple[int, Hashable]:
+        while True:
+            count, _, key = self._heap[0]
+            current = self._top.get(key)
+            if current is not None and current[0] == count:
+                return count, key
+            heapq.heappop(self._heap)
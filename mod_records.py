@@ -0,0 +1,283 @@
+"""
+接口响应的统一解析：三种响应形态只识别一次，解码为紧凑的 ModRecord / ModResource 对象，
+发布时间、更新时间与大小在解析时即确定，后续格式化、排序、缓存与索引都直接使用这些对象。
+
+响应形态：
+  A: { data: [ ... ], total? }
+  B: { data: { data: [ ... ], total? } }
+  C: 旧版 { data: { mod: [ ... ], count? } }
+
+详情接口返回单个 mod，解码为 ModDetail（附带条件请求用的校验字段）。
+"""
+from __future__ import annotations
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+
+@lru_cache(maxsize=8192)
+def parse_time(s: str) -> float:
+    """把接口中的时间字符串（ISO 8601 / YYYY-MM-DD[ HH:MM:SS] / YYYY/MM/DD）转成时间戳，无法解析返回 0。
+
+    常见格式走切片快速路径，不抛异常；结果按字符串缓存，同一页里重复的时间只解析一次。
+    """
+    if not s:
+        return 0.0
+    ss = str(s).strip()
+    if ss.endswith("Z"):
+        ss = ss[:-1]
+    n = len(ss)
+    # 快速路径：YYYY-MM-DD / YYYY/MM/DD，可带 [T ]HH:MM:SS[.fff]
+    if n >= 10 and ss[4] in "-/" and ss[7] == ss[4] and ss[:4].isdigit() and ss[5:7].isdigit() and ss[8:10].isdigit():
+        if n == 10:
+            return _to_ts(int(ss[:4]), int(ss[5:7]), int(ss[8:10]), 0, 0, 0, 0.0)
+        if (n >= 19 and ss[10] in "T " and ss[13] == ":" and ss[16] == ":"
+                and ss[11:13].isdigit() and ss[14:16].isdigit() and ss[17:19].isdigit()):
+            frac = 0.0
+            if n > 19:
+                tail = ss[20:]
+                if ss[19] != "." or not tail.isdigit():
+                    # 带时区偏移等少见格式交给慢速路径
+                    return _parse_time_slow(ss)
+                frac = float("0." + tail)
+            return _to_ts(int(ss[:4]), int(ss[5:7]), int(ss[8:10]), int(ss[11:13]), int(ss[14:16]), int(ss[17:19]), frac)
+    return _parse_time_slow(ss)
+
+
+def _to_ts(y: int, mo: int, d: int, h: int, mi: int, sec: int, frac: float) -> float:
+    try:
+        return datetime(y, mo, d, h, mi, sec).timestamp() + frac
+    except ValueError:
+        return 0.0
+
+
+def _parse_time_slow(ss: str) -> float:
+    try:
+        return datetime.fromisoformat(ss.replace("/", "-")).timestamp()
+    except ValueError:
+        pass
+    for fmt in ("%Y-%m-%d", "%Y/%m/%d"):
+        try:
+            return datetime.strptime(ss.split("T", 1)[0].split(" ", 1)[0], fmt).timestamp()
+        except ValueError:
+            continue
+    return 0.0
+
+
+def date_part(s: str) -> str:
+    """只保留日期部分：2025-09-12T05:55:54.736Z -> 2025-09-12。"""
+    s = str(s or "")
+    return s.split("T", 1)[0] if "T" in s else s.split(" ", 1)[0]
+
+
+def _int(value: Any) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class ModResource:
+    __slots__ = ("resource_id", "name", "size", "create_time", "latest")
+
+    def __init__(self, resource_id: str, name: str, size: str, create_time: str, latest: bool):
+        self.resource_id = resource_id
+        self.name = name
+        self.size = size
+        self.create_time = create_time
+        self.latest = latest
+
+    @classmethod
+    def from_dict(cls, r: Dict[str, Any]) -> "ModResource":
+        return cls(
+            str(r.get("mods_resource_id", r.get("id", "")) or ""),
+            str(r.get("mods_resource_name", r.get("name", "")) or ""),
+            str(r.get("mods_resource_size", r.get("size", "")) or ""),
+            str(r.get("mods_resource_createTime", r.get("createTime", "")) or ""),
+            bool(r.get("mods_resource_latest_version")),
+        )
+
+    def to_list(self) -> list:
+        return [self.resource_id, self.name, self.size, self.create_time, self.latest]
+
+
+class ModRecord:
+    __slots__ = (
+        "mod_id", "title", "author", "publish_time", "update_time", "downloads", "size", "resources",
+        "publish_ts", "update_ts",
+    )
+
+    def __init__(
+        self,
+        mod_id: Any,
+        title: str,
+        author: str,
+        publish_time: str,
+        update_time: str,
+        downloads: int,
+        size: str,
+        resources: Tuple[ModResource, ...] = (),
+    ):
+        self.mod_id = mod_id
+        self.title = title
+        self.author = author
+        self.publish_time = publish_time
+        self.update_time = update_time
+        self.downloads = downloads
+        self.size = size
+        self.resources = resources
+        # 排序用的时间戳在构造时一次算好
+        self.publish_ts = parse_time(publish_time)
+        self.update_ts = parse_time(update_time)
+
+    @classmethod
+    def from_dict(cls, mod: Dict[str, Any]) -> "ModRecord":
+        res = mod.get("mods_resource") or []
+        resources = tuple(ModResource.from_dict(r) for r in res if isinstance(r, dict)) if isinstance(res, list) else ()
+        # 资源最新时间：优先 latest_version，其次按资源创建时间取最大
+        latest_res_time = ""
+        if resources:
+            latest = next((r for r in resources if r.latest), None)
+            if latest is None:
+                latest = max(resources, key=lambda r: parse_time(r.create_time))
+            latest_res_time = latest.create_time
+        create_time = str(mod.get("createTime", mod.get("mods_createTime", "")) or "")
+        update_time = str(mod.get("updateTime", mod.get("mods_updateTime", "")) or "")
+        size = str(mod.get("size", mod.get("mods_resource_size", "")) or "")
+        if not size and resources:
+            size = resources[0].size
+        return cls(
+            mod.get("id", mod.get("mods_id", "")),
+            str(mod.get("title", mod.get("mods_title", "")) or ""),
+            str(mod.get("author", mod.get("mods_author", mod.get("user_nickName", ""))) or ""),
+            # 发布时间：创建时间 > 资源最新时间
+            create_time or latest_res_time,
+            # 更新时间：更新字段 > 资源最新时间 > 创建时间
+            update_time or latest_res_time or create_time,
+            _int(mod.get("downloadCnt", mod.get("mods_download_cnt", 0))),
+            size,
+            resources,
+        )
+
+    def approx_size(self) -> int:
+        """估算占用（字符数），供缓存按内存上限淘汰。"""
+        n = 112 + len(self.title) + len(self.author) + len(self.publish_time) + len(self.update_time) + len(self.size)
+        for r in self.resources:
+            n += 48 + len(r.resource_id) + len(r.name) + len(r.size) + len(r.create_time)
+        return n
+
+    def to_list(self) -> list:
+        """紧凑的可 JSON 序列化形式（按构造参数顺序），供持久化缓存使用。"""
+        return [
+            self.mod_id, self.title, self.author, self.publish_time, self.update_time, self.downloads, self.size,
+            [r.to_list() for r in self.resources],
+        ]
+
+    @classmethod
+    def from_list(cls, row: list) -> "ModRecord":
+        *fields, resources = row
+        return cls(*fields, tuple(ModResource(*r) for r in resources))
+
+
+class SearchResult:
+    __slots__ = ("mods", "total", "shape", "error")
+
+    def __init__(self, mods: List[ModRecord], total: int, shape: str = "", error: Optional[str] = None):
+        self.mods = mods
+        self.total = total
+        self.shape = shape
+        self.error = error
+
+    def approx_size(self) -> int:
+        return 64 + sum(m.approx_size() for m in self.mods)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"mods": [m.to_list() for m in self.mods], "total": self.total, "shape": self.shape, "error": self.error}
+
+    @classmethod
+    def from_dict(cls, obj: Dict[str, Any]) -> "SearchResult":
+        return cls([ModRecord.from_list(m) for m in obj["mods"]], int(obj["total"]), obj.get("shape", ""), obj.get("error"))
+
+
+def extract_mods(data: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], int, str]:
+    """识别响应形态，返回 (原始 mod 列表, 总数, 形态)。"""
+    d = data.get("data")
+    if isinstance(d, list):
+        return d, _int(data.get("total", len(d))), "A"
+    if isinstance(d, dict):
+        if isinstance(d.get("data"), list):
+            mods = d.get("data", [])
+            return mods, _int(d.get("total", len(mods))), "B"
+        mods = d.get("mod", []) or []
+        return mods, _int(d.get("count", len(mods))), "C"
+    return [], 0, ""
+
+
+def parse_response(data: Dict[str, Any]) -> SearchResult:
+    """把接口响应解码为 SearchResult；旧接口的错误码写入 error。"""
+    mods, total, shape = extract_mods(data)
+    error = None
+    if not shape:
+        code = data.get("code")
+        if code is not None and str(code) not in ("00", "0"):
+            error = str(data.get("message", "API返回错误"))
+    return SearchResult([ModRecord.from_dict(m) for m in mods if isinstance(m, dict)], total, shape, error)
+
+
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+def _plain_text(s: Any) -> str:
+    """去掉简介中的 HTML 标签与多余空白。"""
+    text = _TAG_RE.sub(" ", str(s or "")).replace("&nbsp;", " ")
+    return " ".join(text.split())
+
+
+class ModDetail:
+    """单个 mod 的详情：记录本身、简介、所属游戏，以及条件请求用的 ETag / Last-Modified。"""
+
+    __slots__ = ("record", "description", "game_id", "etag", "last_modified")
+
+    def __init__(
+        self,
+        record: ModRecord,
+        description: str = "",
+        game_id: Optional[int] = None,
+        etag: str = "",
+        last_modified: str = "",
+    ):
+        self.record = record
+        self.description = description
+        self.game_id = game_id
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @classmethod
+    def from_dict(
+        cls, mod: Dict[str, Any], game_id: Optional[int] = None, etag: str = "", last_modified: str = ""
+    ) -> "ModDetail":
+        desc = next((mod[k] for k in ("mods_desc", "mods_content", "description", "desc", "intro") if mod.get(k)), "")
+        gid = _int(mod.get("mods_game_id", mod.get("game_id", mod.get("gameId", 0)))) or game_id
+        return cls(ModRecord.from_dict(mod), _plain_text(desc), gid, etag, last_modified)
+
+    @property
+    def validators(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+    def approx_size(self) -> int:
+        return 48 + self.record.approx_size() + len(self.description) + len(self.etag) + len(self.last_modified)
+
+
+def extract_detail(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """从详情接口响应中取出原始 mod 记录：{data: {...}} / {data: {mod: {...}}} / {data: [{...}]}。"""
+    d = data.get("data", data)
+    if isinstance(d, dict) and isinstance(d.get("mod"), dict):
+        d = d["mod"]
+    elif isinstance(d, dict) and isinstance(d.get("data"), (dict, list)):
+        d = d["data"]
+    if isinstance(d, list):
+        d = d[0] if d else None
+    if isinstance(d, dict) and (d.get("id") or d.get("mods_id")):
+        return d
+    return None
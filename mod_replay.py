@@ -0,0 +1,128 @@
+"""
+流量录制与回放：插件把线上搜索记录成匿名化的 JSONL 查询日志，mod_search_local_test.py 按原始节奏
+（或按倍速）回放，用于离线比较缓存、限速等配置在真实流量下的表现。
+
+- 每行一条查询：{"ts": 墙钟时间, "keyword": 规范化后的关键词, "game": 游戏ID 或 ID 列表 / null, "page": 页码,
+  "user": 用户假名, "group": 群假名}；用户与群 ID 用进程内随机盐做 HMAC，只保留前 12 位，
+  同一次运行内可区分用户（保留准入控制的按用户行为），无法还原真实 ID
+- 记录只追加到内存缓冲，由插件的后台任务定期在线程中写盘；缓冲超过上限时丢弃最旧的记录
+"""
+from __future__ import annotations
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+
+class QueryRecorder:
+    def __init__(self, path: os.PathLike | str, max_buffer: int = 10000):
+        self.path = Path(path)
+        self._salt = secrets.token_bytes(16)
+        self._buffer: deque = deque(maxlen=max(1, int(max_buffer)))
+        self.recorded = 0
+
+    def pseudonym(self, ident: str) -> str:
+        if not ident:
+            return ""
+        return hmac.new(self._salt, ident.encode("utf-8"), hashlib.sha256).hexdigest()[:12]
+
+    def record(self, keyword: str, game: Any = None, page: int = 1, user: str = "", group: str = "",
+               ts: Optional[float] = None) -> None:
+        self._buffer.append({
+            "ts": round(time.time() if ts is None else ts, 3),
+            "keyword": keyword,
+            "game": list(game) if isinstance(game, (list, tuple)) else game,
+            "page": int(page),
+            "user": self.pseudonym(user),
+            "group": self.pseudonym(group),
+        })
+        self.recorded += 1
+
+    def take(self) -> List[Dict[str, Any]]:
+        """取出缓冲中的全部记录（在事件循环线程中调用），之后交给 write() 写盘。"""
+        items = list(self._buffer)
+        self._buffer.clear()
+        return items
+
+    def write(self, items: Sequence[Dict[str, Any]]) -> int:
+        if not items:
+            return 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            for item in items:
+                f.write(json.dumps(item, ensure_ascii=False, separators=(",", ":")) + "\n")
+        return len(items)
+
+
+def load_log(path: os.PathLike | str, limit: int = 0) -> List[Dict[str, Any]]:
+    """读取查询日志并按时间排序，跳过无法解析或没有关键词的行；limit > 0 时只取最早的 limit 条。"""
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                item = json.loads(line)
+                keyword = str(item["keyword"]).strip()
+                ts = float(item.get("ts", 0))
+            except (ValueError, KeyError, TypeError):
+                continue
+            if keyword:
+                entries.append(dict(item, keyword=keyword, ts=ts, page=int(item.get("page") or 1)))
+    entries.sort(key=lambda e: e["ts"])
+    return entries[:limit] if limit > 0 else entries
+
+
+async def replay(
+    entries: Sequence[Dict[str, Any]],
+    run_one: Callable[[Dict[str, Any]], Awaitable[str]],
+    speed: float = 1.0,
+    concurrency: int = 16,
+) -> Dict[str, Any]:
+    """按日志中的相对时间回放：第 i 条在 (ts_i - ts_0) / speed 秒后发出，speed <= 0 时不等待。
+
+    同时进行的查询最多 concurrency 个；延迟从计划发出时刻算起，因并发上限而排队的时间也计入，
+    避免回放端变慢时低估延迟。run_one 返回结果分类（如 results / empty / rejected）。
+    """
+    if not entries:
+        return {"latencies": [], "outcomes": {}, "failures": [], "elapsed_s": 0.0, "max_lag_s": 0.0}
+    sem = asyncio.Semaphore(max(1, int(concurrency)))
+    loop = asyncio.get_running_loop()
+    origin = entries[0]["ts"]
+    start = loop.time()
+    latencies: List[float] = []
+    outcomes: Dict[str, int] = {}
+    failures: List[str] = []
+    max_lag = 0.0
+
+    async def fire(entry: Dict[str, Any], due: float) -> None:
+        nonlocal max_lag
+        async with sem:
+            max_lag = max(max_lag, loop.time() - due)
+            try:
+                outcome = await run_one(entry)
+            except Exception as e:
+                outcome = "exception"
+                failures.append(f"{entry['keyword']}: {type(e).__name__} - {e}")
+            latencies.append(loop.time() - due)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    tasks = []
+    for entry in entries:
+        due = start + ((entry["ts"] - origin) / speed if speed > 0 else 0.0)
+        delay = due - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(fire(entry, due)))
+    await asyncio.gather(*tasks)
+    return {
+        "latencies": sorted(latencies),
+        "outcomes": outcomes,
+        "failures": failures,
+        "elapsed_s": loop.time() - start,
+        "max_lag_s": max_lag,
+    }
@@ -3,11 +3,18 @@
 """
 本地独立测试脚本：直接调用 3DM v3 接口进行搜索，打印结果。
 - 支持回退策略：默认 -> 去掉 gameId -> Bearer 认证 -> 仅 keyword
+- 记住上次命中的组合（见 mod_strategy.py），下次优先单次请求；未命中时才以有限并发重新探测
 - 依赖 httpx（已在插件 requirements.txt 中）
 
+- 回放模式（--replay）：按原始节奏或倍速回放插件记录的查询日志（配置项 query_log_file），目标可以是
+  ModSearchPlugin 本身（验证缓存、限速等配置）或 search_mods，输出延迟分位数、每次查询的上游请求数与缓存命中率
+
 用法示例（参数也可从环境变量读取）：
   python mod_search_local_test.py --keyword 工具箱 --appkey <你的APPKEY> --game-id 261
   python mod_search_local_test.py -k 整合包 -a <你的APPKEY>
+  python mod_search_local_test.py -k 整合包 -a <你的APPKEY> --record queries.jsonl
+  python mod_search_local_test.py --replay queries.jsonl --fake-server --speed 10 --config '{"cache_ttl": 600}'
+  python mod_search_local_test.py --replay queries.jsonl --target api --base-url http://127.0.0.1:8765 --speed 0
 
 环境变量：
   APPKEY         接口密钥，若未通过参数提供则从此处读取
@@ -16,6 +23,8 @@
   SORT_BY        默认为 mods_createTime
   SORT_ORDER     默认为 desc
   IS_RECOMMEND   0 或 1，默认 0
+  STRATEGY_FILE  已学习策略文件，默认与插件共用（插件数据目录下的 strategy.json）；回放插件时仅在显式指定时读写
+  PROBE_CONCURRENCY  重新探测时的并发数，默认 4
 """
 from __future__ import annotations
 import os
@@ -23,15 +32,16 @@ import sys
 import json
 import argparse
 import asyncio
-from typing import Dict, Any
+import logging
+from pathlib import Path
+from typing import Any, Callable, Dict
 
 import httpx
 
-API_URL = "https://mod.3dmgame.com/api/v3/mods"
-ALT_URLS = [
-    API_URL,
-    "https://mod.3dmgame.com/api/v3/mods/search",
-]
+from mod_records import date_part, parse_response
+from mod_replay import QueryRecorder, load_log, replay
+from mod_strategy import StrategyStore, apply_strategy, contains_hits, probe
+from mod_transport import RedirectTransport
 
 
 def build_headers(appkey: str, bearer: bool = False) -> Dict[str, str]:
@@ -60,9 +70,10 @@ def build_params(
     sort_by: str,
     sort_order: str,
     is_recommend: int,
+    page: int = 1,
 ) -> Dict[str, Any]:
     return {
-        "page": 1,
+        "page": int(page),
         "gameId": game_id,
         "isRecommend": 1 if is_recommend else 0,
         "sortBy": sort_by,
@@ -74,46 +85,25 @@ def build_params(
     }
 
 
-def get_count(data_obj: Dict[str, Any]) -> int:
-    # 形态 A: { data: [ ... ], total?: n }
-    if isinstance(data_obj.get("data"), list):
-        return int(data_obj.get("total", len(data_obj.get("data", []))) or 0)
-    # 形态 B: { data: { data: [ ... ], total?: n } }
-    if isinstance(data_obj.get("data"), dict):
-        d = data_obj.get("data", {})
-        if isinstance(d.get("data"), list):
-            return int(d.get("total", len(d.get("data", []))) or 0)
-        # 形态 C: 旧版：{ data: { mod: [ ... ], count?: n } }
-        return int(d.get("count", len(d.get("mod", []))) or 0)
-    return 0
+def default_strategy_file() -> str:
+    """插件的已学习策略文件（与 main.plugin_data_dir() 同一目录），使本地测试与插件共用同一份策略"""
+    try:
+        from astrbot.api.star import StarTools
+        data_dir = Path(StarTools.get_data_dir("astrbot_plugin_3dmapi"))
+    except Exception:
+        data_dir = Path("data") / "plugin_data" / "astrbot_plugin_3dmapi"
+    return str(data_dir / "strategy.json")
 
 
-async def do_request(url: str, params: Dict[str, Any], headers: Dict[str, str]) -> httpx.Response:
-    async with httpx.AsyncClient(timeout=20.0) as client:
-        resp = await client.get(url, headers=headers, params=params)
-    return resp
-
-
-def contains_hits(data: Dict[str, Any], keyword: str) -> bool:
-    """粗略判断是否命中关键词（看标题/作者是否包含关键词）。"""
-    kw = (keyword or "").strip().lower()
-    if not kw:
-        return False
-    mods: list[Dict[str, Any]] = []
-    if isinstance(data.get("data"), list):
-        mods = data.get("data", [])
-    elif isinstance(data.get("data"), dict):
-        d = data.get("data", {})
-        if isinstance(d.get("data"), list):
-            mods = d.get("data", [])
-        else:
-            mods = d.get("mod", [])
-    for m in mods:
-        title = str(m.get("title", m.get("mods_title", ""))).lower()
-        author = str(m.get("author", m.get("mods_author", m.get("user_nickName", "")))).lower()
-        if kw in title or kw in author:
-            return True
-    return False
+def make_client(base_url: str = "", timeout: float = 20.0, **kwargs: Any) -> httpx.AsyncClient:
+    """创建 HTTP 客户端；base_url 非空时所有请求的协议/主机/端口改写为该地址，路径与参数不变。"""
+    if base_url:
+        kwargs["transport"] = RedirectTransport(base_url, httpx.AsyncHTTPTransport(limits=kwargs.pop("limits", httpx.Limits())))
+    return httpx.AsyncClient(timeout=timeout, **kwargs)
+
+
+async def do_request(client: httpx.AsyncClient, url: str, params: Dict[str, Any], headers: Dict[str, str]) -> httpx.Response:
+    return await client.get(url, headers=headers, params=params)
 
 
 async def search_mods(
@@ -124,136 +114,78 @@ async def search_mods(
     sort_by: str = "mods_createTime",
     sort_order: str = "desc",
     is_recommend: int = 0,
+    strategy_file: str = "",
+    probe_concurrency: int = 4,
+    page: int = 1,
+    base_url: str = "",
+    client: httpx.AsyncClient | None = None,
+    log: Callable[[str], None] = print,
 ) -> Dict[str, Any]:
-    params_base = build_params(keyword, game_id, page_size, sort_by, sort_order, is_recommend)
-    headers_auth = build_headers(appkey, bearer=False)
-    headers_bearer = build_headers(appkey, bearer=True)
-
-    # 关键词参数变体
-    keyword_variants = [
-        {"key": keyword, "keyword": keyword},
-        {"keywords": keyword},
-        {"wd": keyword},
-        {"q": keyword},
-        {"search": keyword},
-        {"searchKey": keyword},
-        {"searchWord": keyword},
-        {"title": keyword},
-        {"modsTitle": keyword},
-    ]
-
-    attempt_id = 0
-    last_candidate: Dict[str, Any] = {"data": [], "total": 0}
-    for url in ALT_URLS:
-        for header_mode, headers in [("Authorization", headers_auth), ("Bearer", headers_bearer)]:
-            for include_gid in [True, False]:
-                for kv in keyword_variants:
-                    attempt_id += 1
-                    p = dict(params_base)
-                    if not include_gid:
-                        p.pop("gameId", None)
-                    # 清理旧关键词键
-                    for rm in ["key", "keyword", "keywords", "wd", "q", "search", "searchKey", "searchWord", "title", "modsTitle"]:
-                        p.pop(rm, None)
-                    p.update(kv)
-
-                    print(f"[尝试{attempt_id}] URL={url.split('/api/',1)[-1]} | 头={header_mode} | 含gameId={include_gid} | 关键词键={list(kv.keys())[0]}")
-                    resp = await do_request(url, p, headers)
-                    print(f"  状态码: {resp.status_code}")
-                    if resp.status_code != 200:
-                        continue
-                    data = resp.json()
-                    # 若接口返回有结果并且命中关键词，则接受
-                    if get_count(data) > 0 and contains_hits(data, keyword):
-                        data.setdefault("_meta", {})
-                        data["_meta"].update({
-                            "attempt": attempt_id,
-                            "url": url,
-                            "header": header_mode,
-                            "include_gid": include_gid,
-                            "kv_key": list(kv.keys())[0],
-                        })
-                        return data
-                    # 如果有结果但未命中关键词，先记为候选（用于兜底）
-                    if get_count(data) > 0:
-                        candidate = data
-                        candidate.setdefault("_meta", {})
-                        candidate["_meta"].update({
-                            "attempt": attempt_id,
-                            "url": url,
-                            "header": header_mode,
-                            "include_gid": include_gid,
-                            "kv_key": list(kv.keys())[0],
-                            "note": "未检测到标题/作者包含关键词，可能接口不支持此参数键。",
-                        })
-                        # 不立即返回，继续尝试其他变体
-                        last_candidate = candidate
-                    else:
-                        last_candidate = {"data": [], "total": 0}
-
-    # 所有尝试都没有精准命中，返回最后一个候选或空
-    return last_candidate
+    """base_url 非空时把请求改发到该地址（如本地替身接口）；传入 client 时复用其连接池，不负责关闭。"""
+    params_base = build_params(keyword, game_id, page_size, sort_by, sort_order, is_recommend, page)
+    headers_by_mode = {
+        "Authorization": build_headers(appkey, bearer=False),
+        "Bearer": build_headers(appkey, bearer=True),
+    }
+    store = StrategyStore(strategy_file) if strategy_file else None
 
+    owned = client is None
+    if owned:
+        client = make_client(base_url)
+    try:
+        async def request(url: str, params: Dict[str, Any], headers: Dict[str, str]) -> httpx.Response:
+            return await do_request(client, url, params, headers)
+
+        # 优先使用已学习的策略，命中则只需一次请求
+        learned = store.get() if store else None
+        if learned:
+            log(f"[已学习策略] URL={learned['url'].split('/api/', 1)[-1]} | 头={learned['header']} | "
+                f"含gameId={learned['include_gid']} | 关键词键={learned['kv_key']}")
+            p = apply_strategy(params_base, keyword, learned["include_gid"], learned["kv_key"])
+            resp = await request(learned["url"], p, headers_by_mode[learned["header"]])
+            log(f"  状态码: {resp.status_code}")
+            if resp.status_code == 200:
+                data = resp.json()
+                result = parse_response(data)
+                if result.total > 0 and contains_hits(result, keyword):
+                    store.record(learned)
+                    store.flush()
+                    data.setdefault("_meta", {}).update({k: learned[k] for k in ("url", "header", "include_gid", "kv_key")})
+                    data["_meta"]["learned"] = True
+                    return data
+            log("已学习策略未命中，重新探测全部组合")
+            store.invalidate()
+            store.flush()
+
+        data = await probe(request, params_base, headers_by_mode, keyword, concurrency=probe_concurrency, log=log)
+    finally:
+        if owned:
+            await client.aclose()
+
+    meta = data.get("_meta") or {}
+    if store and meta and "note" not in meta:
+        store.record(meta)
+        store.flush()
+    # 所有尝试都没有精准命中时，返回最后一个候选或空
+    return data
 
-def format_results(data: Dict[str, Any]) -> str:
-    mods: list[Dict[str, Any]] = []
-    total = 0
-    if isinstance(data.get("data"), list):
-        mods = data.get("data", [])
-        total = int(data.get("total", len(mods)) or 0)
-    elif isinstance(data.get("data"), dict):
-        d = data.get("data", {})
-        if isinstance(d.get("data"), list):
-            mods = d.get("data", [])
-            total = int(d.get("total", len(mods)) or 0)
-        else:
-            mods = d.get("mod", [])
-            total = int(d.get("count", len(mods)) or 0)
 
+def format_results(data: Dict[str, Any]) -> str:
+    result = parse_response(data)
+    mods = result.mods
     if not mods:
         return "无结果"
 
-    lines = [f"共 {len(mods)} 条（总计 {total}）\n"]
+    lines = [f"共 {len(mods)} 条（总计 {result.total}）\n"]
     for i, m in enumerate(mods[:10], 1):
-        title = m.get("title", m.get("mods_title", "未知标题"))
-        author = m.get("author", m.get("mods_author", m.get("user_nickName", "未知作者")))
-        # 时间字段优先：createTime -> mods_createTime -> 资源时间
-        publish_time = m.get("createTime", m.get("mods_createTime", ""))
-        if not publish_time:
-            try:
-                res = m.get("mods_resource", [])
-                if res and isinstance(res, list):
-                    publish_time = res[0].get("mods_resource_createTime", "")
-            except Exception:
-                pass
-        mod_id = m.get("id", m.get("mods_id", ""))
-        downloads = m.get("downloadCnt", m.get("mods_download_cnt", 0))
-        size = m.get("size", m.get("mods_resource_size", ""))
-        if not size:
-            try:
-                res = m.get("mods_resource", [])
-                if res and isinstance(res, list):
-                    size = res[0].get("mods_resource_size", "")
-            except Exception:
-                pass
-        if not size:
-            size = "未知大小"
-        if publish_time:
-            try:
-                s = str(publish_time)
-                # 支持 ISO 8601
-                if "T" in s:
-                    s = s.split("T", 1)[0]
-                else:
-                    s = s.split(" ", 1)[0]
-                publish_time = s
-            except Exception:
-                publish_time = str(publish_time)
-        else:
-            publish_time = "未知时间"
-        link = f"https://mod.3dmgame.com/mod/{mod_id}" if mod_id else "链接不可用"
+        title = m.title or "未知标题"
+        author = m.author or "未知作者"
+        # 时间字段优先：createTime -> mods_createTime -> 资源时间（解析时已确定）
+        publish_time = date_part(m.publish_time) or "未知时间"
+        size = m.size or "未知大小"
+        link = f"https://mod.3dmgame.com/mod/{m.mod_id}" if m.mod_id else "链接不可用"
         lines.append(
-            f"{i}. {title} | {author} | {publish_time} | 下载:{downloads} | 大小:{size}\n   {link}"
+            f"{i}. {title} | {author} | {publish_time} | 下载:{m.downloads} | 大小:{size}\n   {link}"
         )
     return "\n".join(lines)
 
@@ -269,11 +201,187 @@ def parse_args(argv: list[str]) -> argparse.Namespace:
     parser.add_argument("--sort-by", type=str, default=os.getenv("SORT_BY", "mods_createTime"))
     parser.add_argument("--sort-order", type=str, default=os.getenv("SORT_ORDER", "desc"))
     parser.add_argument("--is-recommend", type=int, choices=[0, 1], default=int(os.getenv("IS_RECOMMEND", 0)))
+    parser.add_argument("--strategy-file", type=str,
+                        default=os.getenv("STRATEGY_FILE"),
+                        help="已学习策略的保存位置，默认为插件数据目录下的 strategy.json，传空字符串则不读写；"
+                             "回放插件时默认使用临时目录，不改动插件已学习的策略")
+    parser.add_argument("--probe-concurrency", type=int, default=int(os.getenv("PROBE_CONCURRENCY", 4)),
+                        help="重新探测时的最大并发请求数")
+    parser.add_argument("--base-url", type=str, default="",
+                        help="把上游请求改发到该地址（如本地替身接口），留空则请求 3DM 线上接口")
+    parser.add_argument("--record", type=str, default="",
+                        help="把本次查询追加到该查询日志文件（与插件 query_log_file 的格式相同）")
+    replay_group = parser.add_argument_group("回放模式")
+    replay_group.add_argument("--replay", type=str, default="", help="要回放的查询日志文件（JSONL）")
+    replay_group.add_argument("--target", choices=["plugin", "api"], default="plugin",
+                              help="plugin: 经 ModSearchPlugin 的 /mod搜索 回放；api: 直接调用 search_mods")
+    replay_group.add_argument("--fake-server", action="store_true",
+                              help="启动进程内替身接口（mod_fake_server.py）作为上游，完全离线回放")
+    replay_group.add_argument("--speed", type=float, default=1.0, help="回放倍速，1 为原始节奏，0 表示不等待")
+    replay_group.add_argument("--concurrency", type=int, default=16, help="同时进行的最大查询数")
+    replay_group.add_argument("--limit", type=int, default=0, help="只回放最早的若干条，0 表示全部")
+    replay_group.add_argument("--config", type=str, default="",
+                              help="覆盖插件配置的 JSON（仅 --target plugin），如 '{\"cache_ttl\": 600, \"rate_limit_per_sec\": 2}'")
+    replay_group.add_argument("--json", action="store_true", help="以 JSON 输出回放报告")
+    replay_group.add_argument("-v", "--verbose", action="store_true", help="输出插件日志")
     return parser.parse_args(argv)
 
 
+async def replay_plugin(args: argparse.Namespace, entries: list, appkey: str, base_url: str) -> Dict[str, Any]:
+    """经 ModSearchPlugin 回放；插件数据目录换成临时目录（已学习策略也在其中，显式传入 --strategy-file 时才读写该文件），
+    已保存的搜索别名仍从真实数据目录读取。"""
+    import tempfile
+    from mod_bench import BenchEvent, classify, install_astrbot_stub, load_plugin_class
+    from mod_subscribe import SubscriptionStore
+
+    install_astrbot_stub()
+    plugin_cls = load_plugin_class()
+    config: Dict[str, Any] = {"appkey": appkey or "{APPKEY}", "game_id": args.game_id, "subscription_interval": 0}
+    config.update(json.loads(args.config) if args.config else {})
+    plugin = plugin_cls(sys.modules["astrbot.api.star"].Context(), config)
+    tmp = tempfile.TemporaryDirectory(prefix="mod_replay_")
+    plugin.data_dir = Path(tmp.name)
+    plugin.strategy = StrategyStore(args.strategy_file or plugin.data_dir / "strategy.json")
+    plugin.subscriptions = SubscriptionStore(plugin.data_dir / "subscriptions.json", normalize=plugin.normalizer)
+    plugin.recorder = None
+    if base_url:
+        plugin.transport = RedirectTransport(base_url, httpx.AsyncHTTPTransport())
+    await plugin.initialize()
+
+    async def run_one(entry: Dict[str, Any]) -> str:
+        game = entry.get("game")
+        if isinstance(game, list):
+            scope = "@" + ",".join(str(g) for g in game) + " " if game else ""
+        else:
+            scope = f"@{game} " if game not in (None, "") else ""
+        # 页码须写成“第N页”，末尾的纯数字会被当作关键词的一部分
+        page = f" 第{entry['page']}页" if entry["page"] > 1 else ""
+        event = BenchEvent(f"/mod搜索 {scope}{entry['keyword']}{page}", entry.get("user") or "replay", entry.get("group") or "")
+        return classify([str(r) async for r in plugin.mod_search(event)])
+
+    try:
+        report = await replay(entries, run_one, speed=args.speed, concurrency=args.concurrency)
+        # 等后台预取/刷新结束，计入上游请求数
+        await asyncio.sleep(0.05)
+        m = plugin.metrics
+        lookups = m.counter_by("cache_lookups_total", "result")
+        looked = sum(lookups.values())
+        report["upstream_requests"] = m.counter("upstream_requests_total")
+        report["cache_hit_rate"] = (lookups.get("fresh", 0) + lookups.get("stale", 0)) / looked if looked else 0.0
+        report["sources"] = m.counter_by("searches_total", "source")
+    finally:
+        await plugin.terminate()
+        tmp.cleanup()
+    return report
+
+
+async def replay_api(args: argparse.Namespace, entries: list, appkey: str, base_url: str) -> Dict[str, Any]:
+    """直接调用 search_mods 回放（无缓存），所有查询共用一个连接池；未指定 --strategy-file 时策略写在临时目录。"""
+    import tempfile
+    upstream = 0
+    tmp = tempfile.TemporaryDirectory(prefix="mod_replay_") if args.strategy_file is None else None
+    strategy_file = os.path.join(tmp.name, "strategy.json") if tmp is not None else args.strategy_file
+
+    async def count(request: httpx.Request) -> None:
+        nonlocal upstream
+        upstream += 1
+
+    limits = httpx.Limits(max_connections=max(1, args.concurrency))
+    async with make_client(base_url, limits=limits, event_hooks={"request": [count]}) as client:
+        async def run_one(entry: Dict[str, Any]) -> str:
+            game = entry.get("game")
+            if isinstance(game, list):
+                game = game[0] if game else None
+            data = await search_mods(
+                appkey=appkey, keyword=entry["keyword"], game_id=int(game or args.game_id),
+                page_size=args.page_size, sort_by=args.sort_by, sort_order=args.sort_order,
+                is_recommend=args.is_recommend, strategy_file=strategy_file,
+                probe_concurrency=args.probe_concurrency, page=entry["page"], client=client, log=lambda _: None,
+            )
+            return "results" if parse_response(data).total > 0 else "empty"
+
+        try:
+            report = await replay(entries, run_one, speed=args.speed, concurrency=args.concurrency)
+        finally:
+            if tmp is not None:
+                tmp.cleanup()
+    report["upstream_requests"] = upstream
+    report["cache_hit_rate"] = None
+    return report
+
+
+async def replay_main(args: argparse.Namespace) -> int:
+    from mod_bench import percentile
+    from mod_fake_server import FakeModServer
+
+    try:
+        entries = load_log(args.replay, args.limit)
+    except OSError as e:
+        print(f"读取查询日志失败: {e}")
+        return 2
+    if not entries:
+        print("查询日志为空或无法解析")
+        return 2
+    server = None
+    base_url = args.base_url.strip()
+    appkey = (args.appkey or "").strip()
+    if args.fake_server:
+        server = await FakeModServer().start()
+        base_url = server.base_url
+    if base_url and not appkey:
+        appkey = "replay"
+    try:
+        if args.target == "plugin":
+            report = await replay_plugin(args, entries, appkey, base_url)
+        else:
+            report = await replay_api(args, entries, appkey, base_url)
+    finally:
+        if server is not None:
+            await server.close()
+
+    latencies = report.pop("latencies")
+    n = len(entries)
+    summary = {
+        "target": args.target,
+        "queries": n,
+        "log_span_s": round(entries[-1]["ts"] - entries[0]["ts"], 3),
+        "speed": args.speed,
+        "elapsed_s": round(report["elapsed_s"], 3),
+        "max_lag_ms": round(report["max_lag_s"] * 1000, 2),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99": round(percentile(latencies, 0.99) * 1000, 2),
+            "max": round((latencies[-1] if latencies else 0.0) * 1000, 2),
+        },
+        "outcomes": report["outcomes"],
+        "upstream_requests": int(report["upstream_requests"]),
+        "upstream_per_query": round(report["upstream_requests"] / n, 3),
+        "cache_hit_rate": None if report["cache_hit_rate"] is None else round(report["cache_hit_rate"], 3),
+        "sources": {k: int(v) for k, v in report.get("sources", {}).items()},
+        "failures": report["failures"][:10],
+    }
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+        return 0
+    lat = summary["latency_ms"]
+    print(f"回放: {n} 条查询（目标 {args.target}），日志跨度 {summary['log_span_s']}s，倍速 {args.speed:g}，"
+          f"实际耗时 {summary['elapsed_s']}s，最大调度滞后 {summary['max_lag_ms']}ms")
+    print(f"延迟: p50 {lat['p50']}ms  p95 {lat['p95']}ms  p99 {lat['p99']}ms  max {lat['max']}ms")
+    print("结果: " + "  ".join(f"{k}={v}" for k, v in sorted(summary["outcomes"].items())))
+    print(f"上游请求: {summary['upstream_requests']}（每次查询 {summary['upstream_per_query']}）")
+    if summary["cache_hit_rate"] is not None:
+        print(f"缓存命中率: {summary['cache_hit_rate'] * 100:.1f}%  数据来源: {summary['sources']}")
+    for f in summary["failures"]:
+        print(f"× {f}")
+    return 0
+
+
 async def amain(argv: list[str]) -> int:
     args = parse_args(argv)
+    if args.replay:
+        logging.basicConfig(level=logging.DEBUG if args.verbose else logging.ERROR)
+        return await replay_main(args)
     keyword = (args.keyword or "").strip()
     if not keyword:
         keyword = input("请输入搜索关键词: ").strip()
@@ -306,6 +414,9 @@ async def amain(argv: list[str]) -> int:
             sort_by=args.sort_by,
             sort_order=args.sort_order,
             is_recommend=args.is_recommend,
+            strategy_file=default_strategy_file() if args.strategy_file is None else args.strategy_file,
+            probe_concurrency=args.probe_concurrency,
+            base_url=args.base_url.strip(),
         )
     except httpx.TimeoutException:
         print("请求超时")
@@ -323,6 +434,11 @@ async def amain(argv: list[str]) -> int:
     except Exception:
         print(str(data)[:1000])
 
+    if args.record:
+        recorder = QueryRecorder(args.record)
+        recorder.record(keyword, args.game_id)
+        recorder.write(recorder.take())
+
     print("\n==== 解析后的结果 ====")
     print(format_results(data))
     if isinstance(data, dict) and data.get("_meta"):
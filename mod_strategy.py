@@ -0,0 +1,233 @@
+"""
+回退策略学习：记录上次命中的 (url, 认证头, 是否带 gameId, 关键词参数键) 组合并持久化，
+之后优先使用该组合发起单次请求；仅当其不再命中时，才以有限并发重新探测全部组合。
+
+插件（main.py）与本地测试脚本（mod_search_local_test.py）共用本模块。
+"""
+from __future__ import annotations
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import httpx
+
+try:
+    from .mod_flow import CircuitOpen, Overloaded
+    from .mod_normalize import fold
+    from .mod_records import SearchResult, parse_response
+except ImportError:  # 作为独立脚本的同级模块导入
+    from mod_flow import CircuitOpen, Overloaded
+    from mod_normalize import fold
+    from mod_records import SearchResult, parse_response
+
+API_URL = "https://mod.3dmgame.com/api/v3/mods"
+ALT_URLS = [
+    API_URL,
+    "https://mod.3dmgame.com/api/v3/mods/search",
+]
+
+HEADER_MODES = ["Authorization", "Bearer"]
+
+# 所有可能出现的关键词参数键，应用某个变体前先全部清理
+KEYWORD_KEYS = ["search", "key", "keyword", "keywords", "wd", "q", "searchKey", "searchWord", "title", "modsTitle"]
+
+STRATEGY_FIELDS = ("url", "header", "include_gid", "kv_key")
+
+
+def keyword_variants(keyword: str) -> List[Dict[str, Any]]:
+    """关键词参数变体（按探测优先级排列），变体的第一个键即 kv_key。"""
+    return [
+        {"key": keyword, "keyword": keyword},
+        {"keywords": keyword},
+        {"wd": keyword},
+        {"q": keyword},
+        {"search": keyword},
+        {"searchKey": keyword},
+        {"searchWord": keyword},
+        {"title": keyword},
+        {"modsTitle": keyword},
+    ]
+
+
+def iter_combinations(
+    keyword: str, scopes: Sequence[bool] = (True, False)
+) -> Iterator[Tuple[str, str, bool, Dict[str, Any]]]:
+    """按原探测顺序枚举 url × 认证头 × 是否带 gameId × 关键词变体；scopes 限定 include_gid 的取值。"""
+    for url in ALT_URLS:
+        for header_mode in HEADER_MODES:
+            for include_gid in scopes:
+                for kv in keyword_variants(keyword):
+                    yield url, header_mode, include_gid, kv
+
+
+def apply_strategy(
+    params_base: Dict[str, Any], keyword: str, include_gid: bool, kv_key: Optional[str]
+) -> Dict[str, Any]:
+    """在基础参数上应用 gameId 开关与关键词参数变体；kv_key 为 None 时保留基础参数中的关键词键。"""
+    p = dict(params_base)
+    if not include_gid:
+        p.pop("gameId", None)
+    if kv_key is None:
+        return p
+    for rm in KEYWORD_KEYS:
+        p.pop(rm, None)
+    for kv in keyword_variants(keyword):
+        if next(iter(kv)) == kv_key:
+            p.update(kv)
+            break
+    else:
+        p[kv_key] = keyword
+    return p
+
+
+def contains_hits(result: SearchResult, keyword: str) -> bool:
+    """粗略判断是否命中关键词（看标题/作者是否包含关键词）；两边都经 fold() 折叠，
+    繁简、全半角与大小写不同的写法也算命中。"""
+    kw = fold(keyword)
+    if not kw:
+        return False
+    for m in result.mods:
+        if kw in fold(m.title) or kw in fold(m.author):
+            return True
+    return False
+
+
+class StrategyStore:
+    """已学习策略的 JSON 持久化。record()/invalidate() 只改内存，由 flush() 写盘；
+    写入时先写临时文件再替换，避免中途损坏。"""
+
+    def __init__(self, path: os.PathLike | str):
+        self.path = Path(path)
+        self._strategy: Optional[Dict[str, Any]] = None
+        self._loaded = False
+        self._dirty = False
+
+    def get(self) -> Optional[Dict[str, Any]]:
+        if not self._loaded:
+            self._loaded = True
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    obj = json.load(f)
+                if isinstance(obj, dict) and all(k in obj for k in STRATEGY_FIELDS):
+                    self._strategy = obj
+            except (OSError, ValueError):
+                self._strategy = None
+        return self._strategy
+
+    def record(self, meta: Dict[str, Any]) -> bool:
+        """记录命中的策略；与现有策略相同时只累加命中次数。返回策略本身是否改变。"""
+        current = self.get()
+        strategy = {k: meta[k] for k in STRATEGY_FIELDS}
+        changed = not (current and all(current.get(k) == strategy[k] for k in STRATEGY_FIELDS))
+        hits = 1 if changed else int(current.get("hits", 0)) + 1
+        strategy.update({"hits": hits, "updated_at": int(time.time())})
+        self._strategy = strategy
+        self._dirty = True
+        return changed
+
+    def invalidate(self) -> None:
+        self._strategy = None
+        self._loaded = True
+        self._dirty = True
+
+    def flush(self) -> None:
+        """把内存中的策略写盘（已失效时删除文件）；自上次写盘以来没有变化时什么都不做。"""
+        if not self._dirty:
+            return
+        self._dirty = False
+        strategy = self._strategy
+        if strategy is None:
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
+        else:
+            self._save(strategy)
+
+    def _save(self, obj: Dict[str, Any]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(obj, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
+
+RequestFn = Callable[[str, Dict[str, Any], Dict[str, str]], Awaitable[httpx.Response]]
+
+
+async def probe(
+    request: RequestFn,
+    params_base: Dict[str, Any],
+    headers_by_mode: Dict[str, Dict[str, str]],
+    keyword: str,
+    concurrency: int = 4,
+    log: Optional[Callable[[str], None]] = None,
+    scopes: Sequence[bool] = (True, False),
+) -> Dict[str, Any]:
+    """以有限并发探测全部组合，按原优先级返回第一个命中关键词的结果。
+
+    命中结果带 _meta（含策略字段）；没有精准命中时返回按顺序最后一个候选或空结果。
+    单个组合的网络错误或被限速、熔断拒绝时跳过该组合，全部失败时抛出最后一个错误。
+    scopes 限定 include_gid 的取值，如 (True,) 表示不探测去掉 gameId 的组合。
+    """
+    combos = list(iter_combinations(keyword, scopes))
+    sem = asyncio.Semaphore(max(1, int(concurrency)))
+
+    async def run(url: str, header_mode: str, include_gid: bool, kv: Dict[str, Any]) -> httpx.Response:
+        async with sem:
+            p = apply_strategy(params_base, keyword, include_gid, next(iter(kv)))
+            return await request(url, p, headers_by_mode[header_mode])
+
+    tasks = [asyncio.ensure_future(run(*c)) for c in combos]
+    last_candidate: Dict[str, Any] = {"data": [], "total": 0}
+    last_error: Optional[BaseException] = None
+    failures = 0
+    try:
+        for attempt_id, ((url, header_mode, include_gid, kv), task) in enumerate(zip(combos, tasks), 1):
+            kv_key = next(iter(kv))
+            desc = f"[尝试{attempt_id}] URL={url.split('/api/', 1)[-1]} | 头={header_mode} | 含gameId={include_gid} | 关键词键={kv_key}"
+            try:
+                resp = await task
+            except (httpx.HTTPError, Overloaded, CircuitOpen) as e:
+                failures += 1
+                last_error = e
+                if log:
+                    log(f"{desc}\n  请求失败: {type(e).__name__}")
+                continue
+            if log:
+                log(f"{desc}\n  状态码: {resp.status_code}")
+            if resp.status_code != 200:
+                continue
+            data = resp.json()
+            result = parse_response(data)
+            meta = {
+                "attempt": attempt_id,
+                "url": url,
+                "header": header_mode,
+                "include_gid": include_gid,
+                "kv_key": kv_key,
+            }
+            # 若接口返回有结果并且命中关键词，则接受
+            if result.total > 0 and contains_hits(result, keyword):
+                data.setdefault("_meta", {}).update(meta)
+                return data
+            # 如果有结果但未命中关键词，先记为候选（用于兜底）
+            if result.total > 0:
+                meta["note"] = "未检测到标题/作者包含关键词，可能接口不支持此参数键。"
+                data.setdefault("_meta", {}).update(meta)
+                last_candidate = data
+            else:
+                last_candidate = {"data": [], "total": 0}
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                # 取走已结束任务的异常，避免 "exception was never retrieved" 警告
+                task.exception()
+    if last_error is not None and failures == len(combos):
+        raise last_error
+    return last_candidate
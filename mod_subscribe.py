@@ -0,0 +1,227 @@
+"""
+关键词订阅：订阅按 (规范化关键词, 游戏ID) 合并为主题，每个主题每个周期只轮询一次上游，
+上游开销随不同关键词的数量增长，与订阅者数量无关。规范化规则与搜索缓存相同（由插件传入 QueryNormalizer），
+繁简、全半角写法与别名落在同一个主题。
+
+- 首轮轮询时间按主题哈希在周期内均匀错开，之后每次间隔再叠加随机抖动，避免集中请求
+- 轮询结果与上次看到的 mod ID / 更新时间比较，新出现或有更新的 mod 推送给该主题的全部订阅会话
+- 订阅与已见状态以 JSON 持久化，写入时先写临时文件再替换
+"""
+from __future__ import annotations
+import heapq
+import json
+import os
+import random
+import time
+import zlib
+from operator import itemgetter
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .mod_normalize import fold
+except ImportError:  # 作为独立脚本的同级模块导入
+    from mod_normalize import fold
+
+TopicKey = Tuple[str, int]
+
+
+class Topic:
+    """一个唯一查询：关键词 + 游戏ID，及订阅它的会话与已见 mod 的更新时间。
+
+    keyword 为订阅时的写法（用于展示），norm 为规范化后的关键词（用于主题键与轮询）。
+    """
+
+    __slots__ = ("keyword", "norm", "game_id", "sessions", "seen", "primed")
+
+    def __init__(
+        self,
+        keyword: str,
+        game_id: int,
+        sessions: Iterable[str] = (),
+        seen: Optional[Dict[str, float]] = None,
+        primed: bool = False,
+        norm: Optional[str] = None,
+    ):
+        self.keyword = keyword
+        self.norm = keyword if norm is None else norm
+        self.game_id = int(game_id)
+        self.sessions = list(dict.fromkeys(sessions))
+        self.seen: Dict[str, float] = dict(seen or {})
+        self.primed = primed
+
+    @property
+    def key(self) -> TopicKey:
+        return self.norm, self.game_id
+
+    def diff(self, mods: Iterable, max_seen: int = 200) -> List:
+        """返回新出现或更新时间变大的 mod，并更新已见状态；首次轮询只记录基线，不返回结果。
+
+        已见集合达到上限时只保留最近更新的 max_seen 条，早于其中最旧一条的陌生 mod 视为旧数据。
+        """
+        floor = min(self.seen.values()) if len(self.seen) >= max_seen else 0.0
+        hits = []
+        for mod in mods:
+            mod_id = str(mod.mod_id or "")
+            if not mod_id:
+                continue
+            last = self.seen.get(mod_id)
+            if (last is None and mod.update_ts >= floor) or (last is not None and mod.update_ts > last):
+                hits.append(mod)
+            self.seen[mod_id] = max(mod.update_ts, last or 0.0)
+        if len(self.seen) > max_seen:
+            self.seen = dict(heapq.nlargest(max_seen, self.seen.items(), key=itemgetter(1)))
+        if not self.primed:
+            self.primed = True
+            return []
+        return hits
+
+    def to_dict(self) -> Dict:
+        return {
+            "keyword": self.keyword,
+            "game_id": self.game_id,
+            "sessions": self.sessions,
+            "seen": self.seen,
+            "primed": self.primed,
+        }
+
+
+class SubscriptionStore:
+    def __init__(self, path: os.PathLike | str, max_seen: int = 200, normalize: Callable[[str], str] = fold):
+        self.path = Path(path)
+        self.max_seen = max(10, int(max_seen))
+        self.normalize = normalize
+        self.topics: Dict[TopicKey, Topic] = {}
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                obj = json.load(f)
+        except (OSError, ValueError):
+            return
+        for item in obj.get("topics", []) if isinstance(obj, dict) else []:
+            try:
+                keyword = str(item["keyword"])
+                topic = Topic(
+                    keyword, int(item["game_id"]), item.get("sessions", []),
+                    {str(k): float(v) for k, v in (item.get("seen") or {}).items()}, bool(item.get("primed")),
+                    norm=self.normalize(keyword),
+                )
+            except (KeyError, TypeError, ValueError):
+                continue
+            if topic.sessions:
+                self._merge(topic)
+
+    def _merge(self, topic: Topic) -> bool:
+        """加入主题；已有相同键的主题时合并订阅会话与已见记录，返回是否为新主题。"""
+        current = self.topics.get(topic.key)
+        if current is None:
+            self.topics[topic.key] = topic
+            return True
+        current.sessions = list(dict.fromkeys(current.sessions + topic.sessions))
+        for mod_id, ts in topic.seen.items():
+            current.seen[mod_id] = max(ts, current.seen.get(mod_id, 0.0))
+        current.primed = current.primed or topic.primed
+        return False
+
+    def rekey(self) -> bool:
+        """规范化规则（如别名）变化后重新计算各主题的键，合并变为同一键的主题；返回是否有变化。"""
+        topics = list(self.topics.values())
+        self.topics = {}
+        changed = False
+        for topic in topics:
+            norm = self.normalize(topic.keyword)
+            if norm != topic.norm:
+                topic.norm = norm
+                changed = True
+            if not self._merge(topic):
+                changed = True
+        return changed
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"topics": [t.to_dict() for t in self.topics.values()]}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def subscribe(self, session: str, keyword: str, game_id: int) -> Tuple[Topic, bool]:
+        """加入订阅，返回 (主题, 是否为新增订阅)。"""
+        norm = self.normalize(keyword)
+        key = (norm, int(game_id))
+        topic = self.topics.get(key)
+        if topic is None:
+            topic = self.topics[key] = Topic(keyword, game_id, norm=norm)
+        if session in topic.sessions:
+            return topic, False
+        topic.sessions.append(session)
+        return topic, True
+
+    def unsubscribe(self, session: str, keyword: str) -> List[Topic]:
+        """退订该会话在所有游戏下的这个关键词，返回被退订的主题；没有订阅者的主题随之删除。"""
+        norm = self.normalize(keyword)
+        removed = []
+        for key, topic in list(self.topics.items()):
+            if key[0] == norm and session in topic.sessions:
+                topic.sessions.remove(session)
+                removed.append(topic)
+                if not topic.sessions:
+                    del self.topics[key]
+        return removed
+
+    def of_session(self, session: str) -> List[Topic]:
+        return [t for t in self.topics.values() if session in t.sessions]
+
+    def subscriber_count(self) -> int:
+        return sum(len(t.sessions) for t in self.topics.values())
+
+
+class PollScheduler:
+    """按主题安排轮询时间：首轮在周期内按哈希错开，之后每次间隔 interval × (1 ± jitter)。
+
+    时间使用 time.monotonic()；删除主题时只从 _due 中移除，堆中的旧条目在出堆时跳过。
+    """
+
+    def __init__(self, interval: float, jitter: float = 0.1, rng: Optional[random.Random] = None):
+        self.interval = max(1.0, float(interval))
+        self.jitter = min(0.5, max(0.0, float(jitter)))
+        self._rng = rng or random.Random()
+        self._heap: List[Tuple[float, TopicKey]] = []
+        self._due: Dict[TopicKey, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def add(self, key: TopicKey, now: Optional[float] = None) -> None:
+        if key in self._due:
+            return
+        now = time.monotonic() if now is None else now
+        phase = (zlib.crc32(repr(key).encode("utf-8")) % 10000) / 10000
+        self._push(key, now + phase * self.interval)
+
+    def discard(self, key: TopicKey) -> None:
+        self._due.pop(key, None)
+
+    def next_due(self) -> Optional[float]:
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: Optional[float] = None) -> List[TopicKey]:
+        """取出所有到期的主题并安排下一次轮询。"""
+        now = time.monotonic() if now is None else now
+        due: List[TopicKey] = []
+        while True:
+            at = self.next_due()
+            if at is None or at > now:
+                return due
+            _, key = heapq.heappop(self._heap)
+            due.append(key)
+            step = self.interval * (1 + self._rng.uniform(-self.jitter, self.jitter))
+            # 保持原相位；落后超过一个周期（如进程挂起）时从当前时刻重新计算
+            self._push(key, at + step if at + step > now else now + step)
+
+    def _push(self, key: TopicKey, at: float) -> None:
+        self._due[key] = at
+        heapq.heappush(self._heap, (at, key))
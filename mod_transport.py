@@ -0,0 +1,23 @@
+"""
+httpx 传输层工具：把请求改发到本地替身接口，供 mod_bench.py 与 mod_search_local_test.py 共用。
+"""
+from __future__ import annotations
+
+import httpx
+
+
+class RedirectTransport(httpx.AsyncBaseTransport):
+    """把任意目标地址改写到替身接口，路径与查询参数保持不变。"""
+
+    def __init__(self, base_url: str, inner: httpx.AsyncBaseTransport):
+        base = httpx.URL(base_url)
+        self.scheme, self.host, self.port = base.scheme, base.host, base.port
+        self.inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.url = request.url.copy_with(scheme=self.scheme, host=self.host, port=self.port)
+        request.headers["Host"] = f"{self.host}:{self.port}"
+        return await self.inner.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
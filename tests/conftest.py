@@ -0,0 +1,64 @@
+"""测试共用的夹具：把仓库根目录加入导入路径，提供不依赖 AstrBot 的插件实例与可控的单调时钟。"""
+import asyncio
+import os
+import sys
+
+import httpx
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def plugin_class(tmp_path, monkeypatch):
+    """未安装 AstrBot 时注入替身模块并加载插件类，插件数据目录指向临时目录。"""
+    import mod_bench
+
+    mod_bench.install_astrbot_stub()
+    star = sys.modules["astrbot.api.star"]
+    if hasattr(getattr(star, "StarTools", None), "data_root"):
+        monkeypatch.setattr(star.StarTools, "data_root", tmp_path)
+    return mod_bench.load_plugin_class()
+
+
+@pytest.fixture
+def make_plugin(plugin_class, tmp_path):
+    """构造不经 initialize() 的插件实例：关闭限速与订阅轮询，数据目录为临时目录；
+    传入 handler 时上游请求交给 httpx.MockTransport(handler)，其余关键字参数覆盖插件配置。"""
+    created = []
+
+    def make(handler=None, **config):
+        conf = {"appkey": "test", "rate_limit_per_sec": 0, "subscription_interval": 0}
+        conf.update(config)
+        instance = plugin_class(sys.modules["astrbot.api.star"].Context(), conf)
+        instance.data_dir = tmp_path
+        if handler is not None:
+            instance.transport = httpx.MockTransport(handler)
+        created.append(instance)
+        return instance
+
+    yield make
+    for instance in created:
+        if instance.client is not None and not instance.client.is_closed:
+            asyncio.run(instance.client.aclose())
+
+
+class FakeClock:
+    """替换 mod_flow 中的 time.monotonic，让限速与熔断的计时可控。"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    import mod_flow
+
+    fake = FakeClock()
+    monkeypatch.setattr(mod_flow.time, "monotonic", fake)
+    return fake
@@ -0,0 +1,32 @@
+"""批量搜索的回归测试。"""
+import asyncio
+
+import httpx
+from mod_bench import BenchEvent
+
+
+def test_batch_search_respects_max_concurrent_searches(make_plugin):
+    in_flight = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        keyword = request.url.params["search"]
+        mod = {"id": abs(hash(keyword)) % 10000, "mods_title": keyword, "mods_author": "a"}
+        return httpx.Response(200, json={"data": [mod], "total": 1})
+
+    plugin = make_plugin(handler, max_concurrent_searches=2, prefetch_next_page=False)
+
+    async def run():
+        event = BenchEvent("/mod批量搜索 武器包 | 地图 | 汉化 | 皮肤")
+        return [str(r) async for r in plugin.mod_batch_search(event)]
+
+    replies = asyncio.run(run())
+    # 4 个关键词各一条回退链，同时访问上游的不超过 max_concurrent_searches
+    assert peak == 2
+    assert plugin.admission.active == 0
+    assert "武器包" in replies[0] and "皮肤" in replies[-1]
@@ -0,0 +1,107 @@
+"""上游熔断器的回归测试：状态切换本身，以及插件在熔断期间用历史结果降级或快速拒绝。"""
+import asyncio
+import sys
+
+import httpx
+import pytest
+
+from mod_flow import CircuitBreaker, CircuitOpen
+
+
+def test_breaker_opens_after_threshold_within_window(clock):
+    changes = []
+    breaker = CircuitBreaker(failure_threshold=3, window=10, reset_timeout=30,
+                             on_change=lambda old, new: changes.append(new))
+    breaker.record(False)
+    clock.now += 11
+    # 窗口外的失败不计数
+    breaker.record(False)
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpen) as exc:
+        breaker.allow()
+    assert exc.value.retry_in == pytest.approx(30)
+    assert changes == [CircuitBreaker.OPEN]
+
+
+def test_breaker_half_open_limits_trials(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, half_open_max=2)
+    breaker.record(False)
+    clock.now += 5
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow() is True
+    assert breaker.allow() is True
+    with pytest.raises(CircuitOpen):
+        breaker.allow()
+    # 被取消的试探归还名额
+    breaker.release(True)
+    assert breaker.allow() is True
+
+
+def test_breaker_half_open_success_closes_and_failure_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5)
+    breaker.record(False)
+    clock.now += 5
+    trial = breaker.allow()
+    breaker.record(False, trial)
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now += 5
+    trial = breaker.allow()
+    breaker.record(True, trial)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() is False
+
+
+def test_plugin_serves_last_known_results_while_open(make_plugin):
+    calls = []
+    healthy = True
+
+    async def handler(request):
+        keyword = request.url.params["search"]
+        calls.append(keyword)
+        if not healthy:
+            return httpx.Response(503, json={"code": "503", "message": "error"})
+        mod = {"id": len(calls), "mods_title": keyword, "mods_author": "a"}
+        return httpx.Response(200, json={"data": [mod], "total": 1})
+
+    plugin = make_plugin(handler, upstream_max_retries=0, breaker_failure_threshold=2, breaker_reset_timeout=60,
+                         prefetch_next_page=False)
+    key = plugin._cache_key("武器包", "mods_createTime")
+
+    async def run():
+        nonlocal healthy
+        status, cached, _ = await plugin._lookup("武器包", "mods_createTime", 1)
+        assert status == 200
+        # 让缓存条目彻底过期（超出宽限期），只留作历史结果
+        plugin.cache.set(key, cached, ttl=-plugin.cache.stale_grace - 1)
+        healthy = False
+        for keyword in ("地图", "皮肤"):
+            status, _, source = await plugin._lookup(keyword, "mods_createTime", 1)
+            assert (status, source) == (503, "upstream")
+        assert plugin.breaker.state == CircuitBreaker.OPEN
+        sent = len(calls)
+
+        # 熔断期间：有历史结果的查询降级返回，没有的快速失败，都不再访问上游
+        status, data, source = await plugin._lookup("武器包", "mods_createTime", 1)
+        assert (status, source) == (200, "degraded") and data is cached
+        with pytest.raises(sys.modules[type(plugin).__module__].CircuitOpen):
+            await plugin._lookup("汉化", "mods_createTime", 1)
+        assert len(calls) == sent
+
+    asyncio.run(run())
+
+
+def test_plugin_open_breaker_replies_unavailable(make_plugin):
+    from mod_bench import BenchEvent
+
+    plugin = make_plugin(lambda request: httpx.Response(200, json={"data": [], "total": 0}), prefetch_next_page=False)
+    for _ in range(plugin.breaker.failure_threshold):
+        plugin.breaker.record(False)
+
+    async def run():
+        return [str(r) async for r in plugin.mod_search(BenchEvent("/mod搜索 武器包"))]
+
+    replies = asyncio.run(run())
+    assert len(replies) == 1 and "3DM接口暂时不可用" in replies[0]
@@ -0,0 +1,73 @@
+"""持久化搜索缓存（mod_cache_store）的回归测试。"""
+import pytest
+
+from mod_cache import SearchCache
+from mod_cache_store import CacheStore
+from mod_records import parse_response
+
+KEY = ("武器包", 261, "mods_createTime", 10, 0, 1)
+
+
+def _result(title, total=1):
+    mod = {"id": 7, "mods_title": title, "mods_author": "作者", "mods_createTime": "2024-05-01 12:00:00",
+           "mods_downloads": 42, "mods_size": "1.5MB"}
+    return parse_response({"data": [mod], "total": total})
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = CacheStore(tmp_path / "search_cache.db")
+    yield s
+    s.close()
+
+
+def test_round_trip_from_memory_cache(store):
+    cache = SearchCache(ttl=300)
+    cache.set(KEY, _result("武器包 重制版"))
+    cache.get(KEY)
+    assert store.put_many(cache.drain()) == 1
+    data, remaining = store.get(KEY)
+    assert data.to_dict() == _result("武器包 重制版").to_dict()
+    assert 290 < remaining <= 300
+    (key, warm, _, hits), = store.hottest(10)
+    assert key == KEY and hits == 1 and warm.to_dict() == data.to_dict()
+    # 没有新的写入或命中时不重复刷写
+    assert store.put_many(cache.drain()) == 0
+
+
+def test_upsert_keeps_newer_result_and_accumulates_hits(store):
+    store.put_many([(KEY, _result("新"), 300, 2, True)])
+    store.put_many([(KEY, _result("旧"), 100, 1, True)])
+    # 只被命中的条目只累加命中次数
+    store.put_many([(KEY, None, 0, 4, False)])
+    data, remaining = store.get(KEY)
+    assert data.mods[0].title == "新" and remaining > 200
+    assert store.hottest(1)[0][3] == 7
+
+
+def test_two_processes_share_the_store(tmp_path, store):
+    other = CacheStore(tmp_path / "search_cache.db")
+    try:
+        other.put_many([(KEY, _result("另一个进程"), 300, 1, True)])
+        assert store.get(KEY)[0].mods[0].title == "另一个进程"
+    finally:
+        other.close()
+
+
+def test_prune_drops_long_expired_and_coldest_rows(tmp_path):
+    store = CacheStore(tmp_path / "search_cache.db", keep_expired=100, max_rows=3)
+    try:
+        store.put_many([
+            (("long_expired",), _result("a"), -600, 9, True),
+            (("just_expired",), _result("b"), -5, 9, True),
+            (("cold",), _result("c"), 300, 1, True),
+            (("warm",), _result("d"), 300, 5, True),
+            (("hot",), _result("e"), 300, 8, True),
+        ])
+        assert store.prune() == 2
+        assert store.get(("long_expired",)) is None and store.get(("cold",)) is None
+        # 过期不久的结果保留，上游不可用时仍可降级返回
+        assert store.get(("just_expired",))[1] < 0
+        assert store.count() == 3
+    finally:
+        store.close()
@@ -0,0 +1,42 @@
+"""长消息分段（mod_chunker）的回归测试。"""
+from mod_chunker import pack_chunks, parse_limits
+
+
+def test_pack_chunks_respects_limit_without_dropping_or_duplicating():
+    parts = [f"• {i}. 条目{i}\n  链接: https://mod.3dmgame.com/mod/{i}" for i in range(60)]
+    chunks = list(pack_chunks(["▌标题"] + parts + ["▌页脚"], 200))
+    assert all(len(c) <= 200 for c in chunks)
+    assert "\n".join(chunks).split("\n") == "\n".join(["▌标题"] + parts + ["▌页脚"]).split("\n")
+    # 段落不会被拆到两条消息里
+    for part in parts:
+        assert sum(part in c for c in chunks) == 1
+
+
+def test_pack_chunks_hard_cuts_oversized_part_and_merges_the_tail():
+    chunks = list(pack_chunks(["a" * 25, "b"], 10))
+    assert chunks == ["a" * 10, "a" * 10, "aaaaa\nb"]
+
+
+def test_pack_chunks_yields_before_later_parts_are_rendered():
+    rendered = []
+
+    def parts():
+        for i in range(5):
+            rendered.append(i)
+            yield str(i) * 6
+
+    gen = pack_chunks(parts(), 10)
+    assert next(gen) == "000000"
+    # 第一条产出时只渲染到放不下的那一段
+    assert rendered == [0, 1]
+    assert list(gen) == ["111111", "222222", "333333", "444444"]
+
+
+def test_pack_chunks_skips_empty_parts():
+    assert list(pack_chunks(["", "\n", "x", ""], 10)) == ["x"]
+    assert list(pack_chunks([], 10)) == []
+
+
+def test_parse_limits_accepts_both_separators_and_skips_bad_items():
+    assert parse_limits("aiocqhttp=1500，Telegram:4000, bad=x, zero=0, =5") == {"aiocqhttp": 1500, "telegram": 4000}
+    assert parse_limits("") == {}
@@ -0,0 +1,371 @@
+"""mod_flow 并发控制原语的回归测试：令牌桶、准入控制与截止时间。"""
+import asyncio
+import sys
+import time
+
+import httpx
+import pytest
+
+import mod_flow
+from mod_flow import CircuitBreaker, FairAdmission, Overloaded, TokenBucket, time_left
+from mod_fake_server import FakeModServer
+
+
+# ---- TokenBucket ----
+
+def test_token_bucket_reserves_tokens_in_arrival_order(clock, monkeypatch):
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(round(seconds, 6))
+
+    monkeypatch.setattr(mod_flow.asyncio, "sleep", fake_sleep)
+
+    async def run():
+        bucket = TokenBucket(rate=10, burst=2)
+        for _ in range(5):
+            await bucket.acquire()
+
+    asyncio.run(run())
+    # 前两个用桶内令牌，之后每个调用方预留一个负令牌并依次多等 0.1 秒
+    assert sleeps == [0.1, 0.2, 0.3]
+
+
+def test_token_bucket_refills_and_caps_at_burst(clock):
+    async def run():
+        bucket = TokenBucket(rate=2, burst=3)
+        for _ in range(3):
+            await bucket.acquire()
+        assert bucket.delay() == pytest.approx(0.5)
+        clock.now += 100
+        assert bucket.delay() == 0.0
+        # 长时间空闲后也只能攒到 burst 个
+        for _ in range(3):
+            await bucket.acquire()
+        assert bucket.delay() == pytest.approx(0.5)
+
+    asyncio.run(run())
+
+
+def test_token_bucket_max_wait_fails_fast_without_reserving(clock):
+    async def run():
+        bucket = TokenBucket(rate=1, burst=1)
+        await bucket.acquire()
+        with pytest.raises(Overloaded):
+            await bucket.acquire(max_wait=0.5)
+        # 被拒绝的调用没有预留令牌
+        assert bucket.delay() == pytest.approx(1.0)
+
+    asyncio.run(run())
+
+
+def test_token_bucket_pause_delays_everyone(clock):
+    bucket = TokenBucket(rate=100, burst=5)
+    bucket.pause(3)
+    assert bucket.delay() == pytest.approx(3.0)
+    clock.now += 3
+    assert bucket.delay() == 0.0
+
+
+def test_token_bucket_disabled_never_waits():
+    async def run():
+        bucket = TokenBucket(rate=0)
+        for _ in range(100):
+            await bucket.acquire(max_wait=0)
+        assert bucket.delay() == 0.0
+
+    asyncio.run(run())
+
+
+# ---- FairAdmission ----
+
+def test_admission_per_user_and_group_limits():
+    async def run():
+        adm = FairAdmission(max_active=10, per_user=1, per_group=2)
+        async with adm.slot("a", "g"):
+            with pytest.raises(Overloaded):
+                async with adm.slot("a", "g"):
+                    pass
+            async with adm.slot("b", "g"):
+                with pytest.raises(Overloaded):
+                    async with adm.slot("c", "g"):
+                        pass
+        assert adm.active == 0
+
+    asyncio.run(run())
+
+
+def test_admission_rejects_when_queue_full():
+    async def run():
+        adm = FairAdmission(max_active=1, max_waiting=1, per_user=5)
+        gate = asyncio.Event()
+
+        async def hold(user):
+            async with adm.slot(user):
+                await gate.wait()
+
+        holder = asyncio.ensure_future(hold("a"))
+        queued = asyncio.ensure_future(hold("b"))
+        await asyncio.sleep(0)
+        assert adm.active == 1 and adm.waiting == 1
+        with pytest.raises(Overloaded):
+            async with adm.slot("c"):
+                pass
+        gate.set()
+        await asyncio.gather(holder, queued)
+        assert adm.active == 0 and adm.waiting == 0
+
+    asyncio.run(run())
+
+
+def test_admission_hands_slots_round_robin_between_users():
+    async def run():
+        adm = FairAdmission(max_active=1, max_waiting=10, per_user=5)
+        order = []
+        gate = asyncio.Event()
+
+        async def hold():
+            async with adm.slot("holder"):
+                await gate.wait()
+
+        async def job(user, n):
+            async with adm.slot(user):
+                order.append(f"{user}{n}")
+
+        holder = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        jobs = [asyncio.ensure_future(job("a", 1)), asyncio.ensure_future(job("a", 2)),
+                asyncio.ensure_future(job("a", 3)), asyncio.ensure_future(job("b", 1))]
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(holder, *jobs)
+        # a 的连续请求不会挤在 b 前面
+        assert order == ["a1", "b1", "a2", "a3"]
+        assert adm.active == 0 and adm.waiting == 0
+
+    asyncio.run(run())
+
+
+def test_admission_queue_timeout_and_cancellation_restore_counts():
+    async def run():
+        adm = FairAdmission(max_active=1, max_waiting=5, per_user=5)
+        gate = asyncio.Event()
+
+        async def hold():
+            async with adm.slot("a"):
+                await gate.wait()
+
+        holder = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded):
+            async with adm.slot("b", timeout=0.01):
+                pass
+        assert adm.waiting == 0
+
+        async def wait_slot():
+            async with adm.slot("c"):
+                pass
+
+        waiter = asyncio.ensure_future(wait_slot())
+        await asyncio.sleep(0)
+        assert adm.waiting == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert adm.waiting == 0
+        gate.set()
+        await holder
+        assert adm.active == 0
+        # 计数恢复后新的请求可以直接进入
+        async with adm.slot("b", timeout=0):
+            assert adm.active == 1
+
+    asyncio.run(run())
+
+
+def test_admission_cancel_after_handoff_returns_slot():
+    async def run():
+        adm = FairAdmission(max_active=1, max_waiting=5, per_user=5)
+        gate = asyncio.Event()
+        entered = []
+
+        async def hold():
+            async with adm.slot("a"):
+                await gate.wait()
+            # 名额刚移交给 b、b 还没运行时取消 b：名额应转给 c，而不是丢失
+            first.cancel()
+
+        async def job(user):
+            async with adm.slot(user):
+                entered.append(user)
+
+        holder = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        first = asyncio.ensure_future(job("b"))
+        second = asyncio.ensure_future(job("c"))
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(holder, first, second, return_exceptions=True)
+        assert entered == ["c"]
+        assert adm.active == 0 and adm.waiting == 0
+
+    asyncio.run(run())
+
+
+def test_admission_weighted_slot_waits_for_all_units():
+    async def run():
+        adm = FairAdmission(max_active=3, max_waiting=5, per_user=5)
+        gate = asyncio.Event()
+        entered = []
+
+        async def job(user, weight):
+            async with adm.slot(user, weight=weight):
+                entered.append(user)
+                await gate.wait()
+
+        holder = asyncio.ensure_future(job("a", 2))
+        await asyncio.sleep(0)
+        assert adm.active == 2
+        # b 先拿走仅剩的 1 个名额，还差 1 个；c 排在 b 后面
+        batch = asyncio.ensure_future(job("b", 2))
+        single = asyncio.ensure_future(job("c", 1))
+        await asyncio.sleep(0)
+        assert entered == ["a"] and adm.active == 3 and adm.waiting == 2
+        gate.set()
+        await asyncio.gather(holder, batch, single)
+        assert entered == ["a", "b", "c"]
+        assert adm.active == 0 and adm.waiting == 0
+
+    asyncio.run(run())
+
+
+def test_admission_cancelled_weighted_waiter_returns_partial_units():
+    async def run():
+        adm = FairAdmission(max_active=2, max_waiting=5, per_user=5)
+        gate = asyncio.Event()
+
+        async def hold():
+            async with adm.slot("a"):
+                await gate.wait()
+
+        async def batch():
+            async with adm.slot("b", weight=5):
+                pass
+
+        holder = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        # weight 超过 max_active 时按 max_active 计：先占 1 个，还差 1 个
+        waiter = asyncio.ensure_future(batch())
+        await asyncio.sleep(0)
+        assert adm.active == 2 and adm.waiting == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert adm.active == 1 and adm.waiting == 0
+        gate.set()
+        await holder
+        assert adm.active == 0
+
+    asyncio.run(run())
+
+
+# ---- 截止时间 ----
+
+def test_time_left_counts_down_to_deadline(clock):
+    assert time_left(None) is None
+    deadline = clock.now + 2
+    assert time_left(deadline) == pytest.approx(2)
+    clock.now += 3
+    assert time_left(deadline) == pytest.approx(-1)
+
+
+@pytest.fixture
+def plugin(make_plugin, monkeypatch):
+    """最多重试 5 次、退避固定为 0.1 秒的插件实例，上游由各测试通过 transport 注入。"""
+    instance = make_plugin(upstream_max_retries=5, retry_max_delay=8)
+    monkeypatch.setattr(sys.modules[type(instance).__module__], "backoff_delay", lambda attempt: 0.1)
+    return instance
+
+
+def test_upstream_retries_stop_before_deadline(plugin):
+    calls = []
+
+    def handler(request):
+        calls.append(time.monotonic())
+        return httpx.Response(503)
+
+    plugin.transport = httpx.MockTransport(handler)
+
+    async def run():
+        started = time.monotonic()
+        resp = await plugin._upstream_get("https://example.invalid/api", {}, {}, deadline=started + 0.25)
+        return resp, time.monotonic() - started
+
+    resp, elapsed = asyncio.run(run())
+    # 第 3 次失败后剩余时间不足一次退避，直接返回最后的响应而不是再等一轮
+    assert resp.status_code == 503
+    assert len(calls) == 3
+    assert elapsed < 0.25
+
+
+def test_upstream_deadline_cancels_retry_in_flight(plugin):
+    calls = 0
+    cancelled = []
+
+    async def handler(request):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            return httpx.Response(503)
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(calls)
+            raise
+        return httpx.Response(200)
+
+    plugin.transport = httpx.MockTransport(handler)
+
+    async def run():
+        started = time.monotonic()
+        with pytest.raises(sys.modules[type(plugin).__module__].DeadlineExceeded):
+            await plugin._upstream_get("https://example.invalid/api", {}, {}, deadline=started + 0.3)
+        return time.monotonic() - started
+
+    elapsed = asyncio.run(run())
+    # 重试只能使用剩余时间：超时后请求被取消，且不计为上游故障
+    assert calls == 2 and cancelled == [2]
+    assert elapsed < 0.5
+    assert plugin.breaker.state == CircuitBreaker.CLOSED
+    assert plugin.metrics.counter("upstream_requests_total", status="deadline") == 1
+
+
+def test_upstream_expired_deadline_sends_nothing(plugin):
+    calls = []
+    plugin.transport = httpx.MockTransport(lambda request: calls.append(request) or httpx.Response(200))
+
+    async def run():
+        with pytest.raises(sys.modules[type(plugin).__module__].DeadlineExceeded):
+            await plugin._upstream_get("https://example.invalid/api", {}, {}, deadline=time.monotonic() - 0.01)
+
+    asyncio.run(run())
+    assert calls == []
+
+
+@pytest.mark.parametrize("mode", ["顺序回退", "并发对冲"], ids=["sequential", "hedged"])
+def test_fallback_cut_by_deadline_is_not_cached(make_plugin, mode):
+    # 每秒只有 1 个令牌：首个请求用掉后，去掉 gameId 的回退请求在 0.5 秒的截止时间前发不出去
+    plugin = make_plugin(rate_limit_per_sec=1, rate_limit_burst=1, fallback_mode=mode, hedge_delay=0)
+    plugin.transport = FakeModServer().transport()
+    key = plugin._cache_key("nogid:武器包", "mods_createTime")
+
+    async def run():
+        status, data = await plugin._search_upstream(
+            key, "nogid:武器包", "mods_createTime", deadline=time.monotonic() + 0.5)
+        # 被截断的空结果只交给本次调用方，不作为最终答案缓存
+        assert status == 200 and data.total == 0
+        assert key not in plugin.cache
+        await asyncio.sleep(1.0)
+        status, data = await plugin._search_upstream(key, "nogid:武器包", "mods_createTime")
+        assert status == 200 and data.total > 0
+        assert plugin.cache.peek(key)[1] == "fresh"
+
+    asyncio.run(run())
@@ -0,0 +1,87 @@
+"""本地索引增量同步（按 mods_updateTime 水位）的回归测试。"""
+import asyncio
+
+import httpx
+
+from mod_index import ModIndex
+from mod_ngram import NgramIndex
+
+
+class UpdateFeed:
+    """按更新时间倒序分页的 mod 列表接口，记录每次请求的排序方式与页码。"""
+
+    def __init__(self, n):
+        self.mods = {i: self._mod(i, f"mod{i}", i) for i in range(1, n + 1)}
+        self.requests = []
+
+    @staticmethod
+    def _mod(mod_id, title, minute):
+        stamp = f"2024-01-01 {minute // 60:02d}:{minute % 60:02d}:00"
+        return {"id": mod_id, "mods_title": title, "mods_author": "a", "mods_createTime": "2023-12-01 00:00:00",
+                "mods_updateTime": stamp, "mods_resource": [{"id": mod_id * 10, "mods_resource_name": title}]}
+
+    def touch(self, mod_id, title, minute):
+        self.mods[mod_id] = self._mod(mod_id, title, minute)
+
+    def handler(self, request):
+        params = request.url.params
+        page, size = int(params["page"]), int(params["pageSize"])
+        self.requests.append((params["sortBy"], page))
+        ordered = sorted(self.mods.values(), key=lambda m: (m["mods_updateTime"], m["id"]), reverse=True)
+        return httpx.Response(200, json={"data": ordered[(page - 1) * size:page * size], "total": len(ordered)})
+
+
+def _plugin(make_plugin, feed, tmp_path):
+    plugin = make_plugin(feed.handler, local_index=True, index_page_size=5, game_id=261)
+    plugin.index = ModIndex(tmp_path / "mod_index.db")
+    plugin.ngram = NgramIndex()
+    return plugin
+
+
+def test_sync_pages_until_watermark_and_upserts_only_changes(make_plugin, tmp_path):
+    feed = UpdateFeed(20)
+    plugin = _plugin(make_plugin, feed, tmp_path)
+
+    async def run():
+        # 没有水位时退回完整爬取
+        assert await plugin._sync_index(261) == 20
+        feed.requests.clear()
+
+        feed.touch(3, "mod3 v2", 100)
+        feed.touch(7, "mod7 v2", 101)
+        stored = await plugin._sync_index(261)
+        # 第一页里就遇到了早于水位的记录，只请求一页；与水位同一时刻的记录重新写入
+        assert feed.requests == [("mods_updateTime", 1)]
+        assert stored == 3
+        assert plugin.index.get(7)[0]["mods_title"] == "mod7 v2"
+        assert plugin.ngram.search("mod7 v2")[0][0] == 7
+
+        feed.requests.clear()
+        for i in range(1, 13):
+            feed.touch(i, f"mod{i} v3", 200 + i)
+        assert await plugin._sync_index(261) == 12
+        assert feed.requests == [("mods_updateTime", p) for p in (1, 2, 3)]
+
+    try:
+        asyncio.run(run())
+    finally:
+        plugin.index.close()
+
+
+def test_sync_stops_at_max_pages(make_plugin, tmp_path):
+    feed = UpdateFeed(30)
+    plugin = _plugin(make_plugin, feed, tmp_path)
+    plugin.index_sync_max_pages = 2
+
+    async def run():
+        await plugin._sync_index(261)
+        feed.requests.clear()
+        for i in range(1, 31):
+            feed.touch(i, f"mod{i} v2", 300 + i)
+        assert await plugin._sync_index(261) == 10
+        assert feed.requests == [("mods_updateTime", 1), ("mods_updateTime", 2)]
+
+    try:
+        asyncio.run(run())
+    finally:
+        plugin.index.close()
@@ -0,0 +1,49 @@
+"""插件卸载流程的回归测试：terminate() 要等后台任务与线程里的数据库写入结束后再关闭数据库。"""
+import asyncio
+import time
+
+import httpx
+
+from mod_cache_store import CacheStore
+
+
+def _handler(request):
+    mod = {"id": 1, "mods_title": "武器包", "mods_author": "a", "mods_createTime": "2024-01-01 00:00:00"}
+    return httpx.Response(200, json={"data": [mod], "total": 1})
+
+
+def test_terminate_waits_for_flush_in_thread(make_plugin, tmp_path):
+    plugin = make_plugin(_handler, hot_refresh_top=0)
+    errors = []
+
+    async def run():
+        await plugin.initialize()
+        while plugin.cache_store is None:
+            await asyncio.sleep(0.01)
+        store = plugin.cache_store
+        put_many = store.put_many
+
+        def slow_put_many(rows):
+            # 模拟磁盘较慢：卸载开始时写入仍在线程里排队
+            time.sleep(0.2)
+            try:
+                return put_many(rows)
+            except Exception as e:
+                errors.append(e)
+                raise
+
+        store.put_many = slow_put_many
+        key = plugin._cache_key("武器包", "mods_createTime")
+        await plugin._search_upstream(key, "武器包", "mods_createTime")
+        plugin._start_background(plugin._flush_cache())
+        await asyncio.sleep(0.01)
+        await plugin.terminate()
+        return key
+
+    key = asyncio.run(run())
+    assert errors == []
+    reopened = CacheStore(plugin.data_dir / "search_cache.db")
+    try:
+        assert reopened.get(key) is not None
+    finally:
+        reopened.close()
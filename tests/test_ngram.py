@@ -0,0 +1,55 @@
+"""本地 n-gram 倒排索引（mod_ngram）的回归测试。"""
+from mod_ngram import NgramIndex, tokenize
+
+
+def test_tokenize_cjk_ngrams_and_folded_words():
+    assert tokenize("武器包") == ["武器", "器包", "武器包"]
+    assert tokenize("ＧＴＡ5 槍") == ["gta5", "枪"]
+    assert tokenize("高清材質") == tokenize("高清材质")
+
+
+def _index():
+    idx = NgramIndex()
+    idx.add_many([
+        (1, "武器包 重制版", "张三", 100, 10.0),
+        (2, "武器包", "李四", 100, 30.0),
+        (3, "高清材质整合包", "王五", 5000, 20.0),
+        (4, "地图扩展", "武器包爱好者", 100, 40.0),
+        (5, "武器包 合集", "赵六", 9000, 5.0),
+    ])
+    return idx
+
+
+def test_relevance_prefers_title_matches_and_boosts_downloads():
+    ids, total = _index().search("武器包", k=10)
+    assert total == 4
+    # 作者中出现的词项权重低于标题
+    assert ids[-1] == 4
+    # 标题同样匹配时，下载量高的靠前
+    assert ids[0] == 5
+
+
+def test_sort_modes_and_offset_paging():
+    idx = _index()
+    assert idx.search("武器包", k=10, sort="downloads")[0][0] == 5
+    assert idx.search("武器包", k=10, sort="time")[0] == [4, 2, 1, 5]
+    assert idx.search("武器包", k=2, sort="time", offset=2) == ([1, 5], 4)
+
+
+def test_update_remove_and_compaction_keep_results_consistent():
+    idx = _index()
+    idx.add(2, "地图包", "李四", 100, 30.0)
+    assert 2 not in idx.search("武器包", k=10)[0]
+    idx.remove(5)
+    assert idx.search("武器包", k=10) == ([1, 4], 2)
+    # 大量更新触发压缩后结果不变
+    for i in range(3000):
+        idx.add(1, "武器包 重制版", "张三", 100 + i, 10.0)
+    assert len(idx) == 4
+    assert idx.search("武器包", k=10) == ([1, 4], 2)
+    assert len(idx._ids) < 3000
+
+
+def test_single_character_query_falls_back():
+    assert _index().search("枪") is None
+    assert NgramIndex().search("武器包") == ([], 0)
@@ -0,0 +1,56 @@
+"""查询规范化（mod_normalize）的回归测试。"""
+import pytest
+
+from mod_normalize import QueryNormalizer, fold, parse_aliases
+
+
+@pytest.mark.parametrize("variant, expected", [
+    (" 武器包 ", "武器包"),
+    ("武器包　", "武器包"),
+    ("武器　\t 包", "武器 包"),
+])
+def test_fold_collapses_whitespace(variant, expected):
+    assert fold(variant) == expected
+
+
+def test_fold_full_width_case_and_traditional():
+    assert fold("ＷＥＡＰＯＮ") == "weapon"
+    assert fold("Weapon  Pack") == "weapon pack"
+    assert fold("巫師３") == "巫师3"
+    assert fold("高清材質 整合包") == "高清材质 整合包"
+    assert fold(None) == ""
+
+
+def test_normalizer_applies_whole_query_then_per_token_aliases():
+    norm = QueryNormalizer({"weapon": "武器包", "weapon pack": "武器整合", "gta": "侠盗猎车"})
+    assert norm("ＷＥＡＰＯＮ") == "武器包"
+    assert norm("Weapon Pack") == "武器整合"
+    assert norm("gta 5 weapon") == "侠盗猎车 5 武器包"
+    assert norm("地图") == "地图"
+
+
+def test_normalizer_expands_chains_and_stops_on_cycles():
+    norm = QueryNormalizer({"a": "b", "b": "c", "x": "y", "y": "x"})
+    assert norm("a") == norm("b") == "c"
+    # 环上的别名结果固定，不随查询顺序变化
+    assert norm("x") == QueryNormalizer({"x": "y", "y": "x"})("x")
+
+
+def test_custom_aliases_persist_and_override_config(tmp_path):
+    path = tmp_path / "aliases.json"
+    norm = QueryNormalizer({"枪": "武器包"}, path=path)
+    assert norm("枪") == "武器包"
+    assert norm.add_alias("槍", "枪械") == ("枪", "枪械")
+    # 规范化结果的缓存随别名变化失效
+    assert norm("枪") == "枪械"
+    norm.save()
+    reloaded = QueryNormalizer({"枪": "武器包"}, path=path)
+    assert reloaded("枪") == "枪械"
+    assert reloaded.remove_alias("枪")
+    assert reloaded("枪") == "武器包"
+    with pytest.raises(ValueError):
+        norm.add_alias("同", "同")
+
+
+def test_parse_aliases_accepts_chinese_commas_and_newlines():
+    assert parse_aliases("weapon=武器包，gta=侠盗猎车\nbad, =x, y=") == {"weapon": "武器包", "gta": "侠盗猎车"}
@@ -0,0 +1,18 @@
+"""搜索词页码标记解析的回归测试。"""
+import pytest
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("武器包 第2页", ("武器包", 2)),
+    ("武器包第 12 页", ("武器包", 12)),
+    ("武器包", ("武器包", 1)),
+    # 末尾的数字与 P5 之类是游戏名的一部分
+    ("巫师 3", ("巫师 3", 1)),
+    ("Fallout 4", ("Fallout 4", 1)),
+    ("女神异闻录 P5", ("女神异闻录 P5", 1)),
+    ("P5", ("P5", 1)),
+    ("女神异闻录 P5 第3页", ("女神异闻录 P5", 3)),
+    ("武器包 第0页", ("武器包 第0页", 1)),
+])
+def test_split_page_only_accepts_explicit_marker(plugin_class, text, expected):
+    assert plugin_class._split_page(text) == expected
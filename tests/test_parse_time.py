@@ -0,0 +1,49 @@
+"""时间解析快速路径与本地数值排序键的回归测试。"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from mod_records import ModRecord, date_part, parse_time
+
+BASE = datetime(2024, 3, 5, 6, 7, 8).timestamp()
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2024-03-05 06:07:08", BASE),
+    ("2024-03-05T06:07:08", BASE),
+    ("2024-03-05T06:07:08Z", BASE),
+    ("2024-03-05T06:07:08.250Z", BASE + 0.25),
+    ("2024/03/05 06:07:08", BASE),
+    ("2024-03-05", datetime(2024, 3, 5).timestamp()),
+    ("2024/03/05", datetime(2024, 3, 5).timestamp()),
+    # 带时区偏移走慢速路径
+    ("2024-03-05T06:07:08+08:00", datetime(2024, 3, 5, 6, 7, 8, tzinfo=timezone(timedelta(hours=8))).timestamp()),
+    ("", 0.0),
+    ("昨天", 0.0),
+    ("2024-13-45", 0.0),
+    ("2024-02-30 00:00:00", 0.0),
+])
+def test_parse_time(text, expected):
+    assert parse_time(text) == pytest.approx(expected)
+
+
+def test_date_part():
+    assert date_part("2025-09-12T05:55:54.736Z") == "2025-09-12"
+    assert date_part("2025-09-12 05:55:54") == "2025-09-12"
+    assert date_part(None) == ""
+
+
+def test_local_sort_keys_use_numeric_fields(make_plugin):
+    plugin = make_plugin()
+    mods = [
+        ModRecord(1, "a", "", "", "2024-01-09", 5, ""),
+        ModRecord(2, "b", "", "", "2024-01-10T00:00:00Z", 50, ""),
+        # 字符串比较会把 "2024/..." 排在 "2024-..." 之后，数值键不会
+        ModRecord(3, "c", "", "", "2024/01/08", 500, ""),
+    ]
+    plugin.sort_order = "时间排序"
+    assert [m.mod_id for m in sorted(mods, key=plugin._local_sort_key(), reverse=True)] == [2, 1, 3]
+    plugin.sort_order = "下载量排序"
+    assert [m.mod_id for m in sorted(mods, key=plugin._local_sort_key(), reverse=True)] == [3, 2, 1]
+    plugin.sort_order = "综合排序"
+    assert plugin._local_sort_key() is None
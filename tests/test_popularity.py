@@ -0,0 +1,52 @@
+"""查询热度统计（mod_popularity）的回归测试。"""
+import random
+
+from mod_popularity import CountMinSketch, HotQueries
+
+
+def test_sketch_never_underestimates():
+    sketch = CountMinSketch(width=64, depth=3)
+    rng = random.Random(1)
+    truth = {}
+    for _ in range(2000):
+        key = f"q{rng.randrange(300)}"
+        truth[key] = truth.get(key, 0) + 1
+        sketch.add(key)
+    assert all(sketch.estimate(k) >= n for k, n in truth.items())
+
+
+def test_top_keeps_heaviest_queries_with_their_payloads():
+    hot = HotQueries(k=3, width=4096)
+    traffic = ["武器包"] * 50 + ["地图"] * 30 + ["汉化"] * 20 + [f"冷门{i}" for i in range(200)]
+    random.Random(2).shuffle(traffic)
+    for kw in traffic:
+        hot.record(kw, (kw, "mods_createTime"))
+    assert [k for k, _, _ in hot.top()] == ["武器包", "地图", "汉化"]
+    assert hot.top(1) == [("武器包", 50, ("武器包", "mods_createTime"))]
+    # 再次出现但不带附带数据时保留原来的
+    hot.record("武器包")
+    assert hot.top(1)[0][2] == ("武器包", "mods_createTime")
+    assert len(hot) == 3
+    assert len(hot._heap) <= 8 * hot.k + 64
+
+
+def test_newcomer_must_exceed_the_floor():
+    hot = HotQueries(k=2, width=4096)
+    hot.record("a", count=5)
+    hot.record("b", count=3)
+    assert hot.record("c", count=3) == 3
+    assert {k for k, _, _ in hot.top()} == {"a", "b"}
+    hot.record("c")
+    assert {k for k, _, _ in hot.top()} == {"a", "c"}
+
+
+def test_decay_halves_counts_and_keeps_order():
+    hot = HotQueries(k=3, width=4096)
+    hot.record("a", "pa", count=8)
+    hot.record("b", "pb", count=5)
+    hot.decay()
+    assert hot.top() == [("a", 4, "pa"), ("b", 2, "pb")]
+    assert hot.sketch.estimate("a") == 4
+    # 衰减后的计数参与之后的比较
+    assert hot.record("b", count=3) == 5
+    assert hot.top(1)[0][0] == "b"
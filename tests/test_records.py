@@ -0,0 +1,54 @@
+"""接口响应解析与 ModRecord 紧凑形式的回归测试。"""
+import json
+
+import pytest
+
+from mod_records import ModRecord, SearchResult, parse_response
+
+MOD = {
+    "id": 42, "mods_title": "武器包", "mods_author": "甲", "mods_createTime": "2024-01-02 03:04:05",
+    "mods_updateTime": "2024-03-01T08:00:00.000Z", "mods_download_cnt": "17",
+    "mods_resource": [
+        {"id": 1, "mods_resource_name": "v1", "mods_resource_size": "1MB", "mods_resource_createTime": "2024-01-02"},
+        {"id": 2, "mods_resource_name": "v2", "mods_resource_size": "2MB", "mods_resource_createTime": "2024-02-02",
+         "mods_resource_latest_version": 1},
+    ],
+}
+
+
+@pytest.mark.parametrize("data, shape, total", [
+    ({"data": [MOD], "total": 9}, "A", 9),
+    ({"data": {"data": [MOD], "total": 8}}, "B", 8),
+    ({"data": {"mod": [MOD], "count": 7}}, "C", 7),
+    ({"data": [MOD]}, "A", 1),
+])
+def test_parse_response_shapes(data, shape, total):
+    result = parse_response(data)
+    assert (result.shape, result.total, result.error) == (shape, total, None)
+    assert [m.title for m in result.mods] == ["武器包"]
+
+
+def test_parse_response_error_code():
+    assert parse_response({"code": "1001", "message": "appkey 无效"}).error == "appkey 无效"
+    assert parse_response({"code": "00"}).error is None
+
+
+def test_record_fields_and_fallbacks():
+    rec = ModRecord.from_dict(MOD)
+    assert (rec.mod_id, rec.author, rec.downloads, rec.size) == (42, "甲", 17, "1MB")
+    assert rec.update_ts > rec.publish_ts > 0
+    # 没有更新时间时取标记为最新版本的资源时间，而不是创建时间
+    bare = dict(MOD, mods_updateTime="")
+    assert ModRecord.from_dict(bare).update_time == "2024-02-02"
+    # 资源都没有标记最新版本时按资源创建时间取最大
+    resources = [dict(r, mods_resource_latest_version=0) for r in reversed(MOD["mods_resource"])]
+    assert ModRecord.from_dict(dict(bare, mods_createTime="", mods_resource=resources)).publish_time == "2024-02-02"
+
+
+def test_search_result_round_trips_through_json():
+    result = parse_response({"data": [MOD, {"id": 43, "title": "无资源"}], "total": 2})
+    restored = SearchResult.from_dict(json.loads(json.dumps(result.to_dict())))
+    assert [m.to_list() for m in restored.mods] == [m.to_list() for m in result.mods]
+    assert (restored.total, restored.shape) == (2, "A")
+    assert restored.mods[0].update_ts == result.mods[0].update_ts
+    assert restored.mods[0].resources[1].latest is True
@@ -0,0 +1,39 @@
+"""查询日志回放（mod_search_local_test.py --replay）的回归测试。"""
+import asyncio
+
+import mod_search_local_test as local_test
+from mod_fake_server import FakeModServer
+
+
+def _replay(args_extra, entries):
+    async def run():
+        server = await FakeModServer().start()
+        try:
+            args = local_test.parse_args(["--replay", "unused.jsonl", "--speed", "0"] + args_extra)
+            return await local_test.replay_plugin(args, entries, "replay", server.base_url)
+        finally:
+            await server.close()
+
+    return asyncio.run(run())
+
+
+def test_replay_plugin_keeps_page_numbers(plugin_class):
+    entries = [
+        {"ts": 0.0, "keyword": "武器包", "page": 1},
+        {"ts": 0.1, "keyword": "武器包", "page": 2},
+    ]
+    report = _replay([], entries)
+    # 第 2 页按“第2页”回放；若写成末尾数字会被当作关键词“武器包 2”，结果为空
+    assert report["outcomes"] == {"results": 2}
+    assert report["failures"] == []
+
+
+def test_replay_plugin_does_not_touch_default_strategy(plugin_class, tmp_path, monkeypatch):
+    production = tmp_path / "plugin" / "strategy.json"
+    monkeypatch.setattr(local_test, "default_strategy_file", lambda: str(production))
+    _replay([], [{"ts": 0.0, "keyword": "武器包", "page": 1}])
+    assert not production.exists()
+
+    explicit = tmp_path / "explicit.json"
+    _replay(["--strategy-file", str(explicit)], [{"ts": 0.0, "keyword": "武器包", "page": 1}])
+    assert explicit.exists()
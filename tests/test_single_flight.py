@@ -0,0 +1,122 @@
+"""相同查询合并（SingleFlight）的回归测试：原语本身，以及插件并发查询同一页时只走一条上游回退链。"""
+import asyncio
+
+import httpx
+import pytest
+
+from mod_flow import SingleFlight
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    async def run():
+        flight = SingleFlight()
+        calls = 0
+        gate = asyncio.Event()
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await gate.wait()
+            return "result"
+
+        waiters = [asyncio.ensure_future(flight.do("k", work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert "k" in flight and flight.in_flight == 1
+        gate.set()
+        assert await asyncio.gather(*waiters) == ["result"] * 3
+        assert calls == 1
+        assert "k" not in flight
+
+    asyncio.run(run())
+
+
+def test_single_flight_cancelled_waiter_does_not_cancel_others():
+    async def run():
+        flight = SingleFlight()
+        gate = asyncio.Event()
+
+        async def work():
+            await gate.wait()
+            return 42
+
+        first = asyncio.ensure_future(flight.do("k", work))
+        second = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        gate.set()
+        assert await second == 42
+        assert first.cancelled()
+
+    asyncio.run(run())
+
+
+def test_single_flight_last_waiter_leaving_cancels_work():
+    async def run():
+        flight = SingleFlight()
+        cancelled = asyncio.Event()
+
+        async def work():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        short = asyncio.ensure_future(flight.do("k", work, timeout=0.01))
+        longer = asyncio.ensure_future(flight.do("k", work, timeout=0.05))
+        with pytest.raises(asyncio.TimeoutError):
+            await short
+        # 还有等待者时工作继续
+        assert not cancelled.is_set() and "k" in flight
+        with pytest.raises(asyncio.TimeoutError):
+            await longer
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.sleep(0)
+        assert "k" not in flight
+
+    asyncio.run(run())
+
+
+def test_single_flight_propagates_errors_and_allows_retry():
+    async def run():
+        flight = SingleFlight()
+
+        async def fail():
+            raise ValueError("boom")
+
+        async def ok():
+            return "ok"
+
+        results = await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+        assert await flight.do("k", ok) == "ok"
+
+    asyncio.run(run())
+
+
+def test_plugin_coalesces_identical_concurrent_lookups(make_plugin):
+    calls = []
+
+    async def handler(request):
+        calls.append((request.url.params["search"], request.url.params["page"]))
+        await asyncio.sleep(0.05)
+        mod = {"id": int(request.url.params["page"]), "mods_title": "武器包", "mods_author": "a"}
+        return httpx.Response(200, json={"data": [mod], "total": 30})
+
+    plugin = make_plugin(handler, prefetch_next_page=False)
+
+    async def run():
+        lookups = [plugin._lookup("武器包", "mods_createTime", 1) for _ in range(3)]
+        lookups.append(plugin._lookup("武器包", "mods_createTime", 2))
+        results = await asyncio.gather(*lookups)
+        # 同一页的 3 个调用方共用一次上游请求，另一页单独请求
+        assert sorted(calls) == [("武器包", "1"), ("武器包", "2")]
+        assert [status for status, _, _ in results] == [200] * 4
+        assert [data.mods[0].mod_id for _, data, _ in results] == [1, 1, 1, 2]
+        assert plugin._flight.in_flight == 0
+        # 之后的相同查询直接命中缓存
+        assert (await plugin._lookup("武器包", "mods_createTime", 1))[2] == "cache"
+        assert len(calls) == 2
+
+    asyncio.run(run())
@@ -0,0 +1,38 @@
+"""回退策略学习（mod_strategy 与插件的回退链）的回归测试。"""
+import asyncio
+import json
+
+import httpx
+
+
+def test_stale_learned_strategy_is_invalidated_and_reprobed(make_plugin):
+    def handler(request):
+        return httpx.Response(200, json={"data": [], "total": 0})
+
+    plugin = make_plugin(handler)
+    path = plugin.strategy.path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # 后台探测学到的策略（关键词参数 wd），回退链中没有对应阶段
+    path.write_text(json.dumps({"url": plugin.api_url, "header": "Authorization", "include_gid": True, "kv_key": "wd"}))
+
+    async def search():
+        key = plugin._cache_key("武器包", "mods_createTime")
+        return await plugin._search_upstream(key, "武器包", "mods_createTime")
+
+    async def run():
+        await search()
+        # 已学习策略与回退链都未命中：策略作废并写盘，后台重新探测
+        assert plugin.strategy.get() is None
+        assert plugin._probe_task is not None
+        await plugin._probe_task
+        await asyncio.sleep(0.05)
+        assert not path.exists()
+        stages = plugin.metrics.counter_by("upstream_requests_total", "stage")
+        assert stages["learned"] == 1 and stages["probe"] > 0
+
+        plugin.cache.clear()
+        await search()
+        # 作废后不再为旧策略多发一次请求
+        assert plugin.metrics.counter_by("upstream_requests_total", "stage")["learned"] == 1
+
+    asyncio.run(run())